@@ -53,12 +53,121 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'lmsapp.instrumentation.RequestInstrumentationMiddleware',
+    'lmsapp.routing.ReadYourWritesMiddleware',
 ]
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
-    )
+        "lmsapp.authentication.CachedJWTAuthentication",
+    ),
+    "DEFAULT_RENDERER_CLASSES": (
+        "lmsapp.renderers.InstrumentedJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PAGINATION_CLASS": "lmsapp.pagination.KeysetPagination",
+    "PAGE_SIZE": 50,
+}
+
+# Upper bound for the ?page_size= query parameter on list endpoints
+LMS_MAX_PAGE_SIZE = 200
+
+# Rows fetched per database round trip when streaming grade exports
+LMS_EXPORT_CHUNK_SIZE = 2000
+
+# Fraction of requests that get Server-Timing headers and a log line from
+# lmsapp.instrumentation.RequestInstrumentationMiddleware. Every request is
+# sampled only when the DEBUG environment variable is 'true', not from the
+# hard-coded DEBUG above, so deployments sample 1% unless told otherwise.
+LMS_INSTRUMENTATION_SAMPLE_RATE = float(os.getenv(
+    'LMS_INSTRUMENTATION_SAMPLE_RATE', '1.0' if os.getenv('DEBUG', 'False').lower() == 'true' else '0.01',
+))
+# Identical query shapes repeated this many times in one request are logged as N+1
+LMS_N_PLUS_ONE_THRESHOLD = 5
+
+# Where CachedJWTAuthentication keeps User rows: 'local' (per-process LRU,
+# only invalidated by saves in the same process) or 'django' (the default
+# Django cache). Defaults to 'django' when LMS_CACHE_DIR shares that cache
+# between workers, so a save in one worker reaches all of them.
+LMS_AUTH_USER_CACHE = os.getenv('LMS_AUTH_USER_CACHE', 'django' if os.getenv('LMS_CACHE_DIR') else 'local')
+LMS_AUTH_USER_CACHE_SIZE = 10000
+LMS_AUTH_USER_CACHE_TTL = 300
+
+# Seconds a rendered GET response stays in lmsapp.caching; 0 disables the cache
+LMS_RESPONSE_CACHE_TTL = 300
+
+# Serve list endpoints through lmsapp.fastpath (values() rows, orjson if installed)
+LMS_FAST_LIST = True
+
+# Score histograms in lmsapp.gradebook: bin count over 0..max score. Run
+# manage.py rebuild_gradebook after changing either.
+LMS_GRADEBOOK_BINS = 100
+LMS_GRADEBOOK_MAX_SCORE = 100
+
+# Delta sync (lmsapp.sync): lag behind the clock for late commits, cursor
+# rounding so repeated polls share a cached URL, and how long deletes are kept
+# in the change log (older cursors get 410; prune with manage.py prune_changelog).
+LMS_SYNC_WINDOW_SECONDS = 5
+LMS_SYNC_CURSOR_STEP_SECONDS = 30
+LMS_SYNC_LOG_RETENTION_DAYS = 30
+
+# Rows deleted per transaction when manage.py purge_deleted removes archived
+# teachers and courses (lmsapp.purge)
+LMS_PURGE_BATCH_SIZE = 1000
+
+# Background jobs (lmsapp.jobs, manage.py run_workers): attempts before a job
+# fails, first retry delay (doubles each attempt), how long a worker may hold a
+# job before it is requeued, and the idle poll interval
+LMS_JOB_MAX_ATTEMPTS = 5
+LMS_JOB_BACKOFF_SECONDS = 10
+LMS_JOB_LEASE_SECONDS = 600
+LMS_JOB_POLL_SECONDS = 1.0
+
+# Processes hashing passwords for bulk user provisioning (lmsapp.provisioning,
+# manage.py provision_users); 0 means one per CPU
+LMS_PROVISION_PROCESSES = int(os.getenv('LMS_PROVISION_PROCESSES', '0'))
+
+# Most accounts one POST /api/register/bulk/ may create; the endpoint hashes
+# in the web worker, so this bounds how long a request is held
+LMS_PROVISION_HTTP_MAX_ROWS = int(os.getenv('LMS_PROVISION_HTTP_MAX_ROWS', '100'))
+
+# Live submission/result feed (lmsapp.events): LocalBackend fans out within one
+# worker, lmsapp.events.DatabaseBackend across several ASGI workers. Streams per
+# worker, events queued per stream before a slow client is dropped, events kept
+# for Last-Event-ID replay, keepalive interval, and the database backend's poll
+# interval and row retention.
+LMS_EVENTS_BACKEND = os.getenv('LMS_EVENTS_BACKEND', 'lmsapp.events.LocalBackend')
+LMS_EVENTS_MAX_CONNECTIONS = 1000
+LMS_EVENTS_QUEUE_SIZE = 100
+LMS_EVENTS_BUFFER_SIZE = 1000
+LMS_EVENTS_KEEPALIVE_SECONDS = 15
+LMS_EVENTS_POLL_SECONDS = 0.5
+LMS_EVENTS_RETENTION_SECONDS = 3600
+
+# Login hardening (lmsapp.login): token buckets per client address and per
+# phone, as a burst and a refill rate per minute (a burst of 0 disables one),
+# seconds an unknown phone is remembered, and the async login view's password
+# hashing threads (0 means one per CPU) and how many hashes may wait for one.
+LMS_LOGIN_IP_BURST = 60
+LMS_LOGIN_IP_PER_MINUTE = 120
+LMS_LOGIN_PHONE_BURST = 5
+LMS_LOGIN_PHONE_PER_MINUTE = 5
+LMS_LOGIN_UNKNOWN_TTL = 60
+LMS_LOGIN_HASH_THREADS = int(os.getenv('LMS_LOGIN_HASH_THREADS', '0'))
+LMS_LOGIN_HASH_QUEUE = 64
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'lmsapp.instrumentation': {'handlers': ['console'], 'level': 'INFO'},
+        'lmsapp.jobs': {'handlers': ['console'], 'level': 'INFO'},
+        'lmsapp.events': {'handlers': ['console'], 'level': 'WARNING'},
+        'lmsapp.routing': {'handlers': ['console'], 'level': 'WARNING'},
+    },
 }
 
 
@@ -99,11 +208,72 @@ if os.getenv('DATABASE_URL'):
             'PORT': os.getenv('DB_PORT', '5432'),
         }
     }
+    # Read replicas: comma-separated hosts, same credentials as the primary
+    LMS_DB_REPLICAS = []
+    for i, host in enumerate(filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(','))):
+        LMS_DB_REPLICAS.append(f'replica{i + 1}')
+        DATABASES[f'replica{i + 1}'] = {**DATABASES['default'], 'HOST': host.strip(), 'TEST': {'MIRROR': 'default'}}
 else:
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            # Job workers write alongside the web process: take the write lock
+            # when a transaction starts (instead of failing to upgrade a read
+            # lock), wait for it, and let readers proceed during writes (WAL).
+            'OPTIONS': {
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 20,
+                'init_command': 'PRAGMA journal_mode=WAL;',
+            },
+        }
+    }
+    # Stand-in replica on the same file, so replica routing can be exercised
+    # locally and in the tests; only read from when listed in LMS_DB_REPLICAS.
+    # It never writes. read_uncommitted only matters for the shared-cache
+    # in-memory test database, where it lets the mirror see the test's rows.
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {'timeout': 20, 'init_command': 'PRAGMA read_uncommitted = 1;'},
+        'TEST': {'MIRROR': 'default'},
+    }
+    LMS_DB_REPLICAS = ['replica'] if os.getenv('LMS_USE_REPLICA') else []
+
+# Persistent connections (checked before reuse); set DB_CONN_MAX_AGE=0 under ASGI
+for database in DATABASES.values():
+    database['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', '60'))
+    database['CONN_HEALTH_CHECKS'] = True
+
+DATABASE_ROUTERS = ['lmsapp.routing.ReplicaRouter']
+
+# Replica routing (lmsapp.routing; LMS_DB_REPLICAS above lists the aliases GET
+# views read from): how long a user's reads stay on the primary after they
+# write, and how long a replica that failed to connect is skipped.
+LMS_READ_YOUR_WRITES_SECONDS = 5
+LMS_DB_REPLICA_RETRY_SECONDS = 30
+
+# Admin changelists show the database's row estimate instead of COUNT(*) for
+# unfiltered tables estimated above this many rows (lmsapp.admin)
+LMS_ADMIN_EXACT_COUNT_LIMIT = 10000
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Per-process memory by default; set LMS_CACHE_DIR to share one file-based
+# cache between workers (needed for cache invalidation to reach all of them).
+
+if os.getenv('LMS_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('LMS_CACHE_DIR'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         }
     }
 
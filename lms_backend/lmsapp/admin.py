@@ -1,14 +1,124 @@
+"""Admin changelists that cost a fixed number of queries per page.
+
+Every foreign key shown in a changelist is joined with
+``list_select_related`` and edited through a raw-id widget, search only
+uses indexed exact lookups (or the course full-text index), and large
+unfiltered tables are counted from the database's row estimate instead of
+``COUNT(*)``.
+"""
+from django.conf import settings
 from django.contrib import admin
-from . import models
-
-# Register your models here.
-# admin.site.register(models.Assignment)
-admin.site.register(models.Course)
-# admin.site.register(models.Enrollment)
-# admin.site.register(models.Lesson)
-# admin.site.register(models.Profile)
-# admin.site.register(models.Results)
-admin.site.register(models.Student)
-admin.site.register(models.Teacher)
-# admin.site.register(models.User)
-admin.site.register(models.Submission)
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+
+from . import models, purge
+from .search import search_course_ids
+
+# Most course matches the admin search box returns
+SEARCH_LIMIT = 1000
+
+
+def estimated_row_count(model, using):
+    """Return the planner's row estimate for ``model``'s table, or None if there is none."""
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [table])
+            elif connection.vendor == 'sqlite':
+                # Filled in by ANALYZE; the first number of an index's stat is the table's row count
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+            else:
+                return None
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if row is None:
+        return None
+    estimate = int(float(str(row[0]).split()[0]))
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that uses the row estimate for unfiltered changelists of large tables."""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > getattr(settings, 'LMS_ADMIN_EXACT_COUNT_LIMIT', 10000):
+                return estimate
+        return super().count
+
+
+class LmsModelAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 100
+
+
+class ArchivingAdminMixin:
+    """Archive teachers and courses on delete (see ``lmsapp.purge``) instead of cascading in the request."""
+    readonly_fields = ('is_deleted',)
+
+    def get_queryset(self, request):
+        queryset = self.model.all_objects.all()
+        ordering = self.get_ordering(request)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        return queryset
+
+    def get_deleted_objects(self, objs, request):
+        # The default collects every dependent row just to list them
+        objs = list(objs)
+        return [str(obj) for obj in objs], {self.model._meta.verbose_name_plural: len(objs)}, set(), []
+
+    def delete_model(self, request, obj):
+        self.archive(obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            self.archive(obj)
+
+
+@admin.register(models.Teacher)
+class TeacherAdmin(ArchivingAdminMixin, LmsModelAdmin):
+    archive = staticmethod(purge.archive_teacher)
+    list_display = ('id', 'name', 'email', 'subject', 'is_active', 'is_deleted')
+    list_filter = ('is_active', 'is_deleted')
+    search_fields = ('email__exact',)
+
+
+@admin.register(models.Course)
+class CourseAdmin(ArchivingAdminMixin, LmsModelAdmin):
+    archive = staticmethod(purge.archive_course)
+    list_display = ('id', 'title', 'teacher', 'is_deleted', 'updated_at')
+    list_select_related = ('teacher',)
+    list_filter = ('is_deleted',)
+    raw_id_fields = ('teacher',)
+    search_fields = ('title',)
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        ids = search_course_ids(search_term, SEARCH_LIMIT)
+        return queryset.filter(pk__in=ids), False
+
+
+@admin.register(models.Student)
+class StudentAdmin(LmsModelAdmin):
+    list_display = ('id', 'name', 'email', 'roll_number', 'enrollment_date', 'is_active')
+    list_filter = ('is_active', 'enrollment_date')
+    search_fields = ('email__exact', 'roll_number__exact')
+
+
+@admin.register(models.Submission)
+class SubmissionAdmin(LmsModelAdmin):
+    list_display = ('id', '__str__', 'submitted_at', 'updated_at')
+    list_select_related = ('student', 'assignment')
+    list_filter = ('submitted_at',)
+    raw_id_fields = ('assignment', 'student')
+    search_fields = ('student__email__exact', 'student__roll_number__exact')
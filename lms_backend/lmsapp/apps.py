@@ -1,6 +1,20 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import post_migrate
 
 
 class LmsappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'lmsapp'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        post_migrate.connect(install_search_index, sender=self)
+
+
+def install_search_index(sender, using, **kwargs):
+    """Recreate course search triggers dropped by SQLite table rebuilds."""
+    from . import search
+
+    search.install(connections[using])
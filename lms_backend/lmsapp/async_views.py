@@ -0,0 +1,221 @@
+"""Async read-only endpoints for the ASGI deployment.
+
+These mirror the list and retrieve views for courses, lessons, assignments
+and enrollments with the same authentication, pagination and JSON output,
+but are plain Django async views on the async ORM. DRF views are
+synchronous, so under ASGI each of them occupies a worker thread for the
+whole request. These views instead give the event loop back while a query
+runs.
+
+Database connections are opened and closed per request by Django's
+``request_started``/``request_finished`` handling, as for sync views; keep
+``DB_CONN_MAX_AGE=0`` when serving through ASGI.
+
+``AsyncCourseEventsView`` streams a course's live submission and result
+events (``lmsapp.events``) as Server-Sent Events. It only works under ASGI,
+where an open stream costs a coroutine rather than a worker thread.
+
+``AsyncLoginView`` is ``LoginView`` with the password hash run in
+``lmsapp.login``'s bounded thread pool, so a burst of logins neither blocks
+the event loop nor queues without limit.
+"""
+import math
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from . import events, login
+from .authentication import CachedJWTAuthentication
+from .models import Assignment, Course, Enrollment, Lesson
+from .pagination import KeysetPagination
+from .renderers import InstrumentedJSONRenderer
+from .serializers import (AssignmentSerializer, CourseSerializer, EnrollmentSerializer, LessonSerializer,
+                          LoginSerializer)
+
+
+class AsyncJSONView(View):
+    """Async endpoint rendering DRF-compatible JSON."""
+    renderer = InstrumentedJSONRenderer()
+
+    def render(self, data, status_code=status.HTTP_200_OK):
+        return HttpResponse(
+            self.renderer.render(data), status=status_code, content_type='application/json',
+        )
+
+    def render_error(self, exc):
+        detail = exc.detail if isinstance(exc.detail, dict) else {'detail': exc.detail}
+        response = self.render(detail, exc.status_code)
+        if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+            response['WWW-Authenticate'] = 'Bearer realm="api"'
+        if getattr(exc, 'wait', None):
+            response['Retry-After'] = str(math.ceil(exc.wait))
+        return response
+
+
+class AsyncAPIView(AsyncJSONView):
+    """Authenticated async GET endpoint."""
+    http_method_names = ['get']
+    model = None
+    serializer_class = None
+
+    def get_queryset(self):
+        return self.model._default_manager.live()
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            result = await CachedJWTAuthentication().aauthenticate(request)
+        except APIException as exc:
+            return self.render_error(exc)
+        if result is None:
+            return self.render_error(NotAuthenticated())
+        request.user, request.auth = result
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class AsyncListView(AsyncAPIView):
+    """Keyset-paginated list, same shape as the DRF list views."""
+    ordering = ('id',)
+
+    async def get(self, request):
+        paginator = KeysetPagination()
+        try:
+            rows = await paginator.apaginate_queryset(self.get_queryset(), Request(request), view=self)
+        except APIException as exc:
+            return self.render_error(exc)
+        data = self.serializer_class(rows, many=True).data
+        return self.render(paginator.get_paginated_response(data).data)
+
+
+class AsyncRetrieveView(AsyncAPIView):
+
+    async def get(self, request, pk):
+        try:
+            obj = await self.get_queryset().aget(pk=pk)
+        except self.model.DoesNotExist:
+            return self.render(
+                {'detail': f'No {self.model._meta.object_name} matches the given query.'},
+                status.HTTP_404_NOT_FOUND,
+            )
+        return self.render(self.serializer_class(obj).data)
+
+
+class AsyncCourseListView(AsyncListView):
+    """Async list of courses."""
+    model = Course
+    serializer_class = CourseSerializer
+
+
+class AsyncCourseRetrieveView(AsyncRetrieveView):
+    """Async course detail."""
+    model = Course
+    serializer_class = CourseSerializer
+
+
+class AsyncLessonListView(AsyncListView):
+    """Async list of lessons."""
+    model = Lesson
+    serializer_class = LessonSerializer
+
+
+class AsyncLessonRetrieveView(AsyncRetrieveView):
+    """Async lesson detail."""
+    model = Lesson
+    serializer_class = LessonSerializer
+
+
+class AsyncAssignmentListView(AsyncListView):
+    """Async list of assignments, ordered like AssignmentListCreateView."""
+    model = Assignment
+    serializer_class = AssignmentSerializer
+    ordering = ('due_date', 'id')
+
+
+class AsyncAssignmentRetrieveView(AsyncRetrieveView):
+    """Async assignment detail."""
+    model = Assignment
+    serializer_class = AssignmentSerializer
+
+
+class AsyncEnrollmentListView(AsyncListView):
+    """Async list of enrollments."""
+    model = Enrollment
+    serializer_class = EnrollmentSerializer
+
+
+class AsyncEnrollmentRetrieveView(AsyncRetrieveView):
+    """Async enrollment detail."""
+    model = Enrollment
+    serializer_class = EnrollmentSerializer
+
+
+class AsyncCourseEventsView(AsyncAPIView):
+    """Server-Sent Events stream of one course's submission and result events."""
+    model = Course
+
+    def get_last_event_id(self, request):
+        value = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        try:
+            return int(value) if value else None
+        except ValueError:
+            return None
+
+    async def get(self, request, pk):
+        if not isinstance(request, ASGIRequest):
+            return self.render(
+                {'detail': 'The event stream is only served through ASGI.'}, status.HTTP_501_NOT_IMPLEMENTED,
+            )
+        if not await self.get_queryset().filter(pk=pk).aexists():
+            return self.render({'detail': 'No Course matches the given query.'}, status.HTTP_404_NOT_FOUND)
+        try:
+            frames = await events.open_stream(pk, self.get_last_event_id(request))
+        except events.TooManyStreams:
+            response = self.render(
+                {'detail': 'Too many open event streams; retry later.'}, status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+            response['Retry-After'] = str(events.RETRY_MS // 1000)
+            return response
+        response = StreamingHttpResponse(frames, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncLoginView(AsyncJSONView):
+    """Async login using phone and password, answering like ``LoginView``.
+
+    Exempt from CSRF checks like DRF's ``APIView``: clients log in without a
+    session, so there is no CSRF cookie to check against.
+    """
+    http_method_names = ['post']
+
+    async def post(self, request):
+        drf_request = Request(request, parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES])
+        try:
+            serializer = LoginSerializer(data=drf_request.data)
+            serializer.is_valid(raise_exception=True)
+            phone = serializer.validated_data['phone']
+            password = serializer.validated_data['password']
+            await sync_to_async(login.check_throttle)(request, phone)
+        except APIException as exc:
+            return self.render_error(exc)
+        try:
+            user = await login.aauthenticate(phone, password)
+        except login.HashPoolFull:
+            response = self.render(
+                {'detail': 'Too many logins in progress; retry later.'}, status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+            response['Retry-After'] = '1'
+            return response
+        if user is None:
+            return self.render(login.INVALID_CREDENTIALS, status.HTTP_400_BAD_REQUEST)
+        return self.render(login.success_payload(user))
@@ -0,0 +1,196 @@
+"""JWT authentication with cached user lookups.
+
+Access tokens carry the user's role and basic profile as claims, so views
+such as ``ProtectedView`` can answer from the token alone. The ``User`` row
+behind a token is resolved through a cache instead of one query per
+request: the Django cache when ``LMS_AUTH_USER_CACHE = 'django'`` (the
+default when ``LMS_CACHE_DIR`` configures a shared cache), otherwise a
+bounded in-process LRU. Entries are dropped when the user or their profile
+is saved or deleted, and expire after ``LMS_AUTH_USER_CACHE_TTL`` seconds
+regardless. The LRU only sees saves made in its own process, so with
+several workers and no shared cache a deactivated user keeps access for up
+to the TTL.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+def user_role(user):
+    if user.is_superuser:
+        return 'admin'
+    if user.is_staff:
+        return 'staff'
+    return 'member'
+
+
+class LmsRefreshToken(RefreshToken):
+    """Refresh token whose access tokens also carry role and profile claims."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        profile = getattr(user, 'profile', None)
+        token['role'] = user_role(user)
+        token['username'] = user.username
+        token['first_name'] = user.first_name
+        token['last_name'] = user.last_name
+        token['email'] = user.email
+        token['phone'] = profile.phone if profile is not None else None
+        return token
+
+
+class LRUCache:
+    """Small thread-safe LRU cache with a per-entry time to live."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class UserCache:
+    """Cache of ``User`` objects by primary key, local or backed by the Django cache."""
+
+    key_prefix = 'lms:auth-user:'
+
+    def __init__(self):
+        self.configure()
+
+    def configure(self):
+        self.backend = getattr(settings, 'LMS_AUTH_USER_CACHE', 'local')
+        self.ttl = getattr(settings, 'LMS_AUTH_USER_CACHE_TTL', 300)
+        self.local = LRUCache(getattr(settings, 'LMS_AUTH_USER_CACHE_SIZE', 10000), self.ttl)
+
+    def get(self, user_id):
+        if self.backend == 'django':
+            return cache.get(f'{self.key_prefix}{user_id}')
+        user = self.local.get(user_id)
+        # Each request gets its own copy so views cannot mutate the cached one.
+        return copy.copy(user) if user is not None else None
+
+    def set(self, user_id, user):
+        if self.backend == 'django':
+            cache.set(f'{self.key_prefix}{user_id}', user, self.ttl)
+        else:
+            self.local.set(user_id, copy.copy(user))
+
+    async def aget(self, user_id):
+        if self.backend == 'django':
+            return await cache.aget(f'{self.key_prefix}{user_id}')
+        return self.get(user_id)
+
+    async def aset(self, user_id, user):
+        if self.backend == 'django':
+            await cache.aset(f'{self.key_prefix}{user_id}', user, self.ttl)
+        else:
+            self.set(user_id, user)
+
+    def delete(self, user_id):
+        if self.backend == 'django':
+            cache.delete(f'{self.key_prefix}{user_id}')
+        else:
+            self.local.delete(user_id)
+
+
+user_cache = UserCache()
+
+
+@receiver(setting_changed)
+def reconfigure_user_cache(setting, **kwargs):
+    if setting.startswith('LMS_AUTH_USER_CACHE'):
+        user_cache.configure()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """``JWTAuthentication`` that resolves the user through ``user_cache``."""
+
+    def user_id_from_token(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    def check_user(self, user, validated_token):
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+        return user
+
+    def get_user(self, validated_token):
+        user_id = self.user_id_from_token(validated_token)
+        user = user_cache.get(user_id)
+        if user is None:
+            try:
+                user = self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            user_cache.set(user_id, user)
+        return self.check_user(user, validated_token)
+
+    async def aget_user(self, validated_token):
+        user_id = self.user_id_from_token(validated_token)
+        user = await user_cache.aget(user_id)
+        if user is None:
+            try:
+                user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            await user_cache.aset(user_id, user)
+        return self.check_user(user, validated_token)
+
+    async def aauthenticate(self, request):
+        """Async ``authenticate()`` for plain Django async views."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
@@ -0,0 +1,437 @@
+"""In-process API benchmark harness.
+
+``run_routes`` drives the GET routes in ``lmsapp.urls`` through Django's
+test client against whatever database is configured (normally one filled by
+``manage.py seed_lms``) and records latency percentiles, throughput and
+queries per request. Reports are plain JSON so runs from two commits can be
+compared with ``compare_reports``.
+"""
+import asyncio
+import datetime
+import math
+import platform
+import random
+import subprocess
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.urls import URLPattern, URLResolver, reverse
+from django.test import AsyncClient, Client
+from rest_framework.test import APIClient
+
+from . import urls as lms_urls
+from .fastpath import RowPlan, render_fast_json
+from .login import get_tokens_for_user
+from .models import Assignment, Course, Enrollment, Lesson, Results, Student, Submission, Teacher
+from .renderers import InstrumentedJSONRenderer
+from .serializers import EnrollmentSerializer, SubmissionSerializer
+
+# Extra query parameters or URL kwargs for routes that need them, and the
+# model to take ``pk`` from for views without a class-level queryset
+ROUTE_PARAMS = {
+    'course-search': {'query': {'q': 'intro'}},
+    'grade-export': {'kwargs': {'fmt': 'ndjson'}},
+    'course-stats': {'model': Course},
+    'assignment-stats': {'model': Assignment},
+    'student-upcoming': {'model': Student},
+    'submission-content': {'model': Submission},
+}
+
+# Sync DRF route -> async equivalent served by lmsapp.async_views
+ASYNC_ROUTE_PAIRS = {
+    'course-list': 'async-course-list',
+    'course-detail': 'async-course-detail',
+    'lesson-list': 'async-lesson-list',
+    'lesson-detail': 'async-lesson-detail',
+    'assignment-list': 'async-assignment-list',
+    'assignment-detail': 'async-assignment-detail',
+    'enrollment-list': 'async-enrollment-list',
+    'enrollment-detail': 'async-enrollment-detail',
+}
+
+# Routes that are not plain reads, or whose responses never end (event streams)
+SKIP_ROUTES = {'login', 'roster-import', 'async-course-events'}
+
+
+class QueryCounter:
+    """``execute_wrapper`` hook that counts queries on every connection."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not samples:
+        return None
+    rank = max(math.ceil(pct / 100 * len(samples)), 1)
+    return samples[rank - 1]
+
+
+def summarize(latencies, elapsed, queries=None):
+    latencies = sorted(latencies)
+    summary = {
+        'requests': len(latencies),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else None,
+    }
+    if queries is not None:
+        summary['queries_per_request'] = round(queries / len(latencies), 2)
+    return summary
+
+
+def iter_patterns(patterns, prefix=''):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_patterns(pattern.url_patterns, prefix + str(pattern.pattern))
+        elif isinstance(pattern, URLPattern):
+            yield prefix + str(pattern.pattern), pattern
+
+
+def discover_routes():
+    """Return ``(name, path_template, view_class)`` for every benchmarkable GET route."""
+    routes = []
+    for template, pattern in iter_patterns(lms_urls.urlpatterns):
+        view_class = getattr(pattern.callback, 'view_class', None)
+        if not template.startswith('api/') or pattern.name in SKIP_ROUTES:
+            continue
+        if view_class is None or not hasattr(view_class, 'get') or 'get' not in view_class.http_method_names:
+            continue
+        routes.append((pattern.name, template, view_class))
+    return routes
+
+
+def build_url(name, template, view_class):
+    """Fill in the route's URL kwargs, or return None if no object exists to point at."""
+    params = ROUTE_PARAMS.get(name, {})
+    kwargs = dict(params.get('kwargs', {}))
+    if '<int:pk>' in template:
+        queryset = getattr(view_class, 'queryset', None)
+        model = params.get('model') or (
+            queryset.model if queryset is not None else getattr(view_class, 'model', None)
+        )
+        if model is None:
+            return None
+        pk = model._default_manager.order_by('pk').values_list('pk', flat=True).first()
+        if pk is None:
+            return None
+        kwargs['pk'] = pk
+    return reverse(name, kwargs=kwargs), params.get('query', {})
+
+
+def timed_get(client, url, query):
+    started = time.perf_counter()
+    response = client.get(url, query)
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    elapsed = time.perf_counter() - started
+    if response.status_code >= 400:
+        raise RuntimeError(f'GET {url} returned {response.status_code}')
+    return elapsed
+
+
+def run_route(client, url, query, iterations, warmup):
+    counter = QueryCounter()
+    for _ in range(warmup):
+        timed_get(client, url, query)
+    latencies = []
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(counter))
+        started = time.perf_counter()
+        for _ in range(iterations):
+            latencies.append(timed_get(client, url, query))
+        elapsed = time.perf_counter() - started
+    return summarize(latencies, elapsed, counter.count)
+
+
+def authenticated_client(user):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(user)['access']}")
+    return client
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def dataset_counts():
+    return {
+        model.__name__: model._default_manager.count()
+        for model in (Teacher, Student, Course, Lesson, Assignment, Enrollment, Submission, Results)
+    }
+
+
+def run_routes(user, iterations=50, warmup=5, only=None, client=None):
+    """Benchmark every discovered route and return a JSON-serializable report."""
+    client = client or authenticated_client(user)
+    report = {
+        'revision': git_revision(),
+        'started_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'database': connections['default'].vendor,
+        'iterations': iterations,
+        'dataset': dataset_counts(),
+        'routes': {},
+    }
+    for name, template, view_class in discover_routes():
+        if only and name not in only:
+            continue
+        target = build_url(name, template, view_class)
+        if target is None:
+            report['routes'][name] = {'skipped': 'no object to request'}
+            continue
+        url, query = target
+        report['routes'][name] = {'url': url, **run_route(client, url, query, iterations, warmup)}
+    return report
+
+
+def compare_reports(baseline, current, threshold=0.1):
+    """Return ``(name, metric, before, after)`` for metrics that got worse by more than ``threshold``."""
+    regressions = []
+    for name, after in current['routes'].items():
+        before = baseline.get('routes', {}).get(name)
+        if not before or 'skipped' in before or 'skipped' in after:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if after[metric] > before[metric] * (1 + threshold):
+                regressions.append((name, metric, before[metric], after[metric]))
+        if after['queries_per_request'] > before['queries_per_request']:
+            regressions.append((name, 'queries_per_request', before['queries_per_request'], after['queries_per_request']))
+    return regressions
+
+
+def run_wsgi_load(url, token, concurrency, total):
+    """Issue ``total`` GETs through the WSGI handler from ``concurrency`` threads."""
+    def worker(count):
+        client = Client()
+        headers = {'Authorization': f'Bearer {token}'}
+        latencies = []
+        for _ in range(count):
+            started = time.perf_counter()
+            response = client.get(url, headers=headers)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise RuntimeError(f'GET {url} returned {response.status_code}')
+        return latencies
+
+    shares = [total // concurrency + (i < total % concurrency) for i in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(worker, shares))
+    elapsed = time.perf_counter() - started
+    return summarize([latency for latencies in results for latency in latencies], elapsed)
+
+
+async def _run_asgi_load(url, token, concurrency, total):
+    client = AsyncClient()
+    headers = {'Authorization': f'Bearer {token}'}
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get(url, headers=headers)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise RuntimeError(f'GET {url} returned {response.status_code}')
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def run_asgi_load(url, token, concurrency, total):
+    """Issue ``total`` GETs through the ASGI handler with ``concurrency`` in flight."""
+    return asyncio.run(_run_asgi_load(url, token, concurrency, total))
+
+
+def compare_sync_async(user, concurrency_levels=(1, 8, 32), total=400, only=None):
+    """Run each sync route and its async twin under the same load and report both."""
+    token = get_tokens_for_user(user)['access']
+    routes = {name: (template, view_class) for name, template, view_class in discover_routes()}
+    report = {
+        'revision': git_revision(),
+        'started_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'database': connections['default'].vendor,
+        'requests_per_level': total,
+        'dataset': dataset_counts(),
+        'routes': {},
+    }
+    for sync_name, async_name in ASYNC_ROUTE_PAIRS.items():
+        if only and sync_name not in only:
+            continue
+        sync_target = build_url(sync_name, *routes[sync_name])
+        async_target = build_url(async_name, *routes[async_name])
+        if sync_target is None or async_target is None:
+            report['routes'][sync_name] = {'skipped': 'no object to request'}
+            continue
+        levels = {}
+        for concurrency in concurrency_levels:
+            levels[str(concurrency)] = {
+                'wsgi': run_wsgi_load(sync_target[0], token, concurrency, total),
+                'asgi': run_asgi_load(async_target[0], token, concurrency, total),
+            }
+        report['routes'][sync_name] = levels
+    return report
+
+
+# Phones with no account used by login_benchmark's unknown-phone attempts
+UNKNOWN_LOGIN_PHONES = 50
+
+
+def login_workload(phone, password, total, bad_ratio=0.5, seed=0):
+    """Shuffled login bodies: good logins, wrong passwords and unknown phones.
+
+    The bad share is split evenly between wrong passwords for ``phone`` and
+    phones with no account, cycled over ``UNKNOWN_LOGIN_PHONES`` numbers so
+    the unknown-phone cache gets hit.
+    """
+    bad = round(total * bad_ratio)
+    bodies = [{'phone': phone, 'password': password} for _ in range(total - bad)]
+    bodies += [{'phone': phone, 'password': f'{password}-wrong'} for _ in range(bad // 2)]
+    bodies += [
+        {'phone': f'bench-unknown-{i % UNKNOWN_LOGIN_PHONES}', 'password': password}
+        for i in range(bad - bad // 2)
+    ]
+    random.Random(seed).shuffle(bodies)
+    return bodies
+
+
+def _login_summary(results, elapsed):
+    statuses = Counter(status for status, _ in results)
+    summary = summarize([latency for _, latency in results], elapsed)
+    summary['statuses'] = {str(status): count for status, count in sorted(statuses.items())}
+    summary['successful_logins_per_second'] = round(statuses[200] / elapsed, 2) if elapsed else None
+    return summary
+
+
+def run_wsgi_logins(url, bodies, concurrency):
+    """POST ``bodies`` through the WSGI handler from ``concurrency`` threads."""
+    def worker(share):
+        client = Client()
+        results = []
+        for body in share:
+            started = time.perf_counter()
+            response = client.post(url, body, content_type='application/json')
+            results.append((response.status_code, time.perf_counter() - started))
+        return results
+
+    shares = [bodies[i::concurrency] for i in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = [result for share in pool.map(worker, shares) for result in share]
+    return _login_summary(results, time.perf_counter() - started)
+
+
+async def _run_asgi_logins(url, bodies, concurrency):
+    client = AsyncClient()
+    semaphore = asyncio.Semaphore(concurrency)
+    results = []
+
+    async def one(body):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post(url, body, content_type='application/json')
+            results.append((response.status_code, time.perf_counter() - started))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(body) for body in bodies))
+    return _login_summary(results, time.perf_counter() - started)
+
+
+def run_asgi_logins(url, bodies, concurrency):
+    """POST ``bodies`` through the ASGI handler with ``concurrency`` in flight."""
+    return asyncio.run(_run_asgi_logins(url, bodies, concurrency))
+
+
+def login_benchmark(phone, password, concurrency_levels=(1, 8, 32), total=200, bad_ratio=0.5):
+    """Logins per second through ``LoginView`` and ``AsyncLoginView`` under a mixed workload."""
+    bodies = login_workload(phone, password, total, bad_ratio)
+    report = {
+        'revision': git_revision(),
+        'started_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'database': connections['default'].vendor,
+        'requests_per_level': total,
+        'bad_ratio': bad_ratio,
+        'levels': {},
+    }
+    for concurrency in concurrency_levels:
+        report['levels'][str(concurrency)] = {
+            'wsgi': run_wsgi_logins(reverse('login'), bodies, concurrency),
+            'asgi': run_asgi_logins(reverse('async-login'), bodies, concurrency),
+        }
+    return report
+
+
+# Querysets and serializers compared by serializer_microbenchmark
+SERIALIZER_CASES = {
+    'submission': (Submission, SubmissionSerializer),
+    'enrollment': (Enrollment, EnrollmentSerializer),
+}
+
+
+def _best_of(repeat, func):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def serializer_microbenchmark(rows=2000, repeat=5):
+    """Per-row cost of ``ModelSerializer`` + ``JSONRenderer`` against ``RowPlan`` + fast rendering.
+
+    Rows are fetched once up front so only conversion and encoding are timed.
+    """
+    renderer = InstrumentedJSONRenderer()
+    report = {}
+    for name, (model, serializer_class) in SERIALIZER_CASES.items():
+        instances = list(model._default_manager.order_by('id')[:rows])
+        if not instances:
+            report[name] = {'skipped': 'no rows'}
+            continue
+        plan = RowPlan.compile(serializer_class())
+        if plan is None:
+            report[name] = {'skipped': 'the fast path cannot serve this serializer'}
+            continue
+        values = list(model._default_manager.order_by('id').values(*plan.columns)[:rows])
+
+        def model_serializer():
+            renderer.render(serializer_class(instances, many=True).data)
+
+        def row_plan():
+            data, safe = plan.rows(values)
+            if not (safe and render_fast_json(data)):
+                renderer.render(data)
+
+        slow = _best_of(repeat, model_serializer)
+        fast = _best_of(repeat, row_plan)
+        report[name] = {
+            'rows': len(instances),
+            'model_serializer_us_per_row': round(slow / len(instances) * 1e6, 3),
+            'row_plan_us_per_row': round(fast / len(instances) * 1e6, 3),
+            'speedup': round(slow / fast, 1),
+        }
+    return report
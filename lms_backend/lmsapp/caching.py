@@ -0,0 +1,156 @@
+"""Rendered response cache with conditional GET support.
+
+Views using ``CachedResponseMixin`` store the rendered JSON of successful
+GETs in the Django cache, keyed by the host, full path and query string, the
+caller's auth scope (their role) and the current version of every resource
+the view depends on. Responses carry a strong ``ETag`` and a
+``Last-Modified`` date, so clients revalidating an unchanged resource get
+``304 Not Modified`` without the queryset or serializer running.
+
+A resource's version is bumped from model signals once the writing
+transaction commits. That changes every key that depends on the resource,
+so stale entries are never read again and simply expire. Writes that skip
+signals, such as ``bulk_create``, must call ``invalidate()`` themselves.
+
+Works with any cache backend; use a shared one (e.g. file-based) when
+running several workers so they all see version bumps.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from rest_framework.response import Response
+
+from . import routing
+from .authentication import user_role
+
+VERSION_KEY = 'lms:resp-version:{}'
+ENTRY_KEY = 'lms:resp:{}'
+
+
+def cache_ttl():
+    return getattr(settings, 'LMS_RESPONSE_CACHE_TTL', 300)
+
+
+def resource_versions(resources):
+    """Return ``{resource: version}``, starting unknown resources at the current time."""
+    keys = {resource: VERSION_KEY.format(resource) for resource in resources}
+    found = cache.get_many(keys.values())
+    versions = {}
+    for resource, key in keys.items():
+        version = found.get(key)
+        if version is None:
+            version = time.time_ns()
+            cache.add(key, version, None)
+            version = cache.get(key, version)
+        versions[resource] = version
+    return versions
+
+
+def invalidate(*resources):
+    """Bump the version of ``resources`` once the current transaction commits."""
+    def bump():
+        now = time.time_ns()
+        cache.set_many({VERSION_KEY.format(resource): now for resource in resources}, None)
+
+    transaction.on_commit(bump)
+
+
+def auth_scope(request):
+    token = request.auth
+    if token is not None and hasattr(token, 'get') and token.get('role'):
+        return token['role']
+    if request.user and request.user.is_authenticated:
+        return user_role(request.user)
+    return 'anon'
+
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    return etag in [tag.strip().removeprefix('W/') for tag in header.split(',')]
+
+
+def _not_modified(request, etag, last_modified):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return if_modified_since is not None and last_modified <= if_modified_since
+
+
+class CachedResponseMixin:
+    """Cache rendered GET responses and answer conditional GETs with 304.
+
+    ``cache_resources`` lists the model names whose changes invalidate the
+    view; it defaults to the model of ``queryset``.
+    """
+    cache_resources = None
+
+    def get_cache_resources(self):
+        if self.cache_resources is not None:
+            return self.cache_resources
+        return (self.queryset.model._meta.model_name,)
+
+    def _cache_key(self, request):
+        versions = resource_versions(self.get_cache_resources())
+        raw = '|'.join([
+            request.get_host(),
+            request.get_full_path(),
+            auth_scope(request),
+            *(f'{resource}={version}' for resource, version in sorted(versions.items())),
+        ])
+        last_modified = max(versions.values()) // 1_000_000_000
+        return ENTRY_KEY.format(hashlib.sha256(raw.encode()).hexdigest()), last_modified
+
+    def _cacheable(self, request):
+        return (
+            request.method == 'GET' and cache_ttl() > 0
+            and getattr(request, 'accepted_renderer', None) is not None
+            and request.accepted_renderer.format == 'json'
+        )
+
+    def _conditional_response(self, request, content, content_type, etag, last_modified):
+        if _not_modified(request, etag, last_modified):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type=content_type)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'private, no-cache'
+        response['Vary'] = 'Accept, Authorization'
+        return response
+
+    def get(self, request, *args, **kwargs):
+        if not self._cacheable(request):
+            return super().get(request, *args, **kwargs)
+        key, last_modified = self._cache_key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            content, content_type, etag = entry
+            return self._conditional_response(request, content, content_type, etag, last_modified)
+        self._response_cache_slot = (key, last_modified)
+        return super().get(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        slot = getattr(self, '_response_cache_slot', None)
+        if slot is None or not isinstance(response, Response) or response.status_code != 200:
+            return response
+        self._response_cache_slot = None
+        key, last_modified = slot
+        if routing.replica_in_use() and time.time() - last_modified < routing.pin_seconds():
+            # Read from a replica that may not have replayed the write behind this version yet
+            return response
+        response.render()
+        content = response.content
+        etag = quote_etag(hashlib.sha256(content).hexdigest()[:32])
+        content_type = response['Content-Type']
+        cache.set(key, (content, content_type, etag), cache_ttl())
+        return self._conditional_response(request, content, content_type, etag, last_modified)
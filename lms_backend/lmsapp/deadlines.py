@@ -0,0 +1,133 @@
+"""Per-student deadline index behind ``/api/student/<pk>/upcoming/``.
+
+``Deadline`` holds one row for every enrolled student and assignment of the
+course, with a copy of the assignment's due date and whether the student has
+submitted. A partial ``(student, due_date, id)`` index over the unsubmitted
+rows makes a student's pending work one index range scan however many
+courses they take, instead of a join of enrollments, assignments and
+submissions.
+
+Model signals keep the rows current: enrolling adds a row per assignment of
+the course, a new assignment adds a row per enrolled student, due-date
+changes and submissions update rows in place, and unenrolling removes them
+(deleted assignments and students cascade). Archiving a course drops its
+rows. Roster imports, which skip signals, call ``enrollments_created``;
+``manage.py rebuild_deadlines`` recomputes everything from the base tables.
+"""
+from django.db import connection, transaction
+
+from .models import Assignment, Course, Deadline, Enrollment, Submission
+
+# Rows for the enrollment/assignment pairs matching ``{where}``; existing rows are kept
+FILL_SQL = '''
+    INSERT INTO {deadline} (student_id, assignment_id, course_id, due_date, submitted)
+    SELECT e.student_id, a.id, a.course_id, a.due_date, EXISTS (
+        SELECT 1 FROM {submission} s WHERE s.student_id = e.student_id AND s.assignment_id = a.id
+    )
+    FROM {enrollment} e
+    JOIN {assignment} a ON a.course_id = e.course_id
+    JOIN {course} c ON c.id = e.course_id
+    WHERE NOT c.is_deleted AND {where}
+    ON CONFLICT (student_id, assignment_id) DO NOTHING
+'''
+
+# Fields whose old values ``*_saved`` needs to move rows, read before the save
+TRACKED_FIELDS = {
+    Enrollment: ('student_id', 'course_id'),
+    Assignment: ('course_id',),
+    Submission: ('student_id', 'assignment_id'),
+}
+
+
+def _fill(where, params=()):
+    tables = {
+        model._meta.model_name: connection.ops.quote_name(model._meta.db_table)
+        for model in (Deadline, Submission, Enrollment, Assignment, Course)
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(FILL_SQL.format(where=where, **tables), params)
+        return cursor.rowcount
+
+
+def _delete(**lookups):
+    # Nothing points at deadline rows, so skip the collector's SELECT
+    Deadline.objects.filter(**lookups)._raw_delete(Deadline.objects.db)
+
+
+def _placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def rebuild(course_ids=None):
+    """Recompute the rows of ``course_ids`` (all courses if None); return how many were written."""
+    with transaction.atomic():
+        if course_ids is None:
+            _delete()
+            return _fill('1 = 1')
+        course_ids = list(course_ids)
+        if not course_ids:
+            return 0
+        _delete(course_id__in=course_ids)
+        return _fill(f'e.course_id IN ({_placeholders(course_ids)})', course_ids)
+
+
+def previous_values(instance):
+    """Signal hook (pre_save): the stored values of ``instance``'s tracked fields, or None if it is new."""
+    if instance.pk is None:
+        return None
+    fields = TRACKED_FIELDS[type(instance)]
+    return type(instance)._base_manager.filter(pk=instance.pk).values_list(*fields).first()
+
+
+def enrollment_saved(enrollment, previous):
+    if previous == (enrollment.student_id, enrollment.course_id):
+        return
+    if previous is not None:
+        student_id, course_id = previous
+        _delete(student_id=student_id, course_id=course_id)
+    _fill('e.id = %s', [enrollment.pk])
+
+
+def enrollments_created(enrollments):
+    """Add the rows for enrollments written without signals (roster imports)."""
+    students = list({enrollment.student_id for enrollment in enrollments})
+    courses = list({enrollment.course_id for enrollment in enrollments})
+    if students:
+        _fill(
+            f'e.student_id IN ({_placeholders(students)}) AND e.course_id IN ({_placeholders(courses)})',
+            students + courses,
+        )
+
+
+def enrollment_deleted(enrollment):
+    _delete(student_id=enrollment.student_id, course_id=enrollment.course_id)
+
+
+def assignment_saved(assignment, previous):
+    if previous is not None and previous == (assignment.course_id,):
+        Deadline.objects.filter(assignment_id=assignment.pk).exclude(due_date=assignment.due_date).update(
+            due_date=assignment.due_date,
+        )
+        return
+    if previous is not None:
+        _delete(assignment_id=assignment.pk)
+    _fill('a.id = %s', [assignment.pk])
+
+
+def submission_saved(submission, previous):
+    if previous is not None and previous != (submission.student_id, submission.assignment_id):
+        student_id, assignment_id = previous
+        Deadline.objects.filter(student_id=student_id, assignment_id=assignment_id).update(submitted=False)
+    Deadline.objects.filter(
+        student_id=submission.student_id, assignment_id=submission.assignment_id, submitted=False,
+    ).update(submitted=True)
+
+
+def submission_deleted(submission):
+    Deadline.objects.filter(student_id=submission.student_id, assignment_id=submission.assignment_id).update(
+        submitted=False,
+    )
+
+
+def courses_archived(course_ids):
+    _delete(course_id__in=list(course_ids))
@@ -0,0 +1,329 @@
+"""Live feed of submission and result events, streamed as Server-Sent Events.
+
+The ``Submission``/``Results`` save signals (and bulk grading, which skips
+them) publish create and update events once the write has committed. Each
+event goes to the configured backend (``LMS_EVENTS_BACKEND``), which numbers
+it, keeps it for replay and hands it to this worker's ``Hub``; the hub fans
+it out to the open streams of the event's course.
+
+``LocalBackend`` keeps everything in process memory, so only streams on the
+worker that handled the write see an event; it suits a single ASGI worker.
+With several workers use ``DatabaseBackend``, a broker stand-in on the
+``FeedEvent`` table: publishing inserts a row, and one poller task per
+worker fans new rows out to that worker's streams. Both backends replay the
+events after a reconnecting client's ``Last-Event-ID``, as far back as they
+keep them.
+
+Each stream reads from a bounded queue (``LMS_EVENTS_QUEUE_SIZE``). A client
+that falls that far behind is disconnected instead of buffered without
+limit, and catches up from its ``Last-Event-ID`` when it reconnects. A
+worker serves at most ``LMS_EVENTS_MAX_CONNECTIONS`` streams at once.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models import Max
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Assignment, FeedEvent, Submission
+
+logger = logging.getLogger('lmsapp.events')
+
+Event = namedtuple('Event', 'id kind course_id data')
+
+# Reconnect delay sent to EventSource clients
+RETRY_MS = 3000
+# Rows below the poller's cursor read again, for inserts that committed out of id order
+POLL_LOOKBACK = 100
+POLL_BATCH = 500
+PRUNE_EVERY_SECONDS = 60
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class TooManyStreams(Exception):
+    """This worker already serves ``LMS_EVENTS_MAX_CONNECTIONS`` streams."""
+
+
+class Stream:
+    """One client's subscription to a course: a bounded queue filled from any thread.
+
+    Iterating it yields the SSE frames; the response closes it when the
+    client goes away.
+    """
+
+    def __init__(self, hub, course_id, after, loop, size):
+        self.hub = hub
+        self.course_id = course_id
+        self.after = after
+        self.loop = loop
+        self.queue = asyncio.Queue(size)
+        self.overflowed = False
+
+    async def __aiter__(self):
+        try:
+            yield f'retry: {RETRY_MS}\n\n'
+            last = self.after or 0
+            if self.after is not None:
+                for event in await backend().replay(self.course_id, self.after):
+                    yield format_event(event)
+                    last = event.id
+            keepalive = _setting('LMS_EVENTS_KEEPALIVE_SECONDS', 15)
+            while True:
+                try:
+                    event = await asyncio.wait_for(self.queue.get(), keepalive)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                if event is None:
+                    break
+                # Already replayed
+                if event.id <= last:
+                    continue
+                yield format_event(event)
+                last = event.id
+        finally:
+            self.close()
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+    def push(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The stream's event loop has shut down
+            self.overflowed = True
+
+    def _put(self, event):
+        if self.overflowed:
+            return
+        if self.queue.full():
+            # Drop everything queued so the client resumes from the last event it actually got
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+            logger.info('Disconnecting a slow event stream for course %s', self.course_id)
+            return
+        self.queue.put_nowait(event)
+
+
+class Hub:
+    """The open streams of this worker, by course."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.streams = {}
+        self.count = 0
+
+    def subscribe(self, course_id, after=None):
+        with self.lock:
+            if self.count >= _setting('LMS_EVENTS_MAX_CONNECTIONS', 1000):
+                raise TooManyStreams()
+            loop = asyncio.get_running_loop()
+            stream = Stream(self, course_id, after, loop, _setting('LMS_EVENTS_QUEUE_SIZE', 100))
+            self.streams.setdefault(course_id, set()).add(stream)
+            self.count += 1
+        return stream
+
+    def unsubscribe(self, stream):
+        with self.lock:
+            streams = self.streams.get(stream.course_id, set())
+            if stream in streams:
+                streams.discard(stream)
+                self.count -= 1
+                if not streams:
+                    del self.streams[stream.course_id]
+
+    def dispatch(self, event):
+        with self.lock:
+            streams = list(self.streams.get(event.course_id, ()))
+        for stream in streams:
+            stream.push(event)
+
+
+class LocalBackend:
+    """In-process fan-out; events are numbered by this worker and kept in a ring buffer."""
+
+    def __init__(self, hub):
+        self.hub = hub
+        self.lock = threading.Lock()
+        self.buffer = deque(maxlen=_setting('LMS_EVENTS_BUFFER_SIZE', 1000))
+        self.last_id = 0
+
+    def publish(self, items):
+        events = []
+        with self.lock:
+            for kind, course_id, data in items:
+                # Microsecond timestamps, so ids keep increasing across restarts
+                self.last_id = max(self.last_id + 1, time.time_ns() // 1000)
+                events.append(Event(self.last_id, kind, course_id, data))
+            self.buffer.extend(events)
+        for event in events:
+            self.hub.dispatch(event)
+        return events
+
+    async def attach(self):
+        pass
+
+    async def replay(self, course_id, after):
+        with self.lock:
+            events = list(self.buffer)
+        return [event for event in events if event.course_id == course_id and event.id > after]
+
+
+class DatabaseBackend:
+    """Fan-out across workers through the ``FeedEvent`` table, polled by each worker."""
+
+    def __init__(self, hub):
+        self.hub = hub
+        self.poller = None
+        self.cursor = None
+        # Rows at or below this existed before the first stream opened
+        self.floor = None
+        self.seen = deque(maxlen=POLL_LOOKBACK + POLL_BATCH)
+        self.pruned_at = 0
+
+    def publish(self, items):
+        # Every worker's poller, this one's included, delivers them
+        rows = FeedEvent.objects.bulk_create([
+            FeedEvent(kind=kind, course_id=course_id, data=data) for kind, course_id, data in items
+        ])
+        return [Event(row.pk, row.kind, row.course_id, row.data) for row in rows]
+
+    async def attach(self):
+        """Start this worker's poller on the running event loop if it is not polling yet."""
+        loop = asyncio.get_running_loop()
+        if self.poller is not None and not self.poller.done() and self.poller.get_loop() is loop:
+            return
+        if self.cursor is None:
+            self.cursor = self.floor = (await FeedEvent.objects.aaggregate(last=Max('id')))['last'] or 0
+        self.poller = loop.create_task(self.poll())
+
+    async def poll(self):
+        # Stops once nobody is listening; the next subscriber starts it again
+        while self.hub.count:
+            try:
+                full = await self.poll_once()
+                await self.prune()
+            except Exception:
+                logger.exception('Polling feed events failed')
+                full = False
+            if not full:
+                await asyncio.sleep(_setting('LMS_EVENTS_POLL_SECONDS', 0.5))
+
+    async def poll_once(self):
+        """Dispatch rows not seen yet; return True if a full batch was read."""
+        start = max(self.cursor - POLL_LOOKBACK, self.floor)
+        rows = FeedEvent.objects.filter(id__gt=start).order_by('id')[:POLL_BATCH]
+        count = 0
+        async for row in rows:
+            count += 1
+            self.cursor = max(self.cursor, row.pk)
+            if row.pk in self.seen:
+                continue
+            self.seen.append(row.pk)
+            self.hub.dispatch(Event(row.pk, row.kind, row.course_id, row.data))
+        return count == POLL_BATCH
+
+    async def prune(self):
+        now = time.monotonic()
+        if now - self.pruned_at < PRUNE_EVERY_SECONDS:
+            return
+        self.pruned_at = now
+        cutoff = timezone.now() - timedelta(seconds=_setting('LMS_EVENTS_RETENTION_SECONDS', 3600))
+        await FeedEvent.objects.filter(created_at__lt=cutoff).adelete()
+
+    async def replay(self, course_id, after):
+        rows = (
+            FeedEvent.objects.filter(course_id=course_id, id__gt=after)
+            .order_by('id')[:_setting('LMS_EVENTS_BUFFER_SIZE', 1000)]
+        )
+        return [Event(row.pk, row.kind, row.course_id, row.data) async for row in rows]
+
+
+hub = Hub()
+_backend = None
+
+
+def backend():
+    global _backend
+    if _backend is None:
+        _backend = import_string(_setting('LMS_EVENTS_BACKEND', 'lmsapp.events.LocalBackend'))(hub)
+    return _backend
+
+
+@receiver(setting_changed)
+def reset_backend(setting, **kwargs):
+    global _backend
+    if setting.startswith('LMS_EVENTS_'):
+        _backend = None
+
+
+def publish(items):
+    """Send ``(kind, course_id, data)`` events to their course's streams once the current transaction commits."""
+    items = list(items)
+    if items:
+        transaction.on_commit(lambda: backend().publish(items), robust=True)
+
+
+def submission_saved(submission, created):
+    course_id = Assignment.objects.values_list('course_id', flat=True).get(pk=submission.assignment_id)
+    publish([('submission.created' if created else 'submission.updated', course_id, {
+        'id': submission.pk,
+        'assignment': submission.assignment_id,
+        'student': submission.student_id,
+        'submitted_at': submission.submitted_at.isoformat(),
+    })])
+
+
+def result_saved(result, created):
+    assignment_id, course_id = (
+        Submission.objects.values_list('assignment_id', 'assignment__course_id').get(pk=result.submission_id)
+    )
+    publish([('results.created' if created else 'results.updated', course_id, {
+        'id': result.pk, 'submission': result.submission_id, 'assignment': assignment_id, 'score': result.score,
+    })])
+
+
+def results_graded(course_id, assignment_id, results, graded):
+    """Publish bulk-graded ``results``; ``graded`` maps submission ids to whether they had a result."""
+    publish(
+        ('results.updated' if graded[result.submission_id] else 'results.created', course_id, {
+            'id': result.pk, 'submission': result.submission_id, 'assignment': assignment_id, 'score': result.score,
+        })
+        for result in results
+    )
+
+
+def format_event(event):
+    data = json.dumps(event.data, separators=(',', ':'))
+    return f'id: {event.id}\nevent: {event.kind}\ndata: {data}\n\n'
+
+
+async def open_stream(course_id, after=None):
+    """Subscribe to ``course_id`` and return the ``Stream`` to send as the response body.
+
+    Events after ``after`` (the client's ``Last-Event-ID``) are replayed
+    first. Raises ``TooManyStreams`` if this worker is full.
+    """
+    stream = hub.subscribe(course_id, after)
+    try:
+        await backend().attach()
+    except BaseException:
+        stream.close()
+        raise
+    return stream
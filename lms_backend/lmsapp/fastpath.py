@@ -0,0 +1,158 @@
+"""Fast read path for high-volume list endpoints.
+
+``FastListMixin`` serves GET list requests without instantiating serializer
+fields per row. For each serializer (and ``?fields=`` selection) a
+``RowPlan`` is compiled once: which column to read for every output field
+and which conversion, if any, that field's ``to_representation`` would
+apply. Rows are then read with ``QuerySet.values()`` and turned into plain
+dicts by the plan, and ``InstrumentedJSONRenderer`` encodes them with
+``orjson`` when it is installed.
+
+The output is byte-for-byte what the ``ModelSerializer`` path produces.
+Serializers with fields the plan does not know how to copy (nested or
+method fields, ``?expand=``) use the regular path, and pages holding floats
+that ``orjson`` would format differently from ``json`` are encoded with
+``json``. Set ``LMS_FAST_LIST = False`` to turn the fast path off.
+"""
+import math
+
+from django.conf import settings
+from rest_framework import serializers
+
+from .instrumentation import timed
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+# Fields whose to_representation returns database values unchanged
+_PASSTHROUGH = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.PrimaryKeyRelatedField,
+)
+# Fields converted with their own to_representation
+_CONVERTED = (
+    serializers.DateField,
+    serializers.DateTimeField,
+)
+
+
+def json_safe_float(value):
+    """True if ``orjson`` and ``json`` write ``value`` identically (no exponent, finite)."""
+    return value == 0 or (math.isfinite(value) and 1e-4 <= abs(value) < 1e16)
+
+
+class RowPlan:
+    """Precompiled mapping from ``values()`` columns to serializer output fields."""
+
+    def __init__(self, names, columns, converters, float_columns):
+        self.names = names
+        self.columns = columns
+        self.converters = converters
+        self.float_columns = float_columns
+
+    @classmethod
+    def compile(cls, serializer):
+        """Build a plan for ``serializer``'s fields, or return None if any field is unsupported."""
+        model = serializer.Meta.model
+        concrete = {field.name: field for field in model._meta.concrete_fields}
+        names, columns, converters, float_columns = [], [], [], []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            model_field = concrete.get(field.source)
+            if model_field is None:
+                return None
+            if isinstance(field, serializers.PrimaryKeyRelatedField):
+                if field.pk_field is not None:
+                    return None
+                converter = None
+            elif isinstance(field, _CONVERTED):
+                converter = field.to_representation
+            elif isinstance(field, serializers.FloatField):
+                converter = float
+                float_columns.append(len(columns))
+            elif isinstance(field, _PASSTHROUGH):
+                converter = None
+            else:
+                return None
+            names.append(name)
+            columns.append(model_field.attname)
+            converters.append(converter)
+        return cls(names, columns, converters, float_columns)
+
+    def rows(self, values):
+        """Convert ``values()`` dicts; returns ``(rows, orjson_safe)``."""
+        names, columns, converters = self.names, self.columns, self.converters
+        plain = all(converter is None for converter in converters)
+        rows = []
+        safe = True
+        for row in values:
+            if plain:
+                out = {name: row[column] for name, column in zip(names, columns)}
+            else:
+                out = {}
+                for name, column, converter in zip(names, columns, converters):
+                    value = row[column]
+                    out[name] = value if value is None or converter is None else converter(value)
+            rows.append(out)
+        for index in self.float_columns:
+            name = names[index]
+            if not all(row[name] is None or json_safe_float(row[name]) for row in rows):
+                safe = False
+        return rows, safe
+
+
+# (serializer class, field names) -> RowPlan or None
+_plans = {}
+
+
+class FastListMixin:
+    """Serve GET list requests through a ``RowPlan`` when the serializer allows it."""
+
+    def fast_path_enabled(self, request):
+        renderer = getattr(request, 'accepted_renderer', None)
+        return (
+            getattr(settings, 'LMS_FAST_LIST', True)
+            and renderer is not None and renderer.format == 'json'
+            and not request.query_params.get('expand')
+        )
+
+    def get_row_plan(self, serializer):
+        """Return the cached plan for this view's serializer and field selection."""
+        key = (type(serializer), tuple(serializer.fields))
+        if key not in _plans:
+            _plans[key] = RowPlan.compile(serializer)
+        return _plans[key]
+
+    def list(self, request, *args, **kwargs):
+        if not self.fast_path_enabled(request):
+            return super().list(request, *args, **kwargs)
+        plan = self.get_row_plan(self.get_serializer())
+        if plan is None or self.paginator is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        ordering = [field.lstrip('-') for field in getattr(self, 'ordering', None) or ('id',)]
+        columns = list(dict.fromkeys([*plan.columns, *ordering]))
+        page = self.paginator.paginate_queryset(queryset.values(*columns), request, view=self)
+        with timed('serialize'):
+            rows, safe = plan.rows(page)
+        response = self.paginator.get_paginated_response(rows)
+        response.fast_json = safe
+        return response
+
+
+def render_fast_json(data):
+    """Encode ``data`` like DRF's compact ``JSONRenderer``, or return None if orjson is unavailable."""
+    if orjson is None:
+        return None
+    try:
+        content = orjson.dumps(data)
+    except TypeError:
+        return None
+    return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
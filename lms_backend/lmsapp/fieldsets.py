@@ -0,0 +1,165 @@
+"""Sparse fieldsets (``?fields=``) and related-object expansion (``?expand=``).
+
+``FieldSelectionMixin`` lets a model serializer be built with ``fields=`` (keep
+only these fields) and ``expand=`` (replace these related-object ids with the
+nested serializers listed in ``Meta.expandable_fields``).
+
+``FieldSelectionViewMixin`` reads both from the query string on GET and
+shapes the queryset to match: ``only()`` limits the selected columns to the
+requested fields, and every expansion gets a ``select_related`` (forward
+relations) or ``prefetch_related`` (reverse relations), so expanding never
+adds a query per row. Unknown names are rejected with 400.
+
+Views may set ``default_fields`` to leave expensive fields out unless asked
+for, and serializers may list in ``Meta.field_relations`` fields that are
+read through a relation (e.g. a property), which is then select_related
+whenever the field is in the output, including inside an expansion.
+"""
+import sys
+
+from rest_framework.exceptions import ValidationError
+
+
+def parse_names(value):
+    """Split a comma-separated query parameter, or return None when absent or empty."""
+    if value is None:
+        return None
+    # ``?fields=`` or ``?fields=,`` is not a request for no fields at all
+    return [name.strip() for name in value.split(',') if name.strip()] or None
+
+
+def relation_field(model, attname):
+    """Return the relation reachable as ``model.<attname>``, forward or reverse."""
+    for field in model._meta.get_fields():
+        accessor = field.get_accessor_name() if field.auto_created and not field.concrete else field.name
+        if accessor == attname:
+            return field
+    raise LookupError(f'{model.__name__} has no relation {attname!r}')
+
+
+class FieldSelectionMixin:
+    """Serializer mixin adding ``fields`` and ``expand`` keyword arguments.
+
+    ``Meta.expandable_fields`` maps a field name to ``(serializer, options)``;
+    the serializer may be given by name, resolved in the serializer's module,
+    so serializers can expand to ones defined further down.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in expand or ():
+            serializer_class, options = self.get_expandable_fields()[name]
+            self.fields[name] = serializer_class(read_only=True, **options)
+        if fields is not None:
+            keep = set(fields) | set(expand or ())
+            for name in list(self.fields):
+                if name not in keep:
+                    self.fields.pop(name)
+
+    @classmethod
+    def get_expandable_fields(cls):
+        expandable = getattr(cls.Meta, 'expandable_fields', {})
+        module = sys.modules[cls.__module__]
+        return {
+            name: (getattr(module, serializer) if isinstance(serializer, str) else serializer, options)
+            for name, (serializer, options) in expandable.items()
+        }
+
+
+class FieldSelectionViewMixin:
+    """Apply ``?fields=`` and ``?expand=`` to the serializer and queryset of GET requests."""
+    fields_query_param = 'fields'
+    expand_query_param = 'expand'
+    default_fields = None
+    _field_selection = None
+
+    def get_field_selection(self):
+        """Return validated ``(fields, expand)`` for this request, either may be None."""
+        if self._field_selection is not None:
+            return self._field_selection
+        fields = expand = None
+        if self.request.method in ('GET', 'HEAD'):
+            params = self.request.query_params
+            fields = parse_names(params.get(self.fields_query_param))
+            if fields is None and self.default_fields is not None:
+                fields = list(self.default_fields)
+            expand = parse_names(params.get(self.expand_query_param))
+            serializer_class = self.get_serializer_class()
+            known = serializer_class().fields.keys()
+            expandable = serializer_class.get_expandable_fields().keys()
+            errors = {}
+            if fields is not None:
+                unknown = [name for name in fields if name not in known]
+                if unknown:
+                    errors[self.fields_query_param] = f"Unknown fields: {', '.join(unknown)}"
+            if expand is not None:
+                unknown = [name for name in expand if name not in expandable]
+                if unknown:
+                    errors[self.expand_query_param] = f"Cannot expand: {', '.join(unknown)}"
+            if errors:
+                raise ValidationError(errors)
+        self._field_selection = (fields, expand)
+        return self._field_selection
+
+    def get_serializer(self, *args, **kwargs):
+        fields, expand = self.get_field_selection()
+        if fields is not None:
+            kwargs.setdefault('fields', fields)
+        if expand:
+            kwargs.setdefault('expand', expand)
+        return super().get_serializer(*args, **kwargs)
+
+    def expanded_relations(self, expand):
+        """Yield ``(source, model_field, serializer_class)`` for every requested expansion."""
+        model = self.queryset.model
+        expandable = self.get_serializer_class().get_expandable_fields()
+        for name in expand:
+            serializer_class, options = expandable[name]
+            source = options.get('source', name)
+            yield source, relation_field(model, source), serializer_class
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields, expand = self.get_field_selection()
+        expand = expand or []
+        select, prefetch = [], []
+        for source, field, serializer_class in self.expanded_relations(expand):
+            related = select if field.concrete else prefetch
+            related.append(source)
+            # Nested serializers output every field, so join all their field relations
+            nested = getattr(serializer_class.Meta, 'field_relations', {})
+            related.extend(f'{source}__{relation}' for relation in nested.values())
+        field_relations = getattr(self.get_serializer_class().Meta, 'field_relations', {})
+        for name, relation in field_relations.items():
+            if (fields is None or name in fields) and relation not in select:
+                select.append(relation)
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        if fields is not None:
+            queryset = queryset.only(*self.selected_columns(fields, select))
+        return queryset
+
+    def selected_columns(self, fields, select):
+        """Model fields to load for ``fields``, plus the primary key, sort key and joined relations."""
+        model = self.queryset.model
+        serializer_fields = self.get_serializer_class()().fields
+        concrete = {field.name for field in model._meta.concrete_fields}
+        # Naming a nested relation would defer the rest of the expanded object's fields
+        columns = {model._meta.pk.name, *(relation for relation in select if '__' not in relation)}
+        columns.update(name.lstrip('-') for name in getattr(self, 'ordering', None) or ())
+        for name in fields:
+            source = serializer_fields[name].source
+            if source in concrete:
+                columns.add(source)
+        return sorted(columns - {'pk'})
+
+    def get_cache_resources(self):
+        resources = list(super().get_cache_resources())
+        _, expand = self.get_field_selection()
+        for _, field, _ in self.expanded_relations(expand or []):
+            resource = field.related_model._meta.model_name
+            if resource not in resources:
+                resources.append(resource)
+        return resources
@@ -0,0 +1,365 @@
+"""Precomputed gradebook statistics.
+
+``AssignmentStats`` and ``CourseStats`` hold, per assignment and per course,
+the submission and graded counts, the running sum and sum of squares of the
+scores, the lowest and highest score and a fixed-width score histogram
+(``LMS_GRADEBOOK_BINS`` bins over 0..``LMS_GRADEBOOK_MAX_SCORE``; scores
+outside that range land in the edge bins). Mean and standard deviation come
+from the sums; the median and percentiles are interpolated within the
+histogram, so they are exact to one bin width.
+
+Rows for a course are created the first time its stats are read, or by
+``rebuild``. From then on model signals keep them current: a saved or
+deleted result adjusts its assignment's row in place, and the course row is
+re-merged from its assignment rows. Writes that bypass signals (bulk grading,
+roster imports) call ``refresh`` or ``refresh_enrollment_counts``.
+``manage.py rebuild_gradebook`` recomputes everything from the base tables,
+vectorized with NumPy when it is installed.
+"""
+import math
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max, Min
+from django.utils import timezone
+
+from .models import Assignment, AssignmentStats, Course, CourseStats, Enrollment, Results, Submission
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+PERCENTILES = (25, 50, 75, 90)
+
+
+def bin_settings():
+    """Return ``(bins, max_score)``."""
+    return getattr(settings, 'LMS_GRADEBOOK_BINS', 100), float(getattr(settings, 'LMS_GRADEBOOK_MAX_SCORE', 100))
+
+
+def score_bin(score, bins, top):
+    return min(max(int(score * bins / top), 0), bins - 1)
+
+
+def empty_totals(bins):
+    return {
+        'graded_count': 0, 'score_sum': 0.0, 'score_sumsq': 0.0,
+        'min_score': None, 'max_score': None, 'histogram': [0] * bins,
+    }
+
+
+def _group_totals_python(keys, scores, bins, top):
+    totals = {}
+    for key, score in zip(keys, scores):
+        group = totals.get(key)
+        if group is None:
+            group = totals[key] = empty_totals(bins)
+        group['graded_count'] += 1
+        group['score_sum'] += score
+        group['score_sumsq'] += score * score
+        group['min_score'] = score if group['min_score'] is None else min(group['min_score'], score)
+        group['max_score'] = score if group['max_score'] is None else max(group['max_score'], score)
+        group['histogram'][score_bin(score, bins, top)] += 1
+    return totals
+
+
+def _group_totals_numpy(keys, scores, bins, top):
+    if not keys:
+        return {}
+    scores = np.asarray(scores, dtype=np.float64)
+    unique, inverse = np.unique(np.asarray(keys), return_inverse=True)
+    size = len(unique)
+    counts = np.bincount(inverse, minlength=size)
+    sums = np.bincount(inverse, weights=scores, minlength=size)
+    sumsq = np.bincount(inverse, weights=scores * scores, minlength=size)
+    mins = np.full(size, np.inf)
+    np.minimum.at(mins, inverse, scores)
+    maxs = np.full(size, -np.inf)
+    np.maximum.at(maxs, inverse, scores)
+    indexes = np.clip((scores * bins / top).astype(np.int64), 0, bins - 1)
+    histograms = np.bincount(inverse * bins + indexes, minlength=size * bins).reshape(size, bins)
+    return {
+        key: {
+            'graded_count': int(counts[i]), 'score_sum': float(sums[i]), 'score_sumsq': float(sumsq[i]),
+            'min_score': float(mins[i]), 'max_score': float(maxs[i]), 'histogram': histograms[i].tolist(),
+        }
+        for i, key in enumerate(unique.tolist())
+    }
+
+
+def group_totals(keys, scores, bins, top):
+    """Return ``{key: totals}`` for parallel lists of group keys and scores."""
+    if np is not None:
+        return _group_totals_numpy(keys, scores, bins, top)
+    return _group_totals_python(keys, scores, bins, top)
+
+
+def merge_totals(rows, bins):
+    """Combine assignment rollups into course totals."""
+    merged = empty_totals(bins)
+    merged['submission_count'] = 0
+    for row in rows:
+        merged['submission_count'] += row.submission_count
+        merged['graded_count'] += row.graded_count
+        merged['score_sum'] += row.score_sum
+        merged['score_sumsq'] += row.score_sumsq
+        for bound, pick in (('min_score', min), ('max_score', max)):
+            value = getattr(row, bound)
+            if value is not None:
+                merged[bound] = value if merged[bound] is None else pick(merged[bound], value)
+        for index, count in enumerate(row.histogram[:bins]):
+            merged['histogram'][index] += count
+    return merged
+
+
+@transaction.atomic
+def rebuild(course_ids=None):
+    """Recompute the rollups of ``course_ids`` (all courses if None) from the base tables.
+
+    Returns ``(assignment rows, course rows)`` written.
+    """
+    bins, top = bin_settings()
+    # Archived courses keep their rollups until lmsapp.purge removes them
+    courses = Course.all_objects.all()
+    assignments = Assignment.objects.all()
+    enrollments = Enrollment.objects.all()
+    results = Results.objects.all()
+    submissions = Submission.objects.all()
+    if course_ids is not None:
+        course_ids = list(course_ids)
+        courses = courses.filter(pk__in=course_ids)
+        assignments = assignments.filter(course_id__in=course_ids)
+        enrollments = enrollments.filter(course_id__in=course_ids)
+        results = results.filter(submission__assignment__course_id__in=course_ids)
+        submissions = submissions.filter(assignment__course_id__in=course_ids)
+
+    course_of = dict(assignments.values_list('id', 'course_id'))
+    keys, scores = [], []
+    for assignment_id, score in results.values_list('submission__assignment_id', 'score').iterator(chunk_size=5000):
+        keys.append(assignment_id)
+        scores.append(score)
+    totals = group_totals(keys, scores, bins, top)
+    submitted = dict(submissions.values_list('assignment_id').annotate(n=Count('id')).order_by())
+    enrolled = dict(enrollments.values_list('course_id').annotate(n=Count('id')).order_by())
+
+    assignment_rows = [
+        AssignmentStats(
+            assignment_id=assignment_id, course_id=course_id, submission_count=submitted.get(assignment_id, 0),
+            **totals.get(assignment_id, empty_totals(bins)),
+        )
+        for assignment_id, course_id in course_of.items()
+    ]
+    by_course = {course_id: [] for course_id in courses.values_list('id', flat=True)}
+    for row in assignment_rows:
+        by_course[row.course_id].append(row)
+    course_rows = [
+        CourseStats(
+            course_id=course_id, enrolled_count=enrolled.get(course_id, 0), assignment_count=len(rows),
+            **merge_totals(rows, bins),
+        )
+        for course_id, rows in by_course.items()
+    ]
+
+    stale_assignments = AssignmentStats.objects.all()
+    stale_courses = CourseStats.objects.all()
+    if course_ids is not None:
+        stale_assignments = stale_assignments.filter(course_id__in=course_ids)
+        stale_courses = stale_courses.filter(course_id__in=course_ids)
+    stale_assignments.delete()
+    stale_courses.delete()
+    AssignmentStats.objects.bulk_create(assignment_rows, batch_size=1000)
+    CourseStats.objects.bulk_create(course_rows, batch_size=1000)
+    return len(assignment_rows), len(course_rows)
+
+
+def refresh(course_ids):
+    """Rebuild the courses among ``course_ids`` whose rollups already exist."""
+    existing = list(CourseStats.objects.filter(course_id__in=set(course_ids)).values_list('course_id', flat=True))
+    if existing:
+        rebuild(existing)
+
+
+def refresh_enrollment_counts(course_ids):
+    counts = dict(
+        Enrollment.objects.filter(course_id__in=set(course_ids))
+        .values_list('course_id').annotate(n=Count('id')).order_by()
+    )
+    for course_id in set(course_ids):
+        CourseStats.objects.filter(pk=course_id).update(enrolled_count=counts.get(course_id, 0))
+
+
+def merge_course(course_id):
+    """Re-derive a course row from its assignment rows, if the course has one."""
+    bins, _ = bin_settings()
+    rows = list(AssignmentStats.objects.filter(course_id=course_id))
+    CourseStats.objects.filter(pk=course_id).update(
+        assignment_count=len(rows), updated_at=timezone.now(), **merge_totals(rows, bins),
+    )
+
+
+def apply_scores(assignment_id, added=(), removed=()):
+    """Add and remove scores on an assignment's row (no-op until the row exists)."""
+    bins, top = bin_settings()
+    with transaction.atomic():
+        row = AssignmentStats.objects.select_for_update().filter(pk=assignment_id).first()
+        if row is None:
+            return
+        if len(row.histogram) != bins:
+            rebuild([row.course_id])
+            return
+        for score in added:
+            row.graded_count += 1
+            row.score_sum += score
+            row.score_sumsq += score * score
+            row.min_score = score if row.min_score is None else min(row.min_score, score)
+            row.max_score = score if row.max_score is None else max(row.max_score, score)
+            row.histogram[score_bin(score, bins, top)] += 1
+        extremes_removed = False
+        for score in removed:
+            row.graded_count -= 1
+            row.score_sum -= score
+            row.score_sumsq -= score * score
+            row.histogram[score_bin(score, bins, top)] -= 1
+            extremes_removed = extremes_removed or score in (row.min_score, row.max_score)
+        if row.graded_count == 0:
+            row.score_sum = row.score_sumsq = 0.0
+            row.min_score = row.max_score = None
+        elif extremes_removed:
+            bounds = Results.objects.filter(submission__assignment_id=assignment_id).aggregate(
+                low=Min('score'), high=Max('score'),
+            )
+            row.min_score, row.max_score = bounds['low'], bounds['high']
+        row.save()
+        merge_course(row.course_id)
+
+
+def _assignment_of(submission_id):
+    return Submission.objects.filter(pk=submission_id).values_list('assignment_id', flat=True).first()
+
+
+def result_saved(result, previous):
+    """Signal hook; ``previous`` is the ``(submission_id, score)`` stored before the save, if any."""
+    assignment_id = _assignment_of(result.submission_id)
+    if previous is None:
+        apply_scores(assignment_id, added=[result.score])
+        return
+    previous_submission, previous_score = previous
+    if previous_submission == result.submission_id:
+        if previous_score != result.score:
+            apply_scores(assignment_id, added=[result.score], removed=[previous_score])
+        return
+    apply_scores(_assignment_of(previous_submission), removed=[previous_score])
+    apply_scores(assignment_id, added=[result.score])
+
+
+def result_deleted(result):
+    assignment_id = _assignment_of(result.submission_id)
+    if assignment_id is not None:
+        apply_scores(assignment_id, removed=[result.score])
+
+
+def submission_count_changed(assignment_id, delta):
+    with transaction.atomic():
+        updated = AssignmentStats.objects.filter(pk=assignment_id).update(
+            submission_count=F('submission_count') + delta, updated_at=timezone.now(),
+        )
+        if updated:
+            course_id = AssignmentStats.objects.filter(pk=assignment_id).values_list('course_id', flat=True).first()
+            merge_course(course_id)
+
+
+def enrollment_count_changed(course_id, delta):
+    CourseStats.objects.filter(pk=course_id).update(
+        enrolled_count=F('enrolled_count') + delta, updated_at=timezone.now(),
+    )
+
+
+def assignment_saved(assignment, created):
+    """Give new assignments an empty row and follow assignments moved between courses."""
+    if created:
+        if CourseStats.objects.filter(pk=assignment.course_id).exists():
+            bins, _ = bin_settings()
+            AssignmentStats.objects.create(
+                assignment_id=assignment.pk, course_id=assignment.course_id, histogram=[0] * bins,
+            )
+            merge_course(assignment.course_id)
+        return
+    previous_course = AssignmentStats.objects.filter(pk=assignment.pk).values_list('course_id', flat=True).first()
+    if previous_course is not None and previous_course != assignment.course_id:
+        rebuild([previous_course, assignment.course_id])
+
+
+def assignment_deleted(assignment):
+    merge_course(assignment.course_id)
+
+
+def _percentile(histogram, count, pct, top, low, high):
+    target = pct / 100 * count
+    width = top / len(histogram)
+    cumulative = 0
+    for index, n in enumerate(histogram):
+        if n and cumulative + n >= target:
+            value = (index + (target - cumulative) / n) * width
+            return min(max(value, low), high)
+        cumulative += n
+    return high
+
+
+def describe(row, expected_submissions):
+    """Public representation of a rollup row."""
+    bins, top = bin_settings()
+    count = row.graded_count
+    data = {
+        'submission_count': row.submission_count,
+        'submission_rate': round(row.submission_count / expected_submissions, 4) if expected_submissions else None,
+        'graded_count': count,
+        'mean': None, 'stddev': None, 'min': row.min_score, 'max': row.max_score,
+        **{f'p{pct}': None for pct in PERCENTILES},
+    }
+    if count:
+        mean = row.score_sum / count
+        data['mean'] = round(mean, 2)
+        data['stddev'] = round(math.sqrt(max(row.score_sumsq / count - mean * mean, 0.0)), 2)
+        for pct in PERCENTILES:
+            data[f'p{pct}'] = round(_percentile(row.histogram, count, pct, top, row.min_score, row.max_score), 2)
+    data['median'] = data['p50']
+    data['histogram'] = {'bin_width': top / bins, 'counts': row.histogram}
+    data['updated_at'] = row.updated_at
+    return data
+
+
+def course_stats(course_id):
+    """Return the ``CourseStats`` row, building the course's rollups on first use."""
+    stats = CourseStats.objects.filter(pk=course_id).first()
+    if stats is None:
+        rebuild([course_id])
+        stats = CourseStats.objects.get(pk=course_id)
+    return stats
+
+
+def course_summary(course):
+    stats = course_stats(course.pk)
+    assignments = (
+        AssignmentStats.objects.filter(course_id=course.pk).select_related('assignment')
+        .order_by('assignment__due_date', 'assignment_id')
+    )
+    return {
+        'course': course.pk,
+        'enrolled_count': stats.enrolled_count,
+        'assignment_count': stats.assignment_count,
+        **describe(stats, stats.enrolled_count * stats.assignment_count),
+        'assignments': [
+            {
+                'assignment': row.assignment_id, 'title': row.assignment.title,
+                'due_date': row.assignment.due_date, **describe(row, stats.enrolled_count),
+            }
+            for row in assignments
+        ],
+    }
+
+
+def assignment_summary(assignment):
+    stats = course_stats(assignment.course_id)
+    row = AssignmentStats.objects.get(pk=assignment.pk)
+    return {'assignment': assignment.pk, 'course': assignment.course_id, **describe(row, stats.enrolled_count)}
@@ -0,0 +1,91 @@
+"""Bulk grading of one assignment.
+
+A batch of ``{submission, score, feedback}`` entries is validated in one
+pass, checked against the assignment with a single query, and written as
+one ``INSERT ... ON CONFLICT (submission_id) DO UPDATE`` in one transaction,
+so regrading an existing result and grading a new submission cost the same.
+Every entry gets its own status in the report; invalid entries are skipped
+without failing the rest of the batch. The bulk write skips model signals,
+so the course's gradebook rollups are refreshed and the live-feed events
+published afterwards.
+"""
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from rest_framework import serializers
+
+from . import caching, events, gradebook
+from .models import Assignment, Results, Submission
+
+MAX_ENTRIES = 2000
+
+
+class GradeEntrySerializer(serializers.Serializer):
+    submission = serializers.IntegerField()
+    score = serializers.FloatField()
+    feedback = serializers.CharField(allow_blank=True, required=False, default='')
+
+
+class GradingReport:
+
+    def __init__(self):
+        self.entries = []
+        self.counts = {'created': 0, 'updated': 0, 'error': 0}
+
+    def add(self, index, submission, status, errors=None):
+        entry = {'index': index, 'submission': submission, 'status': status}
+        if errors is not None:
+            entry['errors'] = errors
+        self.entries.append(entry)
+        self.counts[status] += 1
+
+    def as_dict(self):
+        return {
+            'created': self.counts['created'],
+            'updated': self.counts['updated'],
+            'error_count': self.counts['error'],
+            'results': sorted(self.entries, key=lambda entry: entry['index']),
+        }
+
+
+def grade_assignment(assignment_id, entries):
+    """Upsert ``Results`` for ``entries`` of ``assignment_id`` and return a ``GradingReport``."""
+    report = GradingReport()
+    valid = {}
+    for index, entry in enumerate(entries):
+        serializer = GradeEntrySerializer(data=entry)
+        if not serializer.is_valid():
+            submission = entry.get('submission') if isinstance(entry, dict) else None
+            report.add(index, submission, 'error', serializer.errors)
+            continue
+        data = serializer.validated_data
+        if data['submission'] in valid:
+            report.add(index, data['submission'], 'error', {'submission': ['Graded twice in this batch.']})
+            continue
+        valid[data['submission']] = (index, data)
+
+    graded = Exists(Results.objects.filter(submission_id=OuterRef('pk')))
+    known = dict(
+        Submission.objects.filter(assignment_id=assignment_id, pk__in=valid)
+        .annotate(graded=graded).values_list('pk', 'graded')
+    )
+
+    results = []
+    for submission_id, (index, data) in valid.items():
+        if submission_id not in known:
+            report.add(index, submission_id, 'error', {
+                'submission': ['Submission does not exist or does not belong to this assignment.'],
+            })
+            continue
+        results.append(Results(submission_id=submission_id, score=data['score'], feedback=data['feedback']))
+        report.add(index, submission_id, 'updated' if known[submission_id] else 'created')
+
+    if results:
+        with transaction.atomic():
+            Results.objects.bulk_create(
+                results, update_conflicts=True, unique_fields=['submission'], update_fields=['score', 'feedback', 'updated_at'],
+            )
+            course_id = Assignment.objects.values_list('course_id', flat=True).get(pk=assignment_id)
+            gradebook.refresh([course_id])
+            caching.invalidate('results')
+            events.results_graded(course_id, assignment_id, results, known)
+    return report
@@ -0,0 +1,214 @@
+"""Per-request SQL and timing instrumentation.
+
+``RequestInstrumentationMiddleware`` samples requests and, for each sampled
+one, records the number of queries, time spent in the database, in
+serializers and in renderers. The numbers go out in a ``Server-Timing``
+header and a structured ``lmsapp.instrumentation`` log line. Queries that
+repeat with the same shape are reported as likely N+1 patterns.
+
+Streamed responses (exports, submission bodies) do most of their work after
+the headers are sent, so they get no ``Server-Timing`` header. Their body is
+wrapped instead: queries run while it is consumed are counted, and the log
+line, marked ``"streamed": true``, is written when the stream ends or is
+closed.
+
+Unsampled requests only pay for one ``random()`` call.
+"""
+import json
+import logging
+import random
+import re
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('lmsapp.instrumentation')
+
+_current = ContextVar('lms_request_metrics', default=None)
+
+_IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def query_shape(sql):
+    """Normalise parameterised SQL so queries differing only in IN-list length match."""
+    return _IN_LIST_RE.sub('IN (...)', _WHITESPACE_RE.sub(' ', sql.strip()))
+
+
+class RequestMetrics:
+
+    def __init__(self):
+        self.query_count = 0
+        self.db_time = 0.0
+        self.timings = {'serialize': 0.0, 'render': 0.0}
+        self.shapes = {}
+        self._depth = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        """``connection.execute_wrapper`` hook counting and timing every query."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.query_count += 1
+            shape = query_shape(sql)
+            self.shapes[shape] = self.shapes.get(shape, 0) + 1
+
+    def repeated_queries(self, threshold):
+        return sorted(
+            ((count, shape) for shape, count in self.shapes.items() if count >= threshold),
+            reverse=True,
+        )
+
+
+@contextmanager
+def timed(phase):
+    """Add the time spent in the block to ``phase`` on the current request, if sampled.
+
+    Nested blocks for the same phase are only counted once.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    depth = metrics._depth.get(phase, 0)
+    metrics._depth[phase] = depth + 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics._depth[phase] = depth
+        if depth == 0:
+            metrics.timings[phase] = metrics.timings.get(phase, 0.0) + time.perf_counter() - started
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+def _wrap_connections(stack, metrics):
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(metrics))
+
+
+class RequestInstrumentationMiddleware:
+    """Sample requests and report their query count and timings."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'LMS_INSTRUMENTATION_SAMPLE_RATE', 0.0)
+        self.n_plus_one_threshold = getattr(settings, 'LMS_N_PLUS_ONE_THRESHOLD', 5)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def sampled(self):
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                _wrap_connections(stack, metrics)
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, started)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        stack = ExitStack()
+        try:
+            # The async ORM runs queries on the request's thread-sensitive
+            # executor thread, whose connections are separate objects.
+            await sync_to_async(_wrap_connections)(stack, metrics)
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+            _current.reset(token)
+        return self.finish(request, response, metrics, started)
+
+    def finish(self, request, response, metrics, started):
+        if response.streaming:
+            measure = self.ameasure_stream if response.is_async else self.measure_stream
+            response.streaming_content = measure(request, response, response.streaming_content, metrics, started)
+            return response
+        total = time.perf_counter() - started
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={_ms(metrics.db_time)};desc="{metrics.query_count} queries"',
+            f"serialize;dur={_ms(metrics.timings['serialize'])}",
+            f"render;dur={_ms(metrics.timings['render'])}",
+            f'total;dur={_ms(total)}',
+        ])
+        self.log(request, response, metrics, total)
+        return response
+
+    def measure_stream(self, request, response, content, metrics, started):
+        """Yield ``content``, counting the queries each chunk runs, then log."""
+        chunks = iter(content)
+        try:
+            while True:
+                # Chunks may be pulled on another thread (ASGI), so wrap per chunk
+                token = _current.set(metrics)
+                try:
+                    with ExitStack() as stack:
+                        _wrap_connections(stack, metrics)
+                        chunk = next(chunks, None)
+                finally:
+                    _current.reset(token)
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            self.log(request, response, metrics, time.perf_counter() - started, streamed=True)
+
+    async def ameasure_stream(self, request, response, content, metrics, started):
+        """``measure_stream`` for async bodies, whose queries run on the request's executor thread."""
+        stack = ExitStack()
+        try:
+            await sync_to_async(_wrap_connections)(stack, metrics)
+            async for chunk in content:
+                yield chunk
+        finally:
+            await sync_to_async(stack.close)()
+            self.log(request, response, metrics, time.perf_counter() - started, streamed=True)
+
+    def log(self, request, response, metrics, total, streamed=False):
+        repeated = metrics.repeated_queries(self.n_plus_one_threshold)
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': metrics.query_count,
+            'db_ms': _ms(metrics.db_time),
+            'serialize_ms': _ms(metrics.timings['serialize']),
+            'render_ms': _ms(metrics.timings['render']),
+            'total_ms': _ms(total),
+        }
+        if streamed:
+            record['streamed'] = True
+        if repeated:
+            record['n_plus_one'] = [{'count': count, 'sql': shape} for count, shape in repeated]
+            logger.warning(json.dumps(record))
+        else:
+            logger.info(json.dumps(record))
+
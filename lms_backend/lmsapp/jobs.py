@@ -0,0 +1,208 @@
+"""Database-backed background jobs, with no broker.
+
+``enqueue(name, payload)`` inserts a ``Job`` row, in the caller's transaction,
+so a job is only visible once the work that queued it has committed. Names
+map to functions in ``lmsapp.tasks.TASKS``, called as ``func(**payload)``.
+
+``manage.py run_workers`` starts worker processes that claim due jobs one
+at a time. On PostgreSQL (and other databases with row locks) a claim is
+``SELECT ... FOR UPDATE SKIP LOCKED``, so workers never wait on each other.
+SQLite has no row locks; there a conditional ``UPDATE ... WHERE status =
+'queued'`` does the claim, and a worker that loses the race moves on to the
+next candidate. A failed job is retried with exponential backoff until
+``max_attempts``; a job whose worker died is requeued once its lease
+(``LMS_JOB_LEASE_SECONDS``) expires. Each run records its queue wait and run
+time on the row and logs a structured ``lmsapp.jobs`` line with its query
+count and database time.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+import traceback
+from contextlib import ExitStack
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .instrumentation import RequestMetrics
+from .models import Job
+
+logger = logging.getLogger('lmsapp.jobs')
+
+MAX_BACKOFF_SECONDS = 3600
+# Candidates a SQLite worker tries per claim before treating the queue as empty
+CLAIM_CANDIDATES = 10
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue(name, payload=None, delay=0, max_attempts=None, unique=False):
+    """Queue ``tasks.TASKS[name](**payload)`` to run in ``delay`` seconds; return the ``Job``.
+
+    With ``unique``, an already queued job of the same name is returned instead.
+    """
+    from .tasks import TASKS
+
+    if name not in TASKS:
+        raise ValueError(f'Unknown job: {name}')
+    if unique:
+        queued = Job.objects.filter(name=name, status=Job.QUEUED).first()
+        if queued is not None:
+            return queued
+    return Job.objects.create(
+        name=name, payload=payload or {},
+        run_after=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or _setting('LMS_JOB_MAX_ATTEMPTS', 5),
+    )
+
+
+def backoff(attempt):
+    """Seconds to wait before retrying after failed attempt number ``attempt``."""
+    return min(_setting('LMS_JOB_BACKOFF_SECONDS', 10) * 2 ** (attempt - 1), MAX_BACKOFF_SECONDS)
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim(worker):
+    """Mark the next due job as running for ``worker`` and return it, or None if there is none."""
+    now = timezone.now()
+    due = Job.objects.filter(status=Job.QUEUED, run_after__lte=now).order_by('run_after', 'id')
+    claimed = {'status': Job.RUNNING, 'locked_by': worker, 'locked_at': now, 'attempts': F('attempts') + 1}
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            pk = due.select_for_update(skip_locked=True).values_list('pk', flat=True).first()
+            if pk is None:
+                return None
+            Job.objects.filter(pk=pk).update(**claimed)
+    else:
+        for pk in due.values_list('pk', flat=True)[:CLAIM_CANDIDATES]:
+            if Job.objects.filter(pk=pk, status=Job.QUEUED).update(**claimed):
+                break
+        else:
+            return None
+    return Job.objects.get(pk=pk)
+
+
+def requeue_expired():
+    """Requeue (or fail, if out of attempts) running jobs whose lease has expired; return how many."""
+    now = timezone.now()
+    expired = Job.objects.filter(
+        status=Job.RUNNING, locked_at__lt=now - timedelta(seconds=_setting('LMS_JOB_LEASE_SECONDS', 600)),
+    )
+    error = 'Worker lease expired.'
+    failed = expired.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, finished_at=now, last_error=error,
+    )
+    return failed + expired.update(status=Job.QUEUED, run_after=now, locked_by='', locked_at=None, last_error=error)
+
+
+def run(job, worker):
+    """Run a claimed ``job`` and record the outcome; return its new status."""
+    from .tasks import TASKS
+
+    started = timezone.now()
+    metrics = RequestMetrics()
+    clock = time.perf_counter()
+    error = ''
+    try:
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(metrics))
+            TASKS[job.name](**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+    run_ms = round((time.perf_counter() - clock) * 1000, 2)
+    wait_ms = round(max((started - job.run_after).total_seconds(), 0) * 1000, 2)
+
+    now = timezone.now()
+    outcome = {'wait_ms': wait_ms, 'run_ms': run_ms, 'last_error': error}
+    if not error:
+        status = Job.DONE
+        outcome.update(finished_at=now)
+    elif job.attempts < job.max_attempts:
+        status = Job.QUEUED
+        outcome.update(run_after=now + timedelta(seconds=backoff(job.attempts)), locked_by='', locked_at=None)
+    else:
+        status = Job.FAILED
+        outcome.update(finished_at=now)
+    # A worker whose lease expired has lost the job; leave the row to its new owner
+    Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=worker).update(status=status, **outcome)
+
+    record = {
+        'job': job.pk, 'name': job.name, 'status': status, 'attempt': job.attempts,
+        'wait_ms': wait_ms, 'run_ms': run_ms,
+        'queries': metrics.query_count, 'db_ms': round(metrics.db_time * 1000, 2),
+    }
+    if error:
+        record['error'] = error.strip().splitlines()[-1]
+        logger.warning(json.dumps(record))
+    else:
+        logger.info(json.dumps(record))
+    return status
+
+
+def work(stop=None, burst=False, poll_interval=None):
+    """Claim and run jobs until ``stop`` is set (or, with ``burst``, until none are due); return the count run."""
+    worker = worker_name()
+    poll_interval = poll_interval if poll_interval is not None else _setting('LMS_JOB_POLL_SECONDS', 1.0)
+    processed = 0
+    while stop is None or not stop.is_set():
+        try:
+            job = claim(worker)
+        except OperationalError:
+            # SQLite reports "database is locked" when another writer holds it too long
+            job = None
+        if job is not None:
+            run(job, worker)
+            processed += 1
+            continue
+        requeue_expired()
+        if burst:
+            break
+        if stop is not None:
+            stop.wait(poll_interval)
+        else:
+            time.sleep(poll_interval)
+    return processed
+
+
+def _worker_process(stop, burst, poll_interval):
+    # The parent handles Ctrl-C and tells workers to stop after their current job
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        work(stop, burst, poll_interval)
+    finally:
+        connections.close_all()
+
+
+def run_pool(processes, burst=False, poll_interval=None):
+    """Run ``processes`` forked workers until SIGINT/SIGTERM (or, with ``burst``, until idle)."""
+    context = multiprocessing.get_context('fork')
+    stop = context.Event()
+    # Children must open their own connections
+    connections.close_all()
+    workers = [
+        context.Process(target=_worker_process, args=(stop, burst, poll_interval), name=f'lms-worker-{i}')
+        for i in range(processes)
+    ]
+    previous = {sig: signal.signal(sig, lambda *args: stop.set()) for sig in (signal.SIGINT, signal.SIGTERM)}
+    try:
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join()
+    finally:
+        for sig, handler in previous.items():
+            signal.signal(sig, handler)
+    return [process.exitcode for process in workers]
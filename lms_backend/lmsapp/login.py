@@ -0,0 +1,223 @@
+"""Phone and password login for ``LoginView`` and ``AsyncLoginView``.
+
+A login is one joined ``Profile``/``User`` query and one password hash. The
+hash is deliberately slow, so the path is guarded before it is reached:
+
+* Token buckets per client address and per phone (``LMS_LOGIN_IP_*`` and
+  ``LMS_LOGIN_PHONE_*``) turn away floods and password guessing with a 429
+  and ``Retry-After``. Buckets live in the Django cache; use a shared cache
+  (``LMS_CACHE_DIR``) when running several web workers. Updates are not
+  atomic, so workers racing on one bucket may let a few extra attempts
+  through.
+* Phones with no account are remembered for ``LMS_LOGIN_UNKNOWN_TTL``
+  seconds, so repeated attempts against them skip the database. They still
+  run one password hash, so an unknown phone takes as long as a wrong
+  password and response times do not reveal which phones are registered.
+  Saving a profile forgets its phone.
+
+``AsyncLoginView`` runs the hash in a pool of ``LMS_LOGIN_HASH_THREADS``
+threads (the hashers release the GIL) instead of on the event loop. At most
+``LMS_LOGIN_HASH_QUEUE`` hashes wait for a thread; past that the view
+answers 503 rather than queueing without limit.
+"""
+import asyncio
+import hashlib
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX, verify_password
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle
+
+from .authentication import LmsRefreshToken
+from .models import Profile
+
+BUCKET_KEY = 'lms:login-bucket:{}:{}'
+UNKNOWN_KEY = 'lms:login-unknown:{}'
+
+INVALID_CREDENTIALS = {'error': 'Invalid phone or password'}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _digest(value):
+    # Keeps raw phone numbers out of the cache
+    return hashlib.sha256(value.encode()).hexdigest()[:32]
+
+
+class HashPoolFull(Exception):
+    """Every hashing thread is busy and ``LMS_LOGIN_HASH_QUEUE`` hashes are waiting."""
+
+
+def take_token(scope, ident, burst, per_minute):
+    """Take a token from ``ident``'s bucket; return 0, or the seconds until one is available."""
+    if burst <= 0 or per_minute <= 0:
+        return 0
+    key = BUCKET_KEY.format(scope, _digest(ident))
+    rate = per_minute / 60
+    now = time.time()
+    tokens, updated = cache.get(key) or (burst, now)
+    tokens = min(burst, tokens + (now - updated) * rate)
+    wait = 0 if tokens >= 1 else (1 - tokens) / rate
+    if not wait:
+        tokens -= 1
+    # Once refilled, a missing bucket and a full one are the same
+    cache.set(key, (tokens, now), math.ceil(burst / rate))
+    return wait
+
+
+def client_ident(request):
+    """The client address, honouring DRF's ``NUM_PROXIES`` for ``X-Forwarded-For``."""
+    return BaseThrottle().get_ident(request)
+
+
+def check_throttle(request, phone):
+    """Raise ``Throttled`` if this client or this phone has run out of login attempts."""
+    wait = take_token(
+        'ip', client_ident(request),
+        _setting('LMS_LOGIN_IP_BURST', 60), _setting('LMS_LOGIN_IP_PER_MINUTE', 120),
+    )
+    if not wait:
+        wait = take_token(
+            'phone', phone,
+            _setting('LMS_LOGIN_PHONE_BURST', 5), _setting('LMS_LOGIN_PHONE_PER_MINUTE', 5),
+        )
+    if wait:
+        raise Throttled(wait)
+
+
+def _unknown_key(phone):
+    return UNKNOWN_KEY.format(_digest(phone))
+
+
+def _unknown_ttl():
+    return _setting('LMS_LOGIN_UNKNOWN_TTL', 60)
+
+
+def forget_unknown(phones):
+    """Drop ``phones`` from the unknown-phone cache once they have accounts."""
+    cache.delete_many([_unknown_key(phone) for phone in phones])
+
+
+def find_user(phone):
+    """Return the user with this phone, with their profile attached, or None."""
+    if cache.get(_unknown_key(phone)):
+        return None
+    try:
+        return Profile.objects.select_related('user').get(phone=phone).user
+    except Profile.DoesNotExist:
+        if _unknown_ttl():
+            cache.set(_unknown_key(phone), True, _unknown_ttl())
+        return None
+
+
+async def afind_user(phone):
+    if await cache.aget(_unknown_key(phone)):
+        return None
+    try:
+        return (await Profile.objects.select_related('user').aget(phone=phone)).user
+    except Profile.DoesNotExist:
+        if _unknown_ttl():
+            await cache.aset(_unknown_key(phone), True, _unknown_ttl())
+        return None
+
+
+def authenticate(phone, password):
+    """Return the user whose phone and password these are, or None."""
+    user = find_user(phone)
+    if user is None:
+        # Hashes a throwaway password, so this takes as long as a wrong one
+        verify_password(password, UNUSABLE_PASSWORD_PREFIX)
+        return None
+    return user if user.check_password(password) else None
+
+
+class HashPool:
+    """Threads for password hashing, with a cap on the hashes waiting for one."""
+
+    def __init__(self, threads, queue_size):
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix='lms-login-hash')
+        self.slots = threading.BoundedSemaphore(threads + queue_size)
+
+    async def run(self, func, *args):
+        if not self.slots.acquire(blocking=False):
+            raise HashPoolFull()
+        try:
+            future = self.executor.submit(func, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        # Held until the hash finishes, even if the request is cancelled first
+        future.add_done_callback(lambda _: self.slots.release())
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+_hash_pool = None
+_hash_pool_lock = threading.Lock()
+
+
+def hash_pool():
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is None:
+            threads = _setting('LMS_LOGIN_HASH_THREADS', 0) or os.cpu_count() or 1
+            _hash_pool = HashPool(threads, _setting('LMS_LOGIN_HASH_QUEUE', 64))
+        return _hash_pool
+
+
+@receiver(setting_changed)
+def reset_hash_pool(setting, **kwargs):
+    global _hash_pool
+    if setting.startswith('LMS_LOGIN_HASH_'):
+        with _hash_pool_lock:
+            if _hash_pool is not None:
+                _hash_pool.shutdown()
+            _hash_pool = None
+
+
+async def aauthenticate(phone, password):
+    """``authenticate`` for async views, hashing in the ``HashPool``; may raise ``HashPoolFull``."""
+    user = await afind_user(phone)
+    pool = hash_pool()
+    # An unknown phone hashes a throwaway password, as in authenticate()
+    is_correct, must_update = await pool.run(
+        verify_password, password, user.password if user else UNUSABLE_PASSWORD_PREFIX,
+    )
+    if not is_correct:
+        return None
+    if must_update:
+        await pool.run(user.set_password, password)
+        # Hash upgrades are not password changes
+        user._password = None
+        await user.asave(update_fields=['password'])
+    return user
+
+
+def get_tokens_for_user(user):
+    """Helper to get JWT tokens for a user."""
+    refresh = LmsRefreshToken.for_user(user)
+    return {
+        'refresh': str(refresh),
+        'access': str(refresh.access_token),
+    }
+
+
+def success_payload(user):
+    return {
+        'message': 'Login successful',
+        'user_id': user.id,
+        'username': user.username,
+        'tokens': get_tokens_for_user(user),
+    }
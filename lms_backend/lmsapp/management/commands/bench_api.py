@@ -0,0 +1,56 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from lmsapp import benchmark
+
+
+class Command(BaseCommand):
+    help = 'Benchmark every GET route in lmsapp.urls in-process and write a JSON report.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', default='bench', help='Username to authenticate as (see seed_lms).')
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--route', action='append', dest='routes', help='Only run this URL name; repeatable.')
+        parser.add_argument('--output', help='Write the JSON report to this file.')
+        parser.add_argument('--compare', help='Baseline JSON report to check for regressions.')
+        parser.add_argument('--threshold', type=float, default=0.1,
+                            help='Allowed latency increase over the baseline, as a fraction.')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['user']!r}; run seed_lms first.")
+
+        # Measure the request paths themselves, not response cache hits.
+        with override_settings(LMS_RESPONSE_CACHE_TTL=0, LMS_INSTRUMENTATION_SAMPLE_RATE=0):
+            report = benchmark.run_routes(user, options['iterations'], options['warmup'], options['routes'])
+
+        self.stdout.write(f"{'route':<28}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'queries':>9}")
+        for name, result in report['routes'].items():
+            if 'skipped' in result:
+                self.stdout.write(f"{name:<28}skipped: {result['skipped']}")
+                continue
+            self.stdout.write(
+                f"{name:<28}{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}"
+                f"{result['throughput_rps']:>10}{result['queries_per_request']:>9}"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+            regressions = benchmark.compare_reports(baseline, report, options['threshold'])
+            for name, metric, before, after in regressions:
+                self.stderr.write(f'REGRESSION {name} {metric}: {before} -> {after}')
+            if regressions:
+                raise CommandError(f'{len(regressions)} regressions against {options["compare"]}')
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
@@ -0,0 +1,48 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from lmsapp import benchmark
+
+
+class Command(BaseCommand):
+    help = 'Compare the sync (WSGI) and async (ASGI) read paths under the same concurrent load.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', default='bench', help='Username to authenticate as (see seed_lms).')
+        parser.add_argument('--requests', type=int, default=400, help='Requests per route and concurrency level.')
+        parser.add_argument('--concurrency', default='1,8,32', help='Comma-separated concurrency levels.')
+        parser.add_argument('--route', action='append', dest='routes', help='Only run this sync URL name; repeatable.')
+        parser.add_argument('--output', help='Write the JSON report to this file.')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['user']!r}; run seed_lms first.")
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError('--concurrency must be a comma-separated list of integers.')
+
+        # Measure the request paths themselves, not response cache hits.
+        with override_settings(LMS_RESPONSE_CACHE_TTL=0, LMS_INSTRUMENTATION_SAMPLE_RATE=0):
+            report = benchmark.compare_sync_async(user, levels, options['requests'], options['routes'])
+
+        self.stdout.write(f"{'route':<22}{'conc':>6}{'wsgi p99':>10}{'asgi p99':>10}{'wsgi rps':>10}{'asgi rps':>10}")
+        for name, result in report['routes'].items():
+            if 'skipped' in result:
+                self.stdout.write(f"{name:<22}skipped: {result['skipped']}")
+                continue
+            for level, paths in result.items():
+                self.stdout.write(
+                    f"{name:<22}{level:>6}{paths['wsgi']['p99_ms']:>10}{paths['asgi']['p99_ms']:>10}"
+                    f"{paths['wsgi']['throughput_rps']:>10}{paths['asgi']['throughput_rps']:>10}"
+                )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
@@ -0,0 +1,71 @@
+import json
+import logging
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from lmsapp import benchmark
+from lmsapp.models import Profile
+
+
+class Command(BaseCommand):
+    help = 'Measure logins per second through the sync and async login views under mixed good and bad credentials.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', default='bench', help='Username to log in as (see seed_lms).')
+        parser.add_argument('--password', default='bench-password', help="The user's password.")
+        parser.add_argument('--requests', type=int, default=200, help='Logins per path and concurrency level.')
+        parser.add_argument('--concurrency', default='1,8,32', help='Comma-separated concurrency levels.')
+        parser.add_argument('--bad-ratio', type=float, default=0.5,
+                            help='Share of attempts with a wrong password or an unknown phone.')
+        parser.add_argument('--throttle', action='store_true',
+                            help='Keep the login throttles on; attempts past them count as 429s.')
+        parser.add_argument('--output', help='Write the JSON report to this file.')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['user']!r}; run seed_lms first.")
+        try:
+            phone = user.profile.phone
+        except Profile.DoesNotExist:
+            raise CommandError(f"{options['user']!r} has no profile with a phone to log in with.")
+        if not user.check_password(options['password']):
+            raise CommandError(f"Wrong --password for {options['user']!r}.")
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError('--concurrency must be a comma-separated list of integers.')
+        if not 0 <= options['bad_ratio'] <= 1:
+            raise CommandError('--bad-ratio must be between 0 and 1.')
+
+        overrides = {'LMS_INSTRUMENTATION_SAMPLE_RATE': 0}
+        if not options['throttle']:
+            # Every attempt comes from one address, mostly for one phone
+            overrides.update(LMS_LOGIN_IP_BURST=0, LMS_LOGIN_PHONE_BURST=0)
+        # Half the attempts fail on purpose; don't log each one
+        request_logger = logging.getLogger('django.request')
+        previous_level = request_logger.level
+        request_logger.setLevel(logging.ERROR)
+        try:
+            with override_settings(**overrides):
+                report = benchmark.login_benchmark(
+                    phone, options['password'], levels, options['requests'], options['bad_ratio'],
+                )
+        finally:
+            request_logger.setLevel(previous_level)
+
+        self.stdout.write(f"{'path':<6}{'conc':>6}{'logins/s':>10}{'ok/s':>8}{'p50 ms':>9}{'p99 ms':>9}  statuses")
+        for level, paths in report['levels'].items():
+            for path, result in paths.items():
+                self.stdout.write(
+                    f"{path:<6}{level:>6}{result['throughput_rps']:>10}{result['successful_logins_per_second']:>8}"
+                    f"{result['p50_ms']:>9}{result['p99_ms']:>9}  {result['statuses']}"
+                )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
@@ -0,0 +1,32 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from lmsapp import benchmark
+
+
+class Command(BaseCommand):
+    help = 'Compare the per-row cost of ModelSerializer output with the fast list path.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000, help='Rows to serialize per case.')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per case; the best is reported.')
+        parser.add_argument('--output', help='Write the JSON report to this file.')
+
+    def handle(self, *args, **options):
+        report = benchmark.serializer_microbenchmark(options['rows'], options['repeat'])
+
+        self.stdout.write(f"{'case':<14}{'rows':>8}{'serializer us':>15}{'row plan us':>13}{'speedup':>9}")
+        for name, result in report.items():
+            if 'skipped' in result:
+                self.stdout.write(f"{name:<14}skipped: {result['skipped']}")
+                continue
+            self.stdout.write(
+                f"{name:<14}{result['rows']:>8}{result['model_serializer_us_per_row']:>15}"
+                f"{result['row_plan_us_per_row']:>13}{result['speedup']:>9}"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
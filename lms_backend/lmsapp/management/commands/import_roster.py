@@ -0,0 +1,46 @@
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from lmsapp.roster import CHUNK_SIZE, FORMATS, KINDS, MalformedBody, import_roster
+
+
+class Command(BaseCommand):
+    help = 'Bulk import students, teachers or enrollments from a CSV or NDJSON file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(KINDS))
+        parser.add_argument('path', help='File to import, or - for stdin.')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format']
+        if fmt is None:
+            ext = os.path.splitext(path)[1].lower()
+            fmt = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}.get(ext)
+        if fmt is None:
+            raise CommandError('Cannot tell the format from the file name; pass --format.')
+        if options['chunk_size'] <= 0:
+            raise CommandError('--chunk-size must be positive.')
+
+        started = time.perf_counter()
+        try:
+            if path == '-':
+                report = import_roster(options['kind'], sys.stdin.buffer, fmt, options['chunk_size'])
+            else:
+                with open(path, 'rb') as stream:
+                    report = import_roster(options['kind'], stream, fmt, options['chunk_size'])
+        except MalformedBody as exc:
+            raise CommandError(f'{exc} {exc.report.created} rows were imported before it.')
+        elapsed = time.perf_counter() - started
+
+        for error in report.errors:
+            self.stderr.write(f"row {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report.created} {options['kind']} in {elapsed:.2f}s "
+            f"({report.error_count} rows rejected)"
+        ))
@@ -0,0 +1,48 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from lmsapp.provisioning import default_processes, provision_users
+from lmsapp.roster import CHUNK_SIZE, FORMATS, MalformedBody
+
+
+class Command(BaseCommand):
+    help = 'Create user accounts with profiles from a CSV or NDJSON file, hashing passwords in parallel.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File with username, password, phone, first_name, last_name; - for stdin.')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--processes', type=int, help='Password hashing processes (default: LMS_PROVISION_PROCESSES or one per CPU).')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format']
+        if fmt is None:
+            ext = os.path.splitext(path)[1].lower()
+            fmt = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}.get(ext)
+        if fmt is None:
+            raise CommandError('Cannot tell the format from the file name; pass --format.')
+        if options['chunk_size'] <= 0:
+            raise CommandError('--chunk-size must be positive.')
+        processes = options['processes'] if options['processes'] is not None else default_processes()
+        if processes <= 0:
+            raise CommandError('--processes must be positive.')
+
+        try:
+            if path == '-':
+                report = provision_users(sys.stdin.buffer, fmt, options['chunk_size'], processes)
+            else:
+                with open(path, 'rb') as stream:
+                    report = provision_users(stream, fmt, options['chunk_size'], processes)
+        except MalformedBody as exc:
+            raise CommandError(f'{exc} {exc.report.created} users were created before it.')
+
+        for error in report.errors:
+            self.stderr.write(f"row {error['row']}: {error['errors']}")
+        summary = report.as_dict()
+        self.stdout.write(self.style.SUCCESS(
+            f"Provisioned {report.created} users in {summary['seconds']:.2f}s "
+            f"({summary['users_per_second']} users/s, {processes} processes, {report.error_count} rows rejected)"
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from lmsapp import sync
+
+
+class Command(BaseCommand):
+    help = 'Delete change-log entries older than LMS_SYNC_LOG_RETENTION_DAYS.'
+
+    def handle(self, *args, **options):
+        deleted = sync.prune()
+        self.stdout.write(self.style.SUCCESS(f'Pruned {deleted} change-log entries'))
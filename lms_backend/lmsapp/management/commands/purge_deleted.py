@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from lmsapp import purge
+
+
+class Command(BaseCommand):
+    help = 'Hard-delete archived teachers and courses with everything under them, in batches; safe to interrupt and rerun.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Rows per transaction (default LMS_PURGE_BATCH_SIZE).')
+        parser.add_argument('--max-batches', type=int, help='Stop after this many batches; rerun to continue.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        deleted = purge.purge(options['batch_size'], options['max_batches'])
+        for name, count in deleted.items():
+            self.stdout.write(f'  {name}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Purged {sum(deleted.values())} rows in {time.perf_counter() - started:.2f}s'
+        ))
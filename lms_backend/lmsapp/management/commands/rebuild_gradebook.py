@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from lmsapp import gradebook
+
+
+class Command(BaseCommand):
+    help = 'Recompute the gradebook rollups from the results, submissions and enrollments tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, action='append', dest='courses',
+                            help='Only rebuild this course id; repeatable.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        assignments, courses = gradebook.rebuild(options['courses'])
+        engine = 'numpy' if gradebook.np is not None else 'python'
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {assignments} assignment and {courses} course rollups '
+            f'in {time.perf_counter() - started:.2f}s ({engine})'
+        ))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from lmsapp import jobs
+
+
+class Command(BaseCommand):
+    help = 'Run background job workers until interrupted (Ctrl-C or SIGTERM finishes the current jobs first).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2, help='Worker processes to start.')
+        parser.add_argument('--burst', action='store_true', help='Exit once no job is due.')
+        parser.add_argument('--poll-interval', type=float,
+                            help='Seconds to sleep when the queue is empty (default LMS_JOB_POLL_SECONDS).')
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        if processes < 1:
+            raise CommandError('--processes must be at least 1.')
+        if processes == 1:
+            count = jobs.work(burst=options['burst'], poll_interval=options['poll_interval'])
+            self.stdout.write(self.style.SUCCESS(f'Ran {count} jobs'))
+            return
+        exit_codes = jobs.run_pool(processes, burst=options['burst'], poll_interval=options['poll_interval'])
+        if any(exit_codes):
+            raise CommandError(f'Worker exit codes: {exit_codes}')
+        self.stdout.write(self.style.SUCCESS(f'{processes} workers stopped'))
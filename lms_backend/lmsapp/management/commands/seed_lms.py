@@ -0,0 +1,147 @@
+import datetime
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from lmsapp import caching, deadlines, gradebook
+from lmsapp.models import (
+    Assignment, AssignmentStats, ChangeLog, Course, CourseStats, Deadline, Enrollment, FeedEvent, Lesson, Profile, Results, Student,
+    Submission, SubmissionContent, Teacher,
+)
+
+SUBJECTS = ['Mathematics', 'Physics', 'Chemistry', 'Biology', 'History', 'Literature', 'Economics', 'Computer Science']
+TOPICS = ['Introduction to', 'Advanced', 'Applied', 'Foundations of', 'Topics in', 'Seminar on']
+WORDS = ('analysis theory practice method system model structure design data proof experiment '
+         'history language measure process network signal energy market policy').split()
+
+
+class Command(BaseCommand):
+    help = 'Fill the database with a reproducible synthetic LMS dataset for benchmarking.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--teachers', type=int, default=50)
+        parser.add_argument('--courses-per-teacher', type=int, default=4)
+        parser.add_argument('--lessons-per-course', type=int, default=8)
+        parser.add_argument('--assignments-per-lesson', type=int, default=1)
+        parser.add_argument('--students', type=int, default=2000)
+        parser.add_argument('--courses-per-student', type=int, default=5)
+        parser.add_argument('--submission-rate', type=float, default=0.7,
+                            help='Chance an enrolled student submits each assignment.')
+        parser.add_argument('--graded-rate', type=float, default=0.8,
+                            help='Chance a submission has a result.')
+        parser.add_argument('--content-words', type=int, default=200,
+                            help='Approximate length of each submission body in words.')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--clear', action='store_true', help='Delete existing LMS rows first.')
+        parser.add_argument('--bench-user', default='bench',
+                            help='Username of the account benchmarks authenticate as (password: bench-password).')
+
+    def handle(self, *args, **options):
+        if options['courses_per_student'] > options['teachers'] * options['courses_per_teacher']:
+            raise CommandError('--courses-per-student exceeds the number of courses.')
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        started = time.perf_counter()
+
+        if options['clear']:
+            self.clear()
+        self.ensure_bench_user(options['bench_user'])
+
+        now = timezone.now()
+        teachers = self.create(Teacher, (
+            Teacher(name=f'Teacher {i}', email=f'teacher{i}@example.com', subject=self.rng.choice(SUBJECTS))
+            for i in range(options['teachers'])
+        ))
+        courses = self.create(Course, (
+            Course(title=f'{self.rng.choice(TOPICS)} {teacher.subject} {i}', description=self.text(40), teacher=teacher)
+            for teacher in teachers for i in range(options['courses_per_teacher'])
+        ))
+        lessons = self.create(Lesson, (
+            Lesson(title=f'Lesson {i + 1}', description=self.text(60), course=course)
+            for course in courses for i in range(options['lessons_per_course'])
+        ))
+        assignments = self.create(Assignment, (
+            Assignment(
+                title=f'{lesson.title} assignment {i + 1}', description=self.text(30), lesson=lesson,
+                course_id=lesson.course_id,
+                due_date=now + datetime.timedelta(days=self.rng.randint(-60, 60), hours=self.rng.randint(0, 23)),
+            )
+            for lesson in lessons for i in range(options['assignments_per_lesson'])
+        ))
+        students = self.create(Student, (
+            Student(name=f'Student {i}', email=f'student{i}@example.com', roll_number=f'R{i:07d}',
+                    enrollment_date=(now - datetime.timedelta(days=self.rng.randint(0, 365))).date())
+            for i in range(options['students'])
+        ))
+
+        assignments_by_course = {}
+        for assignment in assignments:
+            assignments_by_course.setdefault(assignment.course_id, []).append(assignment.id)
+        course_ids = [course.id for course in courses]
+
+        enrollments = []
+        for student in students:
+            for course_id in self.rng.sample(course_ids, options['courses_per_student']):
+                enrollments.append((student.id, course_id))
+        self.create(Enrollment, (Enrollment(student_id=s, course_id=c) for s, c in enrollments), keep=False)
+
+        submissions = self.create(Submission, (
+            Submission(assignment_id=assignment_id, student_id=student_id, content=self.text(options['content_words']))
+            for student_id, course_id in enrollments
+            for assignment_id in assignments_by_course.get(course_id, ())
+            if self.rng.random() < options['submission_rate']
+        ))
+        self.create(Results, (
+            Results(submission_id=submission.id, score=round(self.rng.uniform(0, 100), 1), feedback=self.text(12))
+            for submission in submissions if self.rng.random() < options['graded_rate']
+        ), keep=False)
+
+        gradebook.rebuild()
+        deadlines.rebuild()
+        caching.invalidate(*(model._meta.model_name for model in (
+            Teacher, Course, Lesson, Assignment, Student, Enrollment, Submission, Results,
+        )))
+        self.stdout.write(self.style.SUCCESS(f'Seeded in {time.perf_counter() - started:.1f}s'))
+
+    def text(self, words):
+        return ' '.join(self.rng.choices(WORDS, k=words))
+
+    def create(self, model, objects, keep=True):
+        """bulk_create ``objects`` in batches, one transaction per batch; return them if ``keep``."""
+        created, total, batch = [], 0, []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                total += self.flush(model, batch, created if keep else None)
+                batch = []
+        if batch:
+            total += self.flush(model, batch, created if keep else None)
+        self.stdout.write(f'  {model.__name__}: {total}')
+        return created
+
+    def flush(self, model, batch, created):
+        with transaction.atomic():
+            objects = model.objects.bulk_create(batch)
+        if created is not None:
+            created.extend(objects)
+        return len(objects)
+
+    def clear(self):
+        # Children first, with plain DELETEs. QuerySet.delete() would load every
+        # row into the collector and send post_delete for each, which writes
+        # change log and feed rows for a dataset that is about to be replaced.
+        with connection.cursor() as cursor:
+            for model in (ChangeLog, FeedEvent, Deadline, CourseStats, AssignmentStats, Results, SubmissionContent, Submission, Enrollment, Assignment, Lesson, Course, Student, Teacher):
+                cursor.execute(f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)}')
+
+    def ensure_bench_user(self, username):
+        user, created = User.objects.get_or_create(username=username, defaults={'first_name': 'Bench'})
+        if created:
+            user.set_password('bench-password')
+            user.save()
+            Profile.objects.get_or_create(user=user, defaults={'phone': f'bench-{user.pk}'})
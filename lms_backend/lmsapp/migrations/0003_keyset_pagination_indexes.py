@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lmsapp', '0002_course_student_teacher_lesson_assignment_enrollment_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assignment',
+            index=models.Index(fields=['due_date', 'id'], name='lmsapp_assi_due_dat_0fe7e0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['submitted_at', 'id'], name='lmsapp_subm_submitt_42eb7a_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:24
+
+from django.db import migrations, models
+from django.db.models import Count, Exists, OuterRef
+
+
+def remove_duplicates(apps, schema_editor):
+    """Drop duplicate rows that would violate the new unique constraints.
+
+    The oldest enrollment per (student, course) is kept. Per (assignment,
+    student) the latest graded submission is kept, or the latest one if
+    none is graded.
+    """
+    Enrollment = apps.get_model('lmsapp', 'Enrollment')
+    Submission = apps.get_model('lmsapp', 'Submission')
+    Results = apps.get_model('lmsapp', 'Results')
+
+    duplicated = (
+        Enrollment.objects.values('student_id', 'course_id')
+        .annotate(n=Count('id')).filter(n__gt=1)
+    )
+    for row in duplicated.iterator():
+        ids = list(
+            Enrollment.objects.filter(student_id=row['student_id'], course_id=row['course_id'])
+            .order_by('id').values_list('id', flat=True)
+        )
+        Enrollment.objects.filter(id__in=ids[1:]).delete()
+
+    duplicated = (
+        Submission.objects.values('assignment_id', 'student_id')
+        .annotate(n=Count('id')).filter(n__gt=1)
+    )
+    graded = Exists(Results.objects.filter(submission_id=OuterRef('pk')))
+    for row in duplicated.iterator():
+        ids = list(
+            Submission.objects.filter(assignment_id=row['assignment_id'], student_id=row['student_id'])
+            .annotate(graded=graded).order_by('-graded', '-id').values_list('id', flat=True)
+        )
+        Submission.objects.filter(id__in=ids[1:]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lmsapp', '0004_course_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='assignment',
+            index=models.Index(fields=['course', 'due_date'], name='lmsapp_assign_course_due_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='enrollment',
+            constraint=models.UniqueConstraint(fields=('student', 'course'), name='lmsapp_enrollment_student_course_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='submission',
+            constraint=models.UniqueConstraint(fields=('assignment', 'student'), name='lmsapp_submission_assignment_student_uniq'),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:33
+
+import zlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+# Copies of lmsapp.content's encode/decode as they were when this migration was written
+def encode(text):
+    raw = text.encode('utf-8')
+    packed = zlib.compress(raw, 6)
+    if len(packed) < len(raw):
+        return packed, len(raw), True
+    return raw, len(raw), False
+
+
+def decode(data, compressed):
+    raw = bytes(data)
+    return (zlib.decompress(raw) if compressed else raw).decode('utf-8')
+
+
+def move_content(apps, schema_editor):
+    """Copy every Submission.content into a compressed SubmissionContent row."""
+    Submission = apps.get_model('lmsapp', 'Submission')
+    SubmissionContent = apps.get_model('lmsapp', 'SubmissionContent')
+    batch = []
+    for pk, text in Submission.objects.order_by('pk').values_list('pk', 'content').iterator(chunk_size=BATCH_SIZE):
+        data, size, compressed = encode(text)
+        batch.append(SubmissionContent(submission_id=pk, data=data, size=size, compressed=compressed))
+        if len(batch) >= BATCH_SIZE:
+            SubmissionContent.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        SubmissionContent.objects.bulk_create(batch)
+
+
+def restore_content(apps, schema_editor):
+    Submission = apps.get_model('lmsapp', 'Submission')
+    SubmissionContent = apps.get_model('lmsapp', 'SubmissionContent')
+    rows = SubmissionContent.objects.order_by('pk').values_list('submission_id', 'data', 'compressed')
+    batch = []
+    for pk, data, compressed in rows.iterator(chunk_size=BATCH_SIZE):
+        batch.append(Submission(pk=pk, content=decode(data, compressed)))
+        if len(batch) >= BATCH_SIZE:
+            Submission.objects.bulk_update(batch, ['content'])
+            batch = []
+    if batch:
+        Submission.objects.bulk_update(batch, ['content'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lmsapp', '0005_join_table_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionContent',
+            fields=[
+                ('submission', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='body', serialize=False, to='lmsapp.submission')),
+                ('data', models.BinaryField()),
+                ('size', models.PositiveIntegerField()),
+                ('compressed', models.BooleanField(default=True)),
+            ],
+        ),
+        migrations.RunPython(move_content, restore_content),
+        # Lets the column be re-added with existing rows when migrating backwards
+        migrations.AlterField(
+            model_name='submission',
+            name='content',
+            field=models.TextField(default=''),
+        ),
+        migrations.RemoveField(
+            model_name='submission',
+            name='content',
+        ),
+    ]
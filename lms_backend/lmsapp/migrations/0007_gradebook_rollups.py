@@ -0,0 +1,51 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lmsapp', '0006_submission_content_store'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseStats',
+            fields=[
+                ('submission_count', models.PositiveIntegerField(default=0)),
+                ('graded_count', models.PositiveIntegerField(default=0)),
+                ('score_sum', models.FloatField(default=0)),
+                ('score_sumsq', models.FloatField(default=0)),
+                ('min_score', models.FloatField(null=True)),
+                ('max_score', models.FloatField(null=True)),
+                ('histogram', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='lmsapp.course')),
+                ('enrolled_count', models.PositiveIntegerField(default=0)),
+                ('assignment_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='AssignmentStats',
+            fields=[
+                ('submission_count', models.PositiveIntegerField(default=0)),
+                ('graded_count', models.PositiveIntegerField(default=0)),
+                ('score_sum', models.FloatField(default=0)),
+                ('score_sumsq', models.FloatField(default=0)),
+                ('min_score', models.FloatField(null=True)),
+                ('max_score', models.FloatField(null=True)),
+                ('histogram', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('assignment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='lmsapp.assignment')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assignment_stats', to='lmsapp.course')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:44
+
+from django.db import migrations, models
+
+
+def drop_search_triggers(apps, schema_editor):
+    """Drop the SQLite search triggers before the tables they reference are rebuilt.
+
+    post_migrate reinstalls them (see ``lmsapp.apps``).
+    """
+    from lmsapp import search
+
+    if schema_editor.connection.vendor == 'sqlite':
+        search.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lmsapp', '0008_change_tracking'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_search_triggers, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='course',
+            name='is_deleted',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='teacher',
+            name='is_deleted',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(migrations.RunPython.noop, drop_search_triggers),
+    ]
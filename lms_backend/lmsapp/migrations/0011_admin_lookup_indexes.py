@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lmsapp', '0010_job_queue'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['email'], name='lmsapp_student_email_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['roll_number'], name='lmsapp_student_roll_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['enrollment_date', 'id'], name='lmsapp_student_enrolled_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='teacher',
+            index=models.Index(fields=['email'], name='lmsapp_teacher_email_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-18 20:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# One row per enrolled student and assignment of a live course (see lmsapp.deadlines)
+BACKFILL_SQL = """
+    INSERT INTO lmsapp_deadline (student_id, assignment_id, course_id, due_date, submitted)
+    SELECT e.student_id, a.id, a.course_id, a.due_date, EXISTS (
+        SELECT 1 FROM lmsapp_submission s WHERE s.student_id = e.student_id AND s.assignment_id = a.id
+    )
+    FROM lmsapp_enrollment e
+    JOIN lmsapp_assignment a ON a.course_id = e.course_id
+    JOIN lmsapp_course c ON c.id = e.course_id
+    WHERE NOT c.is_deleted
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lmsapp', '0012_feed_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Deadline',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('due_date', models.DateTimeField()),
+                ('submitted', models.BooleanField(default=False)),
+                ('assignment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deadlines', to='lmsapp.assignment')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deadlines', to='lmsapp.course')),
+                ('student', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='deadlines', to='lmsapp.student')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('submitted', False)), fields=['student', 'due_date', 'id'], name='lmsapp_deadline_pending_idx')],
+                'constraints': [models.UniqueConstraint(fields=('student', 'assignment'), name='lmsapp_deadline_student_assignment_uniq')],
+            },
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+def drop_course_update_trigger(apps, schema_editor):
+    """Drop the SQLite trigger that re-indexed a course on any UPDATE.
+
+    post_migrate reinstalls it limited to the indexed columns (see ``lmsapp.apps``).
+    """
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TRIGGER IF EXISTS lmsapp_course_fts_update')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lmsapp', '0013_deadline_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_course_update_trigger, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,9 @@
-from django.db import models
+from django.db import models, transaction
 
 from django.contrib.auth.models import User
 
+from . import content as content_store
+
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     phone = models.CharField(max_length=20, unique=True)
@@ -9,26 +11,78 @@ class Profile(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.phone}"
 
-class Teacher(models.Model):
+class TrackedModel(models.Model):
+    """LMS resource with a modification time, used by ``?updated_since=`` sync."""
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='%(app_label)s_%(class)s_updated_idx'),
+        ]
+
+class LiveQuerySet(models.QuerySet):
+    """QuerySet of rows that are archived with a teacher or course.
+
+    ``live()`` hides archived rows, and rows under an archived course, before
+    ``lmsapp.purge`` removes them. The model's ``archived_lookup`` names the
+    flag; archiving a teacher archives their courses too.
+    """
+
+    def live(self):
+        return self.filter(**{self.model.archived_lookup: False})
+
+class LiveManager(models.Manager.from_queryset(LiveQuerySet)):
+    """Default manager that hides soft-deleted rows; ``all_objects`` still sees them."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+class SoftDeleteModel(TrackedModel):
+    """Resource that is archived on delete and removed later by ``lmsapp.purge``."""
+    is_deleted = models.BooleanField(default=False)
+    archived_lookup = 'is_deleted'
+
+    objects = LiveManager()
+    all_objects = models.Manager()
+
+    class Meta(TrackedModel.Meta):
+        abstract = True
+
+class Teacher(SoftDeleteModel):
     
     name = models.CharField(max_length=100,blank=True, null=True)
     email=models.EmailField(blank=True, null=True)
     subject = models.CharField(max_length=100)
     is_active = models.BooleanField(default=True)
 
+    class Meta(SoftDeleteModel.Meta):
+        indexes = [
+            *SoftDeleteModel.Meta.indexes,
+            models.Index(fields=['email'], name='lmsapp_teacher_email_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} - {self.subject}"
 
-class Student(models.Model):
+class Student(TrackedModel):
     name = models.CharField(max_length=100,blank=True, null=True)
     email=models.EmailField(blank=True, null=True)
     enrollment_date = models.DateField()
     is_active = models.BooleanField(default=True)
     roll_number = models.CharField(max_length=100, blank=True, null=True)
 
+    class Meta(TrackedModel.Meta):
+        indexes = [
+            *TrackedModel.Meta.indexes,
+            models.Index(fields=['email'], name='lmsapp_student_email_idx'),
+            models.Index(fields=['roll_number'], name='lmsapp_student_roll_idx'),
+            models.Index(fields=['enrollment_date', 'id'], name='lmsapp_student_enrolled_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} - {self.email}"
-class Course(models.Model):
+class Course(SoftDeleteModel):
     title = models.CharField(max_length=100)
     description = models.TextField()
     teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE)
@@ -37,46 +91,261 @@ class Course(models.Model):
     def __str__(self):
         return self.title
 
-class Enrollment(models.Model):
+class Enrollment(TrackedModel):
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
     enrollment_date = models.DateField(auto_now_add=True)
+    archived_lookup = 'course__is_deleted'
+
+    objects = LiveQuerySet.as_manager()
+
+    class Meta(TrackedModel.Meta):
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'course'], name='lmsapp_enrollment_student_course_uniq'),
+        ]
 
     def __str__(self):
         return f"{self.student.name} enrolled in {self.course.title}"
 
-class Lesson(models.Model):
+class Lesson(TrackedModel):
     title = models.CharField(max_length=100)
     description = models.TextField()
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    archived_lookup = 'course__is_deleted'
+
+    objects = LiveQuerySet.as_manager()
 
     def __str__(self):
         return self.title
 
-class Assignment(models.Model):
+class Assignment(TrackedModel):
     title = models.CharField(max_length=100)
     description = models.TextField()
     lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE)
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
     due_date = models.DateTimeField()
+    archived_lookup = 'course__is_deleted'
+
+    objects = LiveQuerySet.as_manager()
 
+    class Meta(TrackedModel.Meta):
+        indexes = [
+            *TrackedModel.Meta.indexes,
+            models.Index(fields=['due_date', 'id']),
+            models.Index(fields=['course', 'due_date'], name='lmsapp_assign_course_due_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
-class Submission(models.Model):
+class SubmissionQuerySet(LiveQuerySet):
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """Also write the ``SubmissionContent`` rows of submissions given a ``content``."""
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            pending = [obj for obj in objs if obj._pending_content is not None]
+            if not pending:
+                return objs
+            if any(obj.pk is None for obj in pending):
+                raise ValueError('bulk_create() did not return primary keys, so submission content cannot be saved.')
+            bodies = SubmissionContent.objects.using(self.db).bulk_create(
+                [SubmissionContent.from_text(obj.pk, obj._pending_content) for obj in pending],
+                batch_size=kwargs.get('batch_size'),
+            )
+        for obj, body in zip(pending, bodies):
+            obj._pending_content = None
+            obj.body = body
+        return objs
+
+class Submission(TrackedModel):
     assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE)
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     submitted_at = models.DateTimeField(auto_now_add=True)
-    content = models.TextField()
+
+    archived_lookup = 'assignment__course__is_deleted'
+
+    objects = SubmissionQuerySet.as_manager()
+
+    # Text assigned to ``content`` that save() or bulk_create() has not written yet
+    _pending_content = None
+
+    class Meta(TrackedModel.Meta):
+        indexes = [
+            *TrackedModel.Meta.indexes,
+            models.Index(fields=['submitted_at', 'id']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['assignment', 'student'], name='lmsapp_submission_assignment_student_uniq'),
+        ]
 
     def __str__(self):
         return f"Submission by {self.student.name} for {self.assignment.title}"
 
-class Results(models.Model):
+    @property
+    def content(self):
+        """The submission body, read from ``SubmissionContent`` (select_related('body') to avoid a query)."""
+        if self._pending_content is not None:
+            return self._pending_content
+        try:
+            return self.body.text
+        except SubmissionContent.DoesNotExist:
+            return ''
+
+    @content.setter
+    def content(self, value):
+        self._pending_content = value
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if self._pending_content is not None:
+                body = SubmissionContent.from_text(self.pk, self._pending_content)
+                body.save()
+                self._pending_content = None
+                self.body = body
+
+class SubmissionContent(models.Model):
+    """Compressed body of a submission, kept out of the ``Submission`` table."""
+    submission = models.OneToOneField(Submission, on_delete=models.CASCADE, primary_key=True, related_name='body')
+    data = models.BinaryField()
+    size = models.PositiveIntegerField()
+    compressed = models.BooleanField(default=True)
+    archived_lookup = 'submission__assignment__course__is_deleted'
+
+    objects = LiveQuerySet.as_manager()
+
+    @classmethod
+    def from_text(cls, submission_id, text):
+        data, size, compressed = content_store.encode(text)
+        return cls(submission_id=submission_id, data=data, size=size, compressed=compressed)
+
+    @property
+    def text(self):
+        return content_store.decode(self.data, self.compressed)
+
+    def __str__(self):
+        return f"Content of submission {self.submission_id} ({self.size} bytes)"
+
+class Results(TrackedModel):
     submission = models.OneToOneField(Submission, on_delete=models.CASCADE)
     score = models.FloatField()
     feedback = models.TextField()
+    archived_lookup = 'submission__assignment__course__is_deleted'
+
+    objects = LiveQuerySet.as_manager()
+
+    def __str__(self):
+        return f"Results for {self.submission.student.name} - {self.score}"
+
+class Deadline(models.Model):
+    """A student's copy of an assignment's due date, maintained by ``lmsapp.deadlines``."""
+    # Indexed as the leading column of the unique constraint
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='deadlines', db_index=False)
+    assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE, related_name='deadlines')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='deadlines')
+    due_date = models.DateTimeField()
+    submitted = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'assignment'], name='lmsapp_deadline_student_assignment_uniq'),
+        ]
+        indexes = [
+            # Only unsubmitted rows: the "upcoming" range scan
+            models.Index(
+                fields=['student', 'due_date', 'id'], condition=models.Q(submitted=False),
+                name='lmsapp_deadline_pending_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Assignment {self.assignment_id} due {self.due_date} for student {self.student_id}"
+
+class ChangeLog(models.Model):
+    """Append-only record of deleted LMS rows, read by ``?updated_since=`` sync."""
+    resource = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['resource', 'deleted_at'], name='lmsapp_changelog_res_del_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.resource} {self.object_id} deleted at {self.deleted_at}"
+
+class ScoreRollup(models.Model):
+    """Running score totals and histogram maintained by ``lmsapp.gradebook``."""
+    submission_count = models.PositiveIntegerField(default=0)
+    graded_count = models.PositiveIntegerField(default=0)
+    score_sum = models.FloatField(default=0)
+    score_sumsq = models.FloatField(default=0)
+    min_score = models.FloatField(null=True)
+    max_score = models.FloatField(null=True)
+    histogram = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+class AssignmentStats(ScoreRollup):
+    assignment = models.OneToOneField(Assignment, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='assignment_stats')
+
+    def __str__(self):
+        return f"Stats for assignment {self.assignment_id}"
+
+class CourseStats(ScoreRollup):
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    enrolled_count = models.PositiveIntegerField(default=0)
+    assignment_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Stats for course {self.course_id}"
+
+class Job(models.Model):
+    """A unit of background work run by ``manage.py run_workers`` (see ``lmsapp.jobs``)."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    wait_ms = models.FloatField(null=True, blank=True)
+    run_ms = models.FloatField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after', 'id'], name='lmsapp_job_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+class FeedEvent(models.Model):
+    """A published live-feed event, kept for ``lmsapp.events.DatabaseBackend`` to fan out and replay."""
+    kind = models.CharField(max_length=40)
+    course_id = models.BigIntegerField()
+    data = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['course_id', 'id'], name='lmsapp_feedevent_course_idx'),
+        ]
 
     def __str__(self):
-        return f"Results for {self.submission.student.name} - {self.score}"
\ No newline at end of file
+        return f"{self.kind} #{self.pk} (course {self.course_id})"
@@ -0,0 +1,215 @@
+import base64
+import datetime
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def get_page_size(request, query_param='page_size'):
+    """Page size requested by the client, capped at ``LMS_MAX_PAGE_SIZE``."""
+    page_size = api_settings.PAGE_SIZE or 50
+    max_page_size = getattr(settings, 'LMS_MAX_PAGE_SIZE', 200)
+    try:
+        requested = int(request.query_params[query_param])
+    except (KeyError, ValueError):
+        requested = page_size
+    if requested <= 0:
+        requested = page_size
+    return min(requested, max_page_size)
+
+
+class CursorEncoder(json.JSONEncoder):
+    """JSON encoder that keeps full datetime precision in cursor values."""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.date)):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPagination(BasePagination):
+    """Keyset pagination over an (ordering..., id) tuple.
+
+    The page position is the sort key of the last row seen, so every page is
+    a single index range scan no matter how deep it is, and no COUNT(*) is
+    issued. Views choose the sort key with an ``ordering`` attribute whose
+    last element must be the primary key. A cursor that does not decode to
+    values of that key is answered with 400.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering = ('id',)
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        return get_page_size(request, self.page_size_query_param)
+
+    def get_ordering(self, view):
+        ordering = tuple(getattr(view, 'ordering', None) or self.ordering)
+        assert ordering[-1].lstrip('-') in ('id', 'pk'), (
+            'KeysetPagination requires the last ordering field to be the primary key.'
+        )
+        return ordering
+
+    def invalid_cursor(self):
+        return ValidationError({self.cursor_query_param: [self.invalid_cursor_message]})
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            values, reverse = data['v'], bool(data['r'])
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise self.invalid_cursor()
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise self.invalid_cursor()
+        return values, reverse
+
+    def encode_cursor(self, values, reverse):
+        data = json.dumps({'v': values, 'r': int(reverse)}, cls=CursorEncoder, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def keyset_filter(self, values, reverse):
+        """Build the "rows strictly after ``values``" condition for the ordering."""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            descending = field.startswith('-')
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def row_key(self, row):
+        if isinstance(row, dict):
+            return [row[field.lstrip('-')] for field in self.ordering]
+        return [getattr(row, field.lstrip('-')) for field in self.ordering]
+
+    def page_queryset(self, queryset, request, view=None):
+        """Return the sliced queryset for the requested page (one extra row to detect more)."""
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(view)
+        self.base_url = remove_query_param(request.build_absolute_uri(), self.cursor_query_param)
+
+        self.cursor = self.decode_cursor(request)
+        self.reverse = self.cursor[1] if self.cursor else False
+
+        order_by = [
+            (field[1:] if field.startswith('-') else '-' + field) if self.reverse else field
+            for field in self.ordering
+        ]
+        queryset = queryset.order_by(*order_by)
+        if self.cursor:
+            try:
+                queryset = queryset.filter(self.keyset_filter(self.cursor[0], self.reverse))
+            except (TypeError, ValueError, DjangoValidationError):
+                # Well-formed, but the values don't fit the sort key's fields
+                raise self.invalid_cursor()
+        return queryset[:self.page_size + 1]
+
+    def finish_page(self, rows):
+        """Trim the fetched rows to the page and work out the next/previous keys."""
+        cursor, reverse = self.cursor, self.reverse
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        if reverse:
+            self.has_next, self.has_previous = cursor is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.next_key = self.row_key(rows[-1]) if rows else (cursor[0] if cursor else None)
+        self.previous_key = self.row_key(rows[0]) if rows else (cursor[0] if cursor else None)
+        return rows
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.finish_page(list(self.page_queryset(queryset, request, view)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        return self.finish_page([row async for row in self.page_queryset(queryset, request, view)])
+
+    def get_next_link(self):
+        if not self.has_next or self.next_key is None:
+            return None
+        return self.encode_cursor(self.next_key, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or self.previous_key is None:
+            return None
+        return self.encode_cursor(self.previous_key, reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class RankedPagination(BasePagination):
+    """Numbered pages over a ranked id list, without COUNT(*).
+
+    Used for search results, whose order comes from a relevance score
+    rather than indexed columns. ``fetch(limit, offset)`` returns the ranked
+    ids; one extra row is requested to tell whether a next page exists.
+    """
+
+    page_query_param = 'page'
+    page_size_query_param = 'page_size'
+
+    def paginate_ids(self, fetch, request):
+        self.page_size = get_page_size(request, self.page_size_query_param)
+        try:
+            self.page = max(int(request.query_params.get(self.page_query_param, 1)), 1)
+        except ValueError:
+            raise NotFound('Invalid page')
+        self.base_url = request.build_absolute_uri()
+
+        ids = fetch(self.page_size + 1, (self.page - 1) * self.page_size)
+        self.has_next = len(ids) > self.page_size
+        return ids[:self.page_size]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(self.base_url, self.page_query_param, self.page + 1)
+
+    def get_previous_link(self):
+        if self.page <= 1:
+            return None
+        if self.page == 2:
+            return remove_query_param(self.base_url, self.page_query_param)
+        return replace_query_param(self.base_url, self.page_query_param, self.page - 1)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
@@ -0,0 +1,186 @@
+"""Bulk user provisioning: a whole intake of accounts per request.
+
+Rows of ``username, password, phone, first_name, last_name`` are read from a
+CSV or NDJSON stream (see ``lmsapp.roster``) and handled in chunks. Each
+chunk is validated in one pass, checked against existing usernames and
+phones with one query each, and written as one ``bulk_create`` of users and
+one of profiles in a single transaction.
+
+Nearly all the cost of creating an account is the password hash, which is
+deliberately slow. ``manage.py provision_users`` computes hashes in a pool
+of ``LMS_PROVISION_PROCESSES`` forked processes (default: one per CPU), so an
+intake scales with the machine's cores instead of running on one. The pool
+only hashes; all database work stays in the calling process.
+
+The HTTP endpoint hashes in the web worker itself: forking from a threaded
+worker can deadlock, and concurrent requests would multiply the processes.
+It takes at most ``LMS_PROVISION_HTTP_MAX_ROWS`` rows per request, so a
+request is held for a bounded time; larger intakes go through the command.
+"""
+import multiprocessing
+import os
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+
+from .login import forget_unknown
+from .models import Profile
+from .roster import CHUNK_SIZE, ImportReport, MalformedBody, read_rows
+
+
+class ProvisionRowSerializer(serializers.Serializer):
+    """The fields of ``RegisterSerializer``, without its per-row uniqueness queries."""
+    username = serializers.CharField(max_length=150, validators=[UnicodeUsernameValidator()])
+    password = serializers.CharField(max_length=128)
+    phone = serializers.CharField(max_length=20)
+    first_name = serializers.CharField(max_length=150)
+    last_name = serializers.CharField(max_length=150, required=False, allow_blank=True, default='')
+
+
+class ProvisionReport(ImportReport):
+
+    def __init__(self):
+        super().__init__()
+        self.seconds = 0.0
+
+    def as_dict(self):
+        data = super().as_dict()
+        data['seconds'] = round(self.seconds, 3)
+        data['users_per_second'] = round(self.created / self.seconds, 1) if self.seconds else 0.0
+        return data
+
+
+class TooManyRows(ValueError):
+    """The stream has more rows than the caller accepts."""
+
+
+def default_processes():
+    return getattr(settings, 'LMS_PROVISION_PROCESSES', None) or os.cpu_count() or 1
+
+
+class PasswordHasher:
+    """Hash passwords in a forked process pool, started on first use.
+
+    Batches smaller than the pool, and platforms without ``fork``, are
+    hashed in this process.
+    """
+
+    def __init__(self, processes=None):
+        self.processes = processes or default_processes()
+        self.pool = None
+
+    def hash(self, passwords):
+        if self.processes <= 1 or len(passwords) < self.processes \
+                or 'fork' not in multiprocessing.get_all_start_methods():
+            return [make_password(password) for password in passwords]
+        if self.pool is None:
+            # Forked children only hash; they exit without touching the parent's connections
+            self.pool = multiprocessing.get_context('fork').Pool(self.processes)
+        chunksize = max(1, len(passwords) // (self.processes * 4))
+        return self.pool.map(make_password, passwords, chunksize)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+
+def provision_users(stream, fmt, chunk_size=CHUNK_SIZE, processes=None, max_rows=None):
+    """Create the accounts in ``stream`` and return a ``ProvisionReport``.
+
+    With ``max_rows``, a stream with more rows raises ``TooManyRows`` before
+    any account is created.
+    """
+    report = ProvisionReport()
+    hasher = PasswordHasher(processes)
+    started = time.perf_counter()
+    rows = read_rows(stream, fmt)
+    try:
+        if max_rows is not None:
+            rows = list(islice(rows, max_rows + 1))
+            if len(rows) > max_rows:
+                raise TooManyRows(
+                    f'At most {max_rows} accounts can be provisioned per request; '
+                    'use manage.py provision_users for larger intakes.'
+                )
+            rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            _provision_chunk(chunk, hasher, report)
+    except MalformedBody as exc:
+        exc.report = report
+        raise
+    finally:
+        hasher.close()
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def _provision_chunk(chunk, hasher, report):
+    valid = []
+    for number, row in chunk:
+        if not isinstance(row, dict):
+            report.add_error(number, {'non_field_errors': ['Row is not a JSON object.']})
+            continue
+        serializer = ProvisionRowSerializer(data=row)
+        if not serializer.is_valid():
+            report.add_error(number, serializer.errors)
+            continue
+        data = dict(serializer.validated_data)
+        data['username'] = User.normalize_username(data['username'])
+        valid.append((number, data))
+
+    valid = _drop_taken(valid, report)
+    if not valid:
+        return
+    hashes = hasher.hash([data['password'] for _, data in valid])
+    users = [
+        User(username=data['username'], password=password, first_name=data['first_name'], last_name=data['last_name'])
+        for (_, data), password in zip(valid, hashes)
+    ]
+    try:
+        with transaction.atomic():
+            users = User.objects.bulk_create(users)
+            Profile.objects.bulk_create([
+                Profile(user=user, phone=data['phone']) for user, (_, data) in zip(users, valid)
+            ])
+    except IntegrityError as exc:
+        for number, _ in valid:
+            report.add_error(number, {'non_field_errors': [f'Chunk rejected by the database: {exc}']})
+        return
+    # bulk_create skips the signal that does this
+    forget_unknown([data['phone'] for _, data in valid])
+    report.created += len(users)
+
+
+def _drop_taken(valid, report):
+    """Skip rows whose username or phone exists already, or repeats an earlier row of the chunk."""
+    usernames = set(User.objects.filter(
+        username__in={data['username'] for _, data in valid},
+    ).values_list('username', flat=True))
+    phones = set(Profile.objects.filter(
+        phone__in={data['phone'] for _, data in valid},
+    ).values_list('phone', flat=True))
+    kept = []
+    for number, data in valid:
+        errors = {}
+        if data['username'] in usernames:
+            errors['username'] = ['A user with that username already exists.']
+        if data['phone'] in phones:
+            errors['phone'] = ['A user with that phone already exists.']
+        if errors:
+            report.add_error(number, errors)
+            continue
+        usernames.add(data['username'])
+        phones.add(data['phone'])
+        kept.append((number, data))
+    return kept
@@ -0,0 +1,133 @@
+"""Soft delete of teachers and courses, and the batched purge that follows.
+
+Deleting a teacher or course through the API only archives it: one UPDATE
+sets ``is_deleted`` on the row (and on a teacher's courses), the default
+managers stop returning it, the API stops serving the rows under it (the
+views read ``objects.live()``), and the change log records the delete for
+sync clients. Nothing else is loaded or locked in the request.
+
+``purge()`` then removes archived subtrees in a background job (queued on
+archive, see ``lmsapp.jobs``) or from ``manage.py purge_deleted``, leaves first,
+``batch_size`` rows per transaction with plain DELETEs. A row is only
+deleted once nothing references it any more, so the order of the steps
+never matters for correctness. All progress lives in the database, so an
+interrupted purge simply resumes where it stopped when run again.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from . import caching, deadlines, jobs
+from .models import (
+    Assignment, AssignmentStats, ChangeLog, Course, CourseStats, Deadline, Enrollment, Lesson, Results, Submission,
+    SubmissionContent, Teacher,
+)
+
+# (model, lookup from the model to its archived course), leaves first
+STEPS = [
+    (Deadline, 'course__is_deleted'),
+    (Results, 'submission__assignment__course__is_deleted'),
+    (SubmissionContent, 'submission__assignment__course__is_deleted'),
+    (Submission, 'assignment__course__is_deleted'),
+    (AssignmentStats, 'course__is_deleted'),
+    (Assignment, 'course__is_deleted'),
+    (Lesson, 'course__is_deleted'),
+    (Enrollment, 'course__is_deleted'),
+    (CourseStats, 'course__is_deleted'),
+    (Course, 'is_deleted'),
+    (Teacher, 'is_deleted'),
+]
+
+# Cached responses that list a course or the rows under it; archiving hides them all
+ARCHIVED_RESOURCES = ('course', 'lesson', 'assignment', 'enrollment', 'submission', 'results')
+
+# Purged rows that sync clients see as deletes; courses and teachers were logged when archived
+LOGGED_MODELS = {Results, Submission, Assignment, Lesson, Enrollment}
+
+
+def batch_size():
+    return getattr(settings, 'LMS_PURGE_BATCH_SIZE', 1000)
+
+
+def _log_deletes(models_and_ids):
+    ChangeLog.objects.bulk_create([
+        ChangeLog(resource=model._meta.model_name, object_id=pk)
+        for model, ids in models_and_ids for pk in ids
+    ])
+
+
+@transaction.atomic
+def archive_teacher(teacher):
+    """Soft-delete ``teacher`` and all of their courses."""
+    course_ids = list(Course.objects.filter(teacher_id=teacher.pk).values_list('pk', flat=True))
+    now = timezone.now()
+    Teacher.all_objects.filter(pk=teacher.pk).update(is_deleted=True, updated_at=now)
+    Course.all_objects.filter(pk__in=course_ids).update(is_deleted=True, updated_at=now)
+    _log_deletes([(Teacher, [teacher.pk]), (Course, course_ids)])
+    deadlines.courses_archived(course_ids)
+    caching.invalidate('teacher', *ARCHIVED_RESOURCES)
+    jobs.enqueue('purge_deleted', unique=True)
+
+
+@transaction.atomic
+def archive_course(course):
+    """Soft-delete ``course``."""
+    Course.all_objects.filter(pk=course.pk).update(is_deleted=True, updated_at=timezone.now())
+    _log_deletes([(Course, [course.pk])])
+    deadlines.courses_archived([course.pk])
+    caching.invalidate(*ARCHIVED_RESOURCES)
+    jobs.enqueue('purge_deleted', unique=True)
+
+
+def unreferenced(model):
+    """Return a queryset of ``model`` rows that no other row points at."""
+    queryset = model._base_manager.all()
+    for relation in model._meta.related_objects:
+        if relation.many_to_many:
+            continue
+        children = relation.related_model._base_manager.filter(**{relation.field.name: OuterRef('pk')})
+        queryset = queryset.exclude(Exists(children))
+    return queryset
+
+
+def purge_batch(model, lookup, size):
+    """Delete up to ``size`` purgeable rows of ``model`` in one transaction; return how many went."""
+    with transaction.atomic():
+        ids = list(
+            unreferenced(model).filter(**{lookup: True}).order_by('pk')
+            .values_list('pk', flat=True)[:size]
+        )
+        if not ids:
+            return 0
+        if model in LOGGED_MODELS:
+            _log_deletes([(model, ids)])
+            caching.invalidate(model._meta.model_name)
+        model._base_manager.filter(pk__in=ids)._raw_delete(model._base_manager.db)
+    return len(ids)
+
+
+def purge(size=None, max_batches=None):
+    """Hard-delete archived teachers and courses with everything under them.
+
+    Runs until nothing is left or ``max_batches`` batches were deleted and
+    returns ``{model name: rows deleted}``.
+    """
+    size = size or batch_size()
+    deleted = {}
+    batches = 0
+    progress = True
+    while progress:
+        progress = False
+        for model, lookup in STEPS:
+            while max_batches is None or batches < max_batches:
+                count = purge_batch(model, lookup, size)
+                if not count:
+                    break
+                batches += 1
+                progress = True
+                name = model._meta.model_name
+                deleted[name] = deleted.get(name, 0) + count
+            if max_batches is not None and batches >= max_batches:
+                return deleted
+    return deleted
@@ -0,0 +1,22 @@
+from rest_framework.renderers import JSONRenderer
+
+from .fastpath import render_fast_json
+from .instrumentation import timed
+
+
+class InstrumentedJSONRenderer(JSONRenderer):
+    """JSON renderer that reports its render time to request instrumentation.
+
+    Responses built by ``FastListMixin`` are encoded with orjson when it is
+    installed; the bytes are the same as the stdlib encoder's.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed('render'):
+            renderer_context = renderer_context or {}
+            response = renderer_context.get('response')
+            if getattr(response, 'fast_json', False) and self.get_indent(accepted_media_type, renderer_context) is None:
+                content = render_fast_json(data)
+                if content is not None:
+                    return content
+            return super().render(data, accepted_media_type, renderer_context)
@@ -0,0 +1,211 @@
+"""Bulk roster import for students, teachers and enrollments.
+
+Rows are read from a CSV or NDJSON stream and handled in chunks: each chunk
+is validated in one pass, its foreign keys are resolved with one query per
+related model, and its valid rows are written with ``bulk_create`` in a
+single transaction. Invalid rows are skipped and reported by row number.
+"""
+import codecs
+import csv
+import io
+import json
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+
+from . import caching, deadlines, gradebook
+from .models import Course, Enrollment, Student, Teacher
+from .serializers import StudentSerializer, TeacherSerializer
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+FORMATS = ('csv', 'ndjson')
+
+
+class EnrollmentImportSerializer(serializers.Serializer):
+    student = serializers.IntegerField()
+    course = serializers.IntegerField()
+
+
+class RosterKind:
+    """How to validate and build one kind of roster row."""
+
+    def __init__(self, model, serializer_class, foreign_keys=None, unique_together=None, after_create=None):
+        self.model = model
+        self.serializer_class = serializer_class
+        self.foreign_keys = foreign_keys or {}
+        self.unique_together = unique_together
+        # Called with each created chunk, for bookkeeping bulk_create skips
+        self.after_create = after_create
+
+
+def _enrollments_created(objects):
+    gradebook.refresh_enrollment_counts({obj.course_id for obj in objects})
+    deadlines.enrollments_created(objects)
+
+
+KINDS = {
+    'students': RosterKind(Student, StudentSerializer),
+    'teachers': RosterKind(Teacher, TeacherSerializer),
+    'enrollments': RosterKind(
+        Enrollment, EnrollmentImportSerializer, {'student': Student, 'course': Course},
+        unique_together=('student_id', 'course_id'), after_create=_enrollments_created,
+    ),
+}
+
+
+def format_for_content_type(content_type):
+    """Map a request content type to an import format, or None."""
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type in ('text/csv', 'application/csv'):
+        return 'csv'
+    if content_type in ('application/x-ndjson', 'application/ndjson', 'application/jsonl', 'application/x-jsonlines'):
+        return 'ndjson'
+    return None
+
+
+class MalformedBody(ValueError):
+    """The stream cannot be read as rows; ``report`` covers the chunks imported before that."""
+    report = None
+
+
+def read_rows(stream, fmt):
+    """Yield ``(row_number, row)`` pairs from a binary or text stream.
+
+    Raises ``MalformedBody`` if the stream is not UTF-8.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f'Unsupported import format: {fmt}')
+    if isinstance(stream, io.TextIOBase):
+        text = stream
+    else:
+        text = codecs.getreader('utf-8-sig')(stream)
+    try:
+        if fmt == 'csv':
+            for number, row in enumerate(csv.DictReader(text), start=1):
+                # Empty cells mean "not given" so model defaults apply.
+                yield number, {key.strip(): value for key, value in row.items() if key and value != ''}
+        else:
+            for number, line in enumerate(text, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as exc:
+                    row = exc
+                yield number, row
+    except UnicodeDecodeError as exc:
+        raise MalformedBody(f'The body is not valid UTF-8: {exc.reason} at byte {exc.start}.') from exc
+
+
+class ImportReport:
+
+    def __init__(self):
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, row_number, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'errors': errors})
+
+    def as_dict(self):
+        return {'created': self.created, 'error_count': self.error_count, 'errors': self.errors}
+
+
+def import_roster(kind, stream, fmt, chunk_size=CHUNK_SIZE):
+    """Import ``kind`` rows from ``stream`` and return an ``ImportReport``."""
+    roster = KINDS[kind]
+    report = ImportReport()
+    rows = read_rows(stream, fmt)
+    try:
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            _import_chunk(roster, chunk, report)
+    except MalformedBody as exc:
+        exc.report = report
+        raise
+    return report
+
+
+def _resolve_foreign_keys(roster, chunk):
+    """Return ``{field: set(existing ids)}`` using one query per related model."""
+    existing = {}
+    for field, model in roster.foreign_keys.items():
+        wanted = set()
+        for _, row in chunk:
+            if isinstance(row, dict):
+                try:
+                    wanted.add(int(row.get(field)))
+                except (TypeError, ValueError):
+                    pass
+        existing[field] = set(model.objects.filter(pk__in=wanted).values_list('pk', flat=True))
+    return existing
+
+
+def _import_chunk(roster, chunk, report):
+    existing = _resolve_foreign_keys(roster, chunk)
+    objects, numbers = [], []
+    for number, row in chunk:
+        if not isinstance(row, dict):
+            report.add_error(number, {'non_field_errors': ['Row is not a JSON object.']})
+            continue
+        serializer = roster.serializer_class(data=row)
+        if not serializer.is_valid():
+            report.add_error(number, serializer.errors)
+            continue
+        data = dict(serializer.validated_data)
+        missing = {
+            field: [f'Invalid pk "{data[field]}" - object does not exist.']
+            for field in roster.foreign_keys if data[field] not in existing[field]
+        }
+        if missing:
+            report.add_error(number, missing)
+            continue
+        for field in roster.foreign_keys:
+            data[f'{field}_id'] = data.pop(field)
+        objects.append(roster.model(**data))
+        numbers.append(number)
+
+    if roster.unique_together and objects:
+        objects, numbers = _drop_duplicates(roster, objects, numbers, report)
+    if not objects:
+        return
+    try:
+        with transaction.atomic():
+            roster.model.objects.bulk_create(objects)
+            if roster.after_create is not None:
+                roster.after_create(objects)
+            caching.invalidate(roster.model._meta.model_name)
+    except IntegrityError as exc:
+        for number in numbers:
+            report.add_error(number, {'non_field_errors': [f'Chunk rejected by the database: {exc}']})
+        return
+    report.created += len(objects)
+
+
+def _drop_duplicates(roster, objects, numbers, report):
+    """Skip rows that repeat an existing row, or an earlier row of the chunk, on ``unique_together``."""
+    fields = roster.unique_together
+    keys = [tuple(getattr(obj, field) for field in fields) for obj in objects]
+    candidates = roster.model.objects.filter(**{
+        f'{field}__in': {key[i] for key in keys} for i, field in enumerate(fields)
+    })
+    seen = set(candidates.values_list(*fields))
+    kept_objects, kept_numbers = [], []
+    for obj, number, key in zip(objects, numbers, keys):
+        if key in seen:
+            report.add_error(number, {'non_field_errors': [
+                f'{roster.model._meta.verbose_name.capitalize()} already exists.'
+            ]})
+            continue
+        seen.add(key)
+        kept_objects.append(obj)
+        kept_numbers.append(number)
+    return kept_objects, kept_numbers
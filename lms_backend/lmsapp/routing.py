@@ -0,0 +1,146 @@
+"""Read/write splitting across the primary database and read replicas.
+
+Views with ``ReplicaReadMixin`` run their GET/HEAD requests against one of
+the aliases in ``LMS_DB_REPLICAS``; everything else (writes, authentication,
+background jobs, management commands) stays on ``default``. A replica that
+cannot be connected to is skipped for ``LMS_DB_REPLICA_RETRY_SECONDS``, and
+the request falls back to the primary.
+
+Replicas lag behind the primary, so after an authenticated user sends a
+write, ``ReadYourWritesMiddleware`` pins that user's reads to the primary
+for ``LMS_READ_YOUR_WRITES_SECONDS``. The pin is kept in the Django cache;
+use a shared cache (``LMS_CACHE_DIR``) when running several web workers.
+"""
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from rest_framework.permissions import SAFE_METHODS
+
+logger = logging.getLogger('lmsapp.routing')
+
+PIN_KEY = 'lms:db-pin:{}'
+
+# Models always read from the primary: authentication must see fresh accounts
+PRIMARY_APPS = {'auth', 'contenttypes', 'sessions', 'admin'}
+PRIMARY_MODELS = {'lmsapp.profile', 'lmsapp.job'}
+
+_read_alias = ContextVar('lms_read_alias', default=None)
+# alias -> time.monotonic() before which it is not tried again
+_down_until = {}
+
+
+def replicas():
+    return list(getattr(settings, 'LMS_DB_REPLICAS', ()))
+
+
+def pin_seconds():
+    return getattr(settings, 'LMS_READ_YOUR_WRITES_SECONDS', 5)
+
+
+def healthy_replica():
+    """Return a connectable replica alias, chosen at random, or None if there is none."""
+    now = time.monotonic()
+    aliases = replicas()
+    for alias in random.sample(aliases, len(aliases)):
+        if _down_until.get(alias, 0) > now:
+            continue
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError as exc:
+            _down_until[alias] = now + getattr(settings, 'LMS_DB_REPLICA_RETRY_SECONDS', 30)
+            logger.warning('Replica %s is unavailable, reading from the primary: %s', alias, exc)
+            continue
+        return alias
+    return None
+
+
+def replica_in_use():
+    return _read_alias.get() is not None
+
+
+def pin(user):
+    """Keep ``user``'s reads on the primary for the read-your-writes window."""
+    cache.set(PIN_KEY.format(user.pk), True, pin_seconds())
+
+
+def pinned(user):
+    return user is not None and user.is_authenticated and bool(cache.get(PIN_KEY.format(user.pk)))
+
+
+class ReplicaRouter:
+    """Send reads to the replica chosen for the current request, and everything else to ``default``."""
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None:
+            return DEFAULT_DB_ALIAS
+        meta = model._meta
+        if meta.app_label in PRIMARY_APPS or meta.label_lower in PRIMARY_MODELS:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaReadMixin:
+    """Serve the view's GET/HEAD requests from a replica unless the user has just written."""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and replicas() and not pinned(request.user):
+            alias = healthy_replica()
+            if alias is not None:
+                self._read_alias_token = _read_alias.set(alias)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        try:
+            return super().finalize_response(request, response, *args, **kwargs)
+        finally:
+            token = getattr(self, '_read_alias_token', None)
+            if token is not None:
+                self._read_alias_token = None
+                _read_alias.reset(token)
+
+
+class ReadYourWritesMiddleware:
+    """Pin an authenticated user to the primary after any non-GET request they send."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        self.after_response(request)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        self.after_response(request)
+        return response
+
+    def after_response(self, request):
+        # DRF copies the authenticated user onto the underlying request
+        user = getattr(request, 'user', None)
+        if request.method not in SAFE_METHODS and replicas() and user is not None and user.is_authenticated:
+            pin(user)
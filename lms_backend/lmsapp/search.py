@@ -0,0 +1,205 @@
+"""Full-text course search.
+
+Courses are indexed over their title and description plus the teacher's
+name and subject. The index lives in the database and is maintained by
+triggers, so it also stays correct for ``bulk_create``, queryset updates
+and cascading deletes that never reach model signals:
+
+* SQLite: an FTS5 virtual table ``lmsapp_course_fts`` keyed by course id,
+  ranked with ``bm25()``.
+* PostgreSQL: a ``search_vector`` tsvector column on ``lmsapp_course`` with
+  a GIN index, ranked with ``ts_rank()``.
+
+Other databases fall back to unranked ``icontains`` filters, which scan the
+table.
+"""
+import re
+
+from django.db import connection as default_connection
+
+FTS_TABLE = 'lmsapp_course_fts'
+
+SQLITE_TRIGGERS = {
+    'lmsapp_course_fts_insert': f"""
+        CREATE TRIGGER IF NOT EXISTS lmsapp_course_fts_insert AFTER INSERT ON lmsapp_course BEGIN
+            INSERT INTO {FTS_TABLE} (rowid, title, description, teacher_name, teacher_subject)
+            SELECT NEW.id, NEW.title, NEW.description, t.name, t.subject
+            FROM lmsapp_teacher t WHERE t.id = NEW.teacher_id;
+        END
+    """,
+    'lmsapp_course_fts_update': f"""
+        CREATE TRIGGER IF NOT EXISTS lmsapp_course_fts_update
+        AFTER UPDATE OF title, description, teacher_id ON lmsapp_course BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = OLD.id;
+            INSERT INTO {FTS_TABLE} (rowid, title, description, teacher_name, teacher_subject)
+            SELECT NEW.id, NEW.title, NEW.description, t.name, t.subject
+            FROM lmsapp_teacher t WHERE t.id = NEW.teacher_id;
+        END
+    """,
+    'lmsapp_course_fts_delete': f"""
+        CREATE TRIGGER IF NOT EXISTS lmsapp_course_fts_delete AFTER DELETE ON lmsapp_course BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = OLD.id;
+        END
+    """,
+    'lmsapp_teacher_fts_update': f"""
+        CREATE TRIGGER IF NOT EXISTS lmsapp_teacher_fts_update AFTER UPDATE OF name, subject ON lmsapp_teacher BEGIN
+            UPDATE {FTS_TABLE} SET teacher_name = NEW.name, teacher_subject = NEW.subject
+            WHERE rowid IN (SELECT id FROM lmsapp_course WHERE teacher_id = NEW.id);
+        END
+    """,
+}
+
+POSTGRES_INSTALL = [
+    "ALTER TABLE lmsapp_course ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    "CREATE INDEX IF NOT EXISTS lmsapp_course_search_vector_gin ON lmsapp_course USING GIN (search_vector)",
+    """
+    CREATE OR REPLACE FUNCTION lmsapp_course_search_vector() RETURNS trigger AS $$
+    BEGIN
+        SELECT setweight(to_tsvector('simple', coalesce(NEW.title, '')), 'A')
+            || setweight(to_tsvector('simple', coalesce(t.name, '') || ' ' || coalesce(t.subject, '')), 'B')
+            || setweight(to_tsvector('simple', coalesce(NEW.description, '')), 'C')
+        INTO NEW.search_vector
+        FROM lmsapp_teacher t WHERE t.id = NEW.teacher_id;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION lmsapp_teacher_search_vector() RETURNS trigger AS $$
+    BEGIN
+        UPDATE lmsapp_course SET title = title WHERE teacher_id = NEW.id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS lmsapp_course_search_vector ON lmsapp_course",
+    """
+    CREATE TRIGGER lmsapp_course_search_vector
+    BEFORE INSERT OR UPDATE OF title, description, teacher_id ON lmsapp_course
+    FOR EACH ROW EXECUTE FUNCTION lmsapp_course_search_vector()
+    """,
+    "DROP TRIGGER IF EXISTS lmsapp_teacher_search_vector ON lmsapp_teacher",
+    """
+    CREATE TRIGGER lmsapp_teacher_search_vector
+    AFTER UPDATE OF name, subject ON lmsapp_teacher
+    FOR EACH ROW EXECUTE FUNCTION lmsapp_teacher_search_vector()
+    """,
+]
+
+POSTGRES_UNINSTALL = [
+    "DROP TRIGGER IF EXISTS lmsapp_teacher_search_vector ON lmsapp_teacher",
+    "DROP TRIGGER IF EXISTS lmsapp_course_search_vector ON lmsapp_course",
+    "DROP FUNCTION IF EXISTS lmsapp_teacher_search_vector()",
+    "DROP FUNCTION IF EXISTS lmsapp_course_search_vector()",
+    "DROP INDEX IF EXISTS lmsapp_course_search_vector_gin",
+    "ALTER TABLE lmsapp_course DROP COLUMN IF EXISTS search_vector",
+]
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def install(connection=default_connection):
+    """Create the index and its triggers if missing, rebuilding when anything was missing.
+
+    Safe to run repeatedly. SQLite drops a table's triggers whenever a
+    migration rebuilds that table, so this also runs after every migrate.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name IN (%s)"
+                % ', '.join(['%s'] * (len(SQLITE_TRIGGERS) + 1)),
+                [FTS_TABLE, *SQLITE_TRIGGERS],
+            )
+            if len(cursor.fetchall()) == len(SQLITE_TRIGGERS) + 1:
+                return
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                "USING fts5(title, description, teacher_name, teacher_subject)"
+            )
+            for sql in SQLITE_TRIGGERS.values():
+                cursor.execute(sql)
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                "SELECT count(*) FROM pg_trigger WHERE tgname IN "
+                "('lmsapp_course_search_vector', 'lmsapp_teacher_search_vector')"
+            )
+            if cursor.fetchone()[0] == 2:
+                return
+            for sql in POSTGRES_INSTALL:
+                cursor.execute(sql)
+        else:
+            return
+    rebuild(connection)
+
+
+def uninstall(connection=default_connection):
+    """Drop the index and its triggers."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        elif connection.vendor == 'postgresql':
+            for sql in POSTGRES_UNINSTALL:
+                cursor.execute(sql)
+
+
+def rebuild(connection=default_connection):
+    """Re-index every course from scratch."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, description, teacher_name, teacher_subject) "
+                "SELECT c.id, c.title, c.description, t.name, t.subject "
+                "FROM lmsapp_course c JOIN lmsapp_teacher t ON t.id = c.teacher_id"
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute("UPDATE lmsapp_course SET title = title")
+
+
+def search_course_ids(query, limit, offset=0, connection=default_connection):
+    """Return the ids of courses matching ``query``, best match first.
+
+    Every word in the query must match, as a prefix, somewhere in the
+    course title, description or teacher name/subject.
+    """
+    terms = TERM_RE.findall(query)
+    if not terms:
+        return []
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            match = ' '.join('"%s"*' % term for term in terms)
+            cursor.execute(
+                f"SELECT {FTS_TABLE}.rowid FROM {FTS_TABLE} JOIN lmsapp_course ON lmsapp_course.id = {FTS_TABLE}.rowid "
+                f"WHERE {FTS_TABLE} MATCH %s AND NOT lmsapp_course.is_deleted "
+                f"ORDER BY bm25({FTS_TABLE}, 10.0, 1.0, 5.0, 5.0), {FTS_TABLE}.rowid LIMIT %s OFFSET %s",
+                [match, limit, offset],
+            )
+        elif connection.vendor == 'postgresql':
+            tsquery = ' & '.join('%s:*' % term for term in terms)
+            cursor.execute(
+                "SELECT id FROM lmsapp_course WHERE search_vector @@ to_tsquery('simple', %s) AND NOT is_deleted "
+                "ORDER BY ts_rank(search_vector, to_tsquery('simple', %s)) DESC, id LIMIT %s OFFSET %s",
+                [tsquery, tsquery, limit, offset],
+            )
+        else:
+            return _unindexed_course_ids(terms, limit, offset, connection.alias)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _unindexed_course_ids(terms, limit, offset, using):
+    """Substring search for databases without a full-text index; scans the table and ranks by id."""
+    # Imported here: migrations import this module for the trigger SQL
+    from django.db.models import Q
+
+    from .models import Course
+
+    queryset = Course.objects.using(using)
+    for term in terms:
+        queryset = queryset.filter(
+            Q(title__icontains=term) | Q(description__icontains=term)
+            | Q(teacher__name__icontains=term) | Q(teacher__subject__icontains=term)
+        )
+    return list(queryset.order_by('id').values_list('id', flat=True)[offset:offset + limit])
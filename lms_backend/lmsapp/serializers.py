@@ -1,10 +1,40 @@
 from django.contrib.auth.models import User
+from django.db import transaction
 
 from rest_framework import serializers
 
-from .models import Assignment, Course, Enrollment, Profile, Student, Submission, Teacher,Lesson,Results
+from .fieldsets import FieldSelectionMixin
+from .instrumentation import timed
+from .models import Assignment, Course, Deadline, Enrollment, Profile, Student, Submission, Teacher,Lesson,Results
 
-class RegisterSerializer(serializers.ModelSerializer):
+
+class TimedListSerializer(serializers.ListSerializer):
+    @property
+    def data(self):
+        with timed('serialize'):
+            return super().data
+
+
+class LmsModelSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    """Base serializer for the API.
+
+    Reports serialization time to request instrumentation and accepts
+    ``fields=``/``expand=`` (see ``lmsapp.fieldsets``).
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        meta = getattr(cls, 'Meta', None)
+        if meta is not None and not hasattr(meta, 'list_serializer_class'):
+            meta.list_serializer_class = TimedListSerializer
+
+    @property
+    def data(self):
+        with timed('serialize'):
+            return super().data
+
+
+class RegisterSerializer(LmsModelSerializer):
     phone = serializers.CharField(required=True, write_only=True)
     first_name = serializers.CharField(required=True)
 
@@ -13,6 +43,7 @@ class RegisterSerializer(serializers.ModelSerializer):
         fields = ['username', 'password', 'phone', 'first_name','last_name']
         extra_kwargs = {'password': {'write_only': True}}
 
+    @transaction.atomic
     def create(self, validated_data):
         phone = validated_data.pop('phone')
         first_name = validated_data.pop('first_name')
@@ -30,38 +61,84 @@ class LoginSerializer(serializers.Serializer):
     password = serializers.CharField(required=True, write_only=True)
 
 
-class TeacherSerializer(serializers.ModelSerializer):
+class TeacherSerializer(LmsModelSerializer):
     class Meta:
         model = Teacher
-        fields = ['id', 'name', 'email', 'subject', 'is_active']
-class StudentSerializer(serializers.ModelSerializer):
+        fields = ['id', 'name', 'email', 'subject', 'is_active', 'updated_at']
+class StudentSerializer(LmsModelSerializer):
     class Meta:
         model = Student
-        fields = ['id', 'name', 'email', 'enrollment_date', 'is_active', 'roll_number']
+        fields = ['id', 'name', 'email', 'enrollment_date', 'is_active', 'roll_number', 'updated_at']
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(LmsModelSerializer):
     class Meta:
         model = Course
-        fields = ['id', 'title', 'description', 'teacher']
+        fields = ['id', 'title', 'description', 'teacher', 'updated_at']
+        expandable_fields = {
+            'teacher': ('TeacherSerializer', {}),
+            'lessons': ('LessonSerializer', {'source': 'lesson_set', 'many': True}),
+            'assignments': ('AssignmentSerializer', {'source': 'assignment_set', 'many': True}),
+        }
 
-class EnrollmentSerializer(serializers.ModelSerializer):
+class EnrollmentSerializer(LmsModelSerializer):
     class Meta:
         model = Enrollment
-        fields = ['id', 'student', 'course', 'enrollment_date']
+        fields = ['id', 'student', 'course', 'enrollment_date', 'updated_at']
+        expandable_fields = {
+            'student': ('StudentSerializer', {}),
+            'course': ('CourseSerializer', {}),
+        }
 
-class LessonSerializer(serializers.ModelSerializer):
+class LessonSerializer(LmsModelSerializer):
     class Meta:
         model = Lesson
-        fields = ['id', 'title', 'description', 'course']
-class AssignmentSerializer(serializers.ModelSerializer):
+        fields = ['id', 'title', 'description', 'course', 'updated_at']
+        expandable_fields = {
+            'course': ('CourseSerializer', {}),
+        }
+class AssignmentSerializer(LmsModelSerializer):
     class Meta:
         model = Assignment
-        fields = ['id', 'title', 'description', 'lesson', 'due_date', 'course']
-class SubmissionSerializer(serializers.ModelSerializer):
+        fields = ['id', 'title', 'description', 'lesson', 'due_date', 'course', 'updated_at']
+        expandable_fields = {
+            'lesson': ('LessonSerializer', {}),
+            'course': ('CourseSerializer', {}),
+        }
+class SubmissionSerializer(LmsModelSerializer):
+    content = serializers.CharField()
+
     class Meta:
         model = Submission
-        fields = ['id', 'assignment', 'student', 'submitted_at', 'content']
-class ResultSerializer(serializers.ModelSerializer):
+        fields = ['id', 'assignment', 'student', 'submitted_at', 'content', 'updated_at']
+        field_relations = {'content': 'body'}
+        expandable_fields = {
+            'assignment': ('AssignmentSerializer', {}),
+            'student': ('StudentSerializer', {}),
+        }
+class ResultSerializer(LmsModelSerializer):
     class Meta:
         model = Results
-        fields = ['id', 'submission', 'score', 'feedback']
\ No newline at end of file
+        fields = ['id', 'submission', 'score', 'feedback', 'updated_at']
+        expandable_fields = {
+            'submission': ('SubmissionSerializer', {}),
+        }
+
+
+class UpcomingAssignmentSerializer(LmsModelSerializer):
+    title = serializers.CharField(source='assignment.title')
+
+    class Meta:
+        model = Deadline
+        fields = ['assignment', 'title', 'course', 'due_date']
+
+
+class CourseDetailSerializer(LmsModelSerializer):
+    """Read-only course with its teacher, lessons and assignments inlined."""
+    teacher = TeacherSerializer(read_only=True)
+    lessons = LessonSerializer(source='lesson_set', many=True, read_only=True)
+    assignments = AssignmentSerializer(source='assignment_set', many=True, read_only=True)
+    enrollment_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Course
+        fields = ['id', 'title', 'description', 'teacher', 'lessons', 'assignments', 'enrollment_count']
@@ -0,0 +1,136 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import caching, deadlines, events, gradebook, login, sync
+from .authentication import user_cache
+from .models import Assignment, Course, Enrollment, Lesson, Profile, Results, Student, Submission, Teacher
+
+CACHED_MODELS = [Teacher, Student, Course, Enrollment, Lesson, Assignment, Submission, Results]
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.delete(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Profile)
+def invalidate_cached_profile_user(sender, instance, **kwargs):
+    user_cache.delete(instance.user_id)
+
+
+@receiver(post_save, sender=Profile)
+def forget_unknown_phone(sender, instance, **kwargs):
+    login.forget_unknown([instance.phone])
+
+
+@receiver([post_save, post_delete])
+def invalidate_cached_responses(sender, **kwargs):
+    if sender in CACHED_MODELS:
+        caching.invalidate(sender._meta.model_name)
+
+
+@receiver(post_delete)
+def record_deleted_row(sender, instance, **kwargs):
+    if sender in CACHED_MODELS:
+        sync.record_delete(sender, instance.pk)
+
+
+@receiver(pre_save, sender=Results)
+def remember_previous_grade(sender, instance, raw=False, **kwargs):
+    instance._previous_grade = None
+    if instance.pk is not None and not raw:
+        instance._previous_grade = (
+            Results.objects.filter(pk=instance.pk).values_list('submission_id', 'score').first()
+        )
+
+
+@receiver(post_save, sender=Results)
+def update_gradebook_for_result(sender, instance, raw=False, **kwargs):
+    if not raw:
+        gradebook.result_saved(instance, instance._previous_grade)
+
+
+@receiver(post_delete, sender=Results)
+def update_gradebook_for_deleted_result(sender, instance, **kwargs):
+    gradebook.result_deleted(instance)
+
+
+@receiver(post_save, sender=Submission)
+def count_new_submission(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        gradebook.submission_count_changed(instance.assignment_id, 1)
+
+
+@receiver(post_delete, sender=Submission)
+def count_deleted_submission(sender, instance, **kwargs):
+    gradebook.submission_count_changed(instance.assignment_id, -1)
+
+
+@receiver(post_save, sender=Enrollment)
+def count_new_enrollment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        gradebook.enrollment_count_changed(instance.course_id, 1)
+
+
+@receiver(post_delete, sender=Enrollment)
+def count_deleted_enrollment(sender, instance, **kwargs):
+    gradebook.enrollment_count_changed(instance.course_id, -1)
+
+
+@receiver(post_save, sender=Assignment)
+def update_gradebook_for_assignment(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        gradebook.assignment_saved(instance, created)
+
+
+@receiver(post_delete, sender=Assignment)
+def update_gradebook_for_deleted_assignment(sender, instance, **kwargs):
+    gradebook.assignment_deleted(instance)
+
+
+@receiver(post_save, sender=Submission)
+def publish_submission_event(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        events.submission_saved(instance, created)
+
+
+@receiver(post_save, sender=Results)
+def publish_result_event(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        events.result_saved(instance, created)
+
+
+@receiver(pre_save, sender=Enrollment)
+@receiver(pre_save, sender=Assignment)
+@receiver(pre_save, sender=Submission)
+def remember_deadline_fields(sender, instance, raw=False, **kwargs):
+    instance._previous_deadline_fields = None if raw else deadlines.previous_values(instance)
+
+
+@receiver(post_save, sender=Enrollment)
+def update_deadlines_for_enrollment(sender, instance, raw=False, **kwargs):
+    if not raw:
+        deadlines.enrollment_saved(instance, instance._previous_deadline_fields)
+
+
+@receiver(post_delete, sender=Enrollment)
+def update_deadlines_for_deleted_enrollment(sender, instance, **kwargs):
+    deadlines.enrollment_deleted(instance)
+
+
+@receiver(post_save, sender=Assignment)
+def update_deadlines_for_assignment(sender, instance, raw=False, **kwargs):
+    if not raw:
+        deadlines.assignment_saved(instance, instance._previous_deadline_fields)
+
+
+@receiver(post_save, sender=Submission)
+def update_deadlines_for_submission(sender, instance, raw=False, **kwargs):
+    if not raw:
+        deadlines.submission_saved(instance, instance._previous_deadline_fields)
+
+
+@receiver(post_delete, sender=Submission)
+def update_deadlines_for_deleted_submission(sender, instance, **kwargs):
+    deadlines.submission_deleted(instance)
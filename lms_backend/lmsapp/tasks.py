@@ -0,0 +1,26 @@
+"""Functions background jobs can run, by name (see ``lmsapp.jobs``).
+
+Each is called with the job's payload as keyword arguments, so payloads
+must be JSON. Tasks may run more than once (a retry, or a worker that died
+mid-job), so they must be safe to repeat.
+"""
+from . import deadlines, gradebook, purge
+
+
+def purge_deleted():
+    purge.purge()
+
+
+def rebuild_gradebook(course_ids=None):
+    gradebook.rebuild(course_ids)
+
+
+def rebuild_deadlines(course_ids=None):
+    deadlines.rebuild(course_ids)
+
+
+TASKS = {
+    'purge_deleted': purge_deleted,
+    'rebuild_gradebook': rebuild_gradebook,
+    'rebuild_deadlines': rebuild_deadlines,
+}
@@ -1,3 +1,1437 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import datetime
+import io
+import json
+import re
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection, connections, transaction
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import benchmark, deadlines, events, export, fastpath, gradebook, instrumentation, jobs, login, provisioning, purge, routing, search, sync, tasks
+from .authentication import LmsRefreshToken, user_cache
+from .models import (
+    Assignment, AssignmentStats, ChangeLog, Course, CourseStats, Deadline, Enrollment, FeedEvent, Job, Lesson, Profile,
+    Results, Student, Submission, SubmissionContent, Teacher,
+)
+from .views import StudentUpcomingView
+
+
+@override_settings(LMS_INSTRUMENTATION_SAMPLE_RATE=0, LMS_RESPONSE_CACHE_TTL=0)
+class LmsTestCase(TestCase):
+    """Base test case with an authenticated client and a small course tree."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='tester', password='secret-pass')
+        cls.teacher = Teacher.objects.create(name='Ada', email='ada@example.com', subject='Maths')
+        cls.course = Course.objects.create(title='Algebra', description='Groups and rings', teacher=cls.teacher)
+        cls.lessons = [
+            Lesson.objects.create(title=f'Lesson {i}', description='...', course=cls.course)
+            for i in range(3)
+        ]
+        now = timezone.now()
+        cls.assignments = [
+            Assignment.objects.create(
+                title=f'Homework {i}', description='...', lesson=lesson, course=cls.course,
+                due_date=now + datetime.timedelta(days=i),
+            )
+            for i, lesson in enumerate(cls.lessons)
+        ]
+        cls.students = [
+            Student.objects.create(name=f'Student {i}', email=f's{i}@example.com', enrollment_date=now.date())
+            for i in range(4)
+        ]
+        for student in cls.students:
+            Enrollment.objects.create(student=student, course=cls.course)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class CourseFullViewTests(LmsTestCase):
+
+    def test_returns_nested_course(self):
+        response = self.client.get(f'/api/course/{self.course.pk}/full/')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['teacher']['name'], 'Ada')
+        self.assertEqual(len(data['lessons']), 3)
+        self.assertEqual([a['id'] for a in data['assignments']], [a.id for a in self.assignments])
+        self.assertEqual(data['enrollment_count'], 4)
+
+    def test_query_count_is_fixed(self):
+        with self.assertNumQueries(3):
+            self.client.get(f'/api/course/{self.course.pk}/full/')
+
+        extra_lesson = Lesson.objects.create(title='Extra', description='...', course=self.course)
+        Assignment.objects.create(
+            title='Extra', description='...', lesson=extra_lesson, course=self.course, due_date=timezone.now(),
+        )
+        with self.assertNumQueries(3):
+            self.client.get(f'/api/course/{self.course.pk}/full/')
+
+
+class CourseSearchTests(LmsTestCase):
+
+    def test_ranks_title_matches_and_follows_teacher_updates(self):
+        other = Teacher.objects.create(name='Grace', subject='Compilers')
+        Course.objects.create(title='Parsing', description='Algebraic grammars', teacher=other)
+
+        results = self.client.get('/api/course/search/', {'q': 'alge'}).json()['results']
+        self.assertEqual([c['title'] for c in results], ['Algebra', 'Parsing'])
+
+        self.assertEqual(self.client.get('/api/course/search/', {'q': 'hopper'}).json()['results'], [])
+        other.name = 'Grace Hopper'
+        other.save()
+        results = self.client.get('/api/course/search/', {'q': 'hopper'}).json()['results']
+        self.assertEqual([c['title'] for c in results], ['Parsing'])
+
+        self.course.delete()
+        results = self.client.get('/api/course/search/', {'q': 'alge'}).json()['results']
+        self.assertEqual([c['title'] for c in results], ['Parsing'])
+
+    def test_index_is_only_rewritten_when_indexed_columns_change(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('checks the SQLite triggers')
+
+        def rows_written(**changes):
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT total_changes()')
+                before = cursor.fetchone()[0]
+                Course.all_objects.filter(pk=self.course.pk).update(**changes)
+                cursor.execute('SELECT total_changes()')
+                return cursor.fetchone()[0] - before
+
+        # The course row alone, without a delete and insert in the index
+        self.assertEqual(rows_written(updated_at=timezone.now()), 1)
+        self.assertEqual(rows_written(is_deleted=False), 1)
+        self.assertGreater(rows_written(title='Linear algebra'), 1)
+        self.assertEqual(search.search_course_ids('linear', limit=10), [self.course.pk])
+
+    def test_other_databases_fall_back_to_substring_search(self):
+        other = Teacher.objects.create(name='Grace Hopper', subject='Compilers')
+        Course.objects.create(title='Parsing', description='Algebraic grammars', teacher=other)
+        with mock.patch.object(connection, 'vendor', 'firebird'):
+            response = self.client.get('/api/course/search/', {'q': 'alge'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([c['title'] for c in response.json()['results']], ['Algebra', 'Parsing'])
+            self.assertEqual(search.search_course_ids('hopper gram', 10), [Course.objects.get(title='Parsing').pk])
+
+
+@override_settings(LMS_RESPONSE_CACHE_TTL=300)
+class ResponseCacheTests(LmsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_conditional_get_and_invalidation(self):
+        first = self.client.get('/api/course/')
+        etag = first['ETag']
+        self.assertEqual(first.status_code, 200)
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/course/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Course.objects.create(title='Topology', description='Spaces', teacher=self.teacher)
+        response = self.client.get('/api/course/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()['results']), 2)
+
+
+class JoinTableIndexTests(LmsTestCase):
+    """The hot join-table lookups must be answered from the composite indexes."""
+
+    def explain(self, queryset):
+        if connection.vendor == 'postgresql':
+            # The test tables are tiny; stop the planner preferring a sequential scan.
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def assertUsesIndex(self, queryset, index_name, columns):
+        """Assert the plan searches ``index_name`` with equality on ``columns``.
+
+        SQLite builds unique constraints into the table as
+        ``sqlite_autoindex_*`` indexes, so there the search columns identify
+        the index instead of its name.
+        """
+        plan = self.explain(queryset)
+        if connection.vendor == 'sqlite':
+            search = ' AND '.join(f'{column}=?' for column in columns)
+            self.assertRegex(plan, rf'USING (COVERING )?INDEX ({index_name}|sqlite_autoindex_\w+) \({re.escape(search)}\)')
+        else:
+            self.assertIn(index_name, plan)
+        return plan
+
+    def test_enrollment_lookup_uses_unique_index(self):
+        student = self.students[0]
+        self.assertUsesIndex(
+            Enrollment.objects.filter(student=student, course=self.course),
+            'lmsapp_enrollment_student_course_uniq', ['student_id', 'course_id'],
+        )
+
+    def test_submission_lookup_uses_unique_index(self):
+        student = self.students[0]
+        Submission.objects.create(assignment=self.assignments[0], student=student, content='...')
+        self.assertUsesIndex(
+            Submission.objects.filter(assignment=self.assignments[0], student=student),
+            'lmsapp_submission_assignment_student_uniq', ['assignment_id', 'student_id'],
+        )
+
+    def test_course_assignments_by_due_date_use_index_order(self):
+        plan = self.assertUsesIndex(
+            Assignment.objects.filter(course=self.course).order_by('due_date'),
+            'lmsapp_assign_course_due_idx', ['course_id'],
+        )
+        self.assertNotIn('TEMP B-TREE', plan)
+        self.assertNotRegex(plan, r'\bSort\b')
+
+    def test_duplicates_are_rejected(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Enrollment.objects.create(student=self.students[0], course=self.course)
+        Submission.objects.create(assignment=self.assignments[0], student=self.students[0], content='first')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Submission.objects.create(assignment=self.assignments[0], student=self.students[0], content='again')
+
+
+class FieldSelectionTests(LmsTestCase):
+
+    def test_fields_trim_response_and_columns(self):
+        with self.assertNumQueries(1) as ctx:
+            response = self.client.get('/api/assignment/', {'fields': 'id,title'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'title'})
+        sql = ctx.captured_queries[0]['sql']
+        self.assertIn('"due_date"', sql)
+        self.assertNotIn('"description"', sql)
+
+    def test_expand_inlines_related_objects_without_extra_queries(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/assignment/', {'expand': 'lesson,course', 'fields': 'id'})
+        row = response.json()['results'][0]
+        self.assertEqual(row['lesson']['title'], 'Lesson 0')
+        self.assertEqual(row['course']['teacher'], self.teacher.pk)
+
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/course/', {'expand': 'teacher,lessons,assignments'})
+        course = response.json()['results'][0]
+        self.assertEqual(course['teacher']['name'], 'Ada')
+        self.assertEqual(len(course['lessons']), 3)
+
+    def test_expanded_field_relations_are_joined(self):
+        for i, (assignment, student) in enumerate([(a, s) for a in self.assignments for s in self.students[:2]]):
+            submission = Submission.objects.create(assignment=assignment, student=student, content=f'answer {i}')
+            Results.objects.create(submission=submission, score=i, feedback='ok')
+        for params in ({'expand': 'submission'}, {'expand': 'submission', 'fields': 'id'}):
+            with self.assertNumQueries(1):
+                response = self.client.get('/api/results/', params)
+            rows = response.json()['results']
+            self.assertEqual(len(rows), 6)
+            self.assertEqual(sorted(row['submission']['content'] for row in rows)[0], 'answer 0')
+
+    def test_unknown_names_are_rejected(self):
+        response = self.client.get('/api/course/', {'fields': 'id,nope', 'expand': 'students'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {'fields', 'expand'})
+
+    def test_empty_selection_means_all_fields(self):
+        submission = Submission.objects.create(assignment=self.assignments[0], student=self.students[0], content='x')
+        for url in ('/api/course/', f'/api/course/{self.course.pk}/', '/api/submission/'):
+            full = self.client.get(url).json()
+            for value in ('', ',', ' , '):
+                with self.subTest(url=url, value=value):
+                    response = self.client.get(url, {'fields': value, 'expand': value})
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(response.json(), full)
+        # Views with default_fields fall back to them, not to nothing
+        row = self.client.get('/api/submission/', {'fields': ''}).json()['results'][0]
+        self.assertEqual(row['id'], submission.pk)
+        self.assertNotIn('content', row)
+
+
+class FastListTests(LmsTestCase):
+
+    def get_both(self, url, params=None):
+        with override_settings(LMS_FAST_LIST=False):
+            slow = self.client.get(url, params)
+        fast = self.client.get(url, params)
+        return slow, fast
+
+    def test_fast_path_is_byte_compatible(self):
+        student = self.students[0]
+        student.name = 'Zoë   "quoted"'
+        student.save()
+        submission = Submission.objects.create(assignment=self.assignments[0], student=student, content='done')
+        Results.objects.create(submission=submission, score=1e-05, feedback='tiny')
+        for url in ('/api/student/', '/api/assignment/', '/api/enrollment/', '/api/submission/', '/api/results/'):
+            for params in (None, {'fields': 'id'}, {'page_size': 2}):
+                slow, fast = self.get_both(url, params)
+                self.assertEqual(fast.status_code, 200)
+                self.assertTrue(hasattr(fast, 'fast_json'), url)
+                self.assertEqual(fast.content, slow.content, (url, params))
+
+    def test_without_orjson_the_standard_encoder_is_used(self):
+        Submission.objects.create(assignment=self.assignments[0], student=self.students[0], content='done')
+        for url in ('/api/student/', '/api/assignment/', '/api/submission/'):
+            with self.subTest(url=url):
+                with mock.patch('lmsapp.fastpath.orjson', None):
+                    self.assertIsNone(fastpath.render_fast_json({'id': 1}))
+                    slow, fast = self.get_both(url)
+                self.assertEqual(fast.status_code, 200)
+                self.assertEqual(fast.content, slow.content)
+                self.assertEqual(fast.content, self.client.get(url).content)
+
+    def test_next_cursor_follows_sort_key(self):
+        slow, fast = self.get_both('/api/assignment/', {'page_size': 2})
+        self.assertEqual(fast.json()['next'], slow.json()['next'])
+        rest = self.client.get(fast.json()['next'])
+        self.assertEqual([row['id'] for row in rest.json()['results']], [self.assignments[2].id])
+
+
+class KeysetPaginationTests(LmsTestCase):
+
+    def cursor(self, values, reverse=0):
+        data = json.dumps({'v': values, 'r': reverse}).encode()
+        return base64.urlsafe_b64encode(data).decode()
+
+    def walk(self, url, page_size):
+        ids, query = [], {'page_size': page_size}
+        while True:
+            body = self.client.get(url, query).json()
+            self.assertLessEqual(len(body['results']), page_size)
+            ids += [row['id'] for row in body['results']]
+            if body['next'] is None:
+                return ids
+            query = parse_qs(urlsplit(body['next']).query)
+
+    def test_invalid_or_tampered_cursors_get_400(self):
+        due = self.assignments[0].due_date.isoformat()
+        for cursor in ('not base64!', 'bm90IGpzb24=', self.cursor([due]), self.cursor({'due_date': due}),
+                       self.cursor(['not-a-date', 1]), self.cursor([due, 'one']), self.cursor([[due], 1])):
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/api/assignment/', {'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'cursor': ['Invalid cursor']})
+        response = self.client.get('/api/assignment/', {'cursor': self.cursor([due, 1])})
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(LMS_MAX_PAGE_SIZE=2)
+    def test_page_size_is_capped(self):
+        for page_size in (2, 3, 1000):
+            with self.subTest(page_size=page_size):
+                self.assertEqual(len(self.client.get('/api/lesson/', {'page_size': page_size}).json()['results']), 2)
+        self.assertEqual(len(self.client.get('/api/lesson/', {'page_size': 1}).json()['results']), 1)
+
+    def test_tied_sort_keys_page_in_id_order(self):
+        Assignment.objects.update(due_date=self.assignments[0].due_date)
+        expected = sorted(assignment.pk for assignment in self.assignments)
+        for page_size in (1, 2):
+            with self.subTest(page_size=page_size):
+                self.assertEqual(self.walk('/api/assignment/', page_size), expected)
+
+    def test_last_page_has_no_next_link(self):
+        first = self.client.get('/api/lesson/', {'page_size': 2}).json()
+        self.assertIsNone(first['previous'])
+        last = self.client.get(first['next']).json()
+        self.assertEqual([row['id'] for row in last['results']], [self.lessons[2].pk])
+        self.assertIsNone(last['next'])
+        back = self.client.get(last['previous']).json()
+        self.assertEqual(back['results'], first['results'])
+        self.assertIsNone(self.client.get('/api/lesson/', {'page_size': 3}).json()['next'])
+
+
+@override_settings(LMS_RESPONSE_CACHE_TTL=0)
+class DeltaSyncTests(LmsTestCase):
+
+    def test_returns_rows_changed_and_deleted_since_cursor(self):
+        full = self.client.get('/api/lesson/', {'updated_since': ''}).json()
+        self.assertEqual([row['id'] for row in full['results']], [lesson.id for lesson in self.lessons])
+        self.assertEqual(full['deleted'], [])
+        self.assertIsNotNone(sync.decode_cursor(full['sync_cursor']))
+
+        cursor = sync.encode_cursor(timezone.now())
+        changed, removed = self.lessons[0], self.lessons[1]
+        removed_id = removed.id
+        changed.title = 'Lesson renamed'
+        changed.save()
+        removed.delete()
+        for fast in (True, False):
+            with override_settings(LMS_FAST_LIST=fast):
+                data = self.client.get('/api/lesson/', {'updated_since': cursor}).json()
+            self.assertEqual([row['title'] for row in data['results']], ['Lesson renamed'])
+            self.assertEqual(data['deleted'], [removed_id])
+        self.assertEqual(ChangeLog.objects.filter(resource='assignment').count(), 1)
+
+    def test_paginates_by_update_time(self):
+        self.lessons[0].save()
+        first = self.client.get('/api/lesson/', {'updated_since': '', 'page_size': 2}).json()
+        self.assertIn('sync_cursor', first)
+        rest = self.client.get(first['next']).json()
+        ids = [row['id'] for row in first['results'] + rest['results']]
+        self.assertEqual(ids, [self.lessons[1].id, self.lessons[2].id, self.lessons[0].id])
+        self.assertNotIn('sync_cursor', rest)
+
+    def test_rejects_bad_and_expired_cursors(self):
+        response = self.client.get('/api/course/', {'updated_since': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+        expired = sync.encode_cursor(timezone.now() - datetime.timedelta(days=365))
+        response = self.client.get('/api/course/', {'updated_since': expired})
+        self.assertEqual(response.status_code, 410)
+
+
+@override_settings(LMS_RESPONSE_CACHE_TTL=0)
+class SoftDeleteTests(LmsTestCase):
+
+    def test_delete_archives_teacher_and_courses(self):
+        response = self.client.delete(f'/api/teacher/{self.teacher.pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.get('/api/course/').json()['results'], [])
+        self.assertEqual(self.client.get(f'/api/course/{self.course.pk}/').status_code, 404)
+        self.assertEqual(self.client.get('/api/course/search/', {'q': 'alge'}).json()['results'], [])
+        self.assertTrue(Course.all_objects.get(pk=self.course.pk).is_deleted)
+        self.assertEqual(Lesson.objects.count(), 3)
+        self.assertEqual(
+            sorted(ChangeLog.objects.values_list('resource', flat=True)), ['course', 'teacher'],
+        )
+
+    @override_settings(LMS_RESPONSE_CACHE_TTL=300)
+    def test_rows_under_an_archived_course_are_hidden_before_the_purge(self):
+        cache.clear()
+        submission = Submission.objects.create(assignment=self.assignments[0], student=self.students[0], content='x')
+        result = Results.objects.create(submission=submission, score=50)
+        other = Course.objects.create(title='Geometry', description='...', teacher=self.teacher)
+        kept = Lesson.objects.create(title='Kept', description='...', course=other)
+        lists = ('/api/lesson/', '/api/assignment/', '/api/enrollment/', '/api/submission/', '/api/results/')
+        for url in lists:
+            self.assertTrue(self.client.get(url).json()['results'], url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/course/{self.course.pk}/')
+        self.assertEqual([row['id'] for row in self.client.get('/api/lesson/').json()['results']], [kept.pk])
+        for url in lists[1:]:
+            self.assertEqual(self.client.get(url).json()['results'], [], url)
+        for url in (f'/api/lesson/{self.lessons[0].pk}/', f'/api/assignment/{self.assignments[0].pk}/',
+                    f'/api/submission/{submission.pk}/', f'/api/results/{result.pk}/',
+                    f'/api/submission/{submission.pk}/content/', f'/api/assignment/{self.assignments[0].pk}/stats/'):
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+        self.assertEqual(b''.join(self.client.get('/api/export/grades/ndjson/').streaming_content), b'')
+        # Not purged yet: no worker has run the queued job
+        self.assertEqual(Lesson.objects.filter(course=self.course).count(), 3)
+
+    def test_purge_is_batched_and_resumable(self):
+        other = Course.objects.create(title='Geometry', description='...', teacher=self.teacher)
+        submission = Submission.objects.create(assignment=self.assignments[0], student=self.students[0], content='x')
+        Results.objects.create(submission=submission, score=50)
+        purge.archive_course(self.course)
+
+        partial = purge.purge(size=2, max_batches=2)
+        self.assertEqual(partial, {'results': 1, 'submissioncontent': 1})
+        self.assertTrue(Submission.objects.filter(pk=submission.pk).exists())
+
+        purge.purge(size=2)
+        self.assertFalse(Course.all_objects.filter(pk=self.course.pk).exists())
+        self.assertFalse(Lesson.objects.filter(course=self.course).exists())
+        self.assertFalse(Submission.objects.exists())
+        self.assertFalse(AssignmentStats.objects.exists())
+        self.assertEqual(Student.objects.count(), 4)
+        self.assertTrue(Course.objects.filter(pk=other.pk).exists())
+        self.assertEqual(ChangeLog.objects.filter(resource='lesson').count(), 3)
+        self.assertEqual(purge.purge(), {})
+
+
+class JobQueueTests(LmsTestCase):
+
+    def test_archive_queues_one_purge_that_workers_run(self):
+        purge.archive_course(self.course)
+        purge.archive_teacher(self.teacher)
+        self.assertEqual(Job.objects.filter(name='purge_deleted').count(), 1)
+
+        with self.assertLogs('lmsapp.jobs', 'INFO') as logs:
+            self.assertEqual(jobs.work(burst=True), 1)
+        self.assertIn('"status": "done"', logs.output[0])
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNotNone(job.run_ms)
+        self.assertFalse(Course.all_objects.exists())
+        self.assertFalse(Teacher.all_objects.exists())
+
+    def test_failures_back_off_then_fail(self):
+        failing = mock.Mock(side_effect=RuntimeError('boom'))
+        with mock.patch.dict(tasks.TASKS, {'flaky': failing}), self.assertLogs('lmsapp.jobs', 'WARNING'):
+            job = jobs.enqueue('flaky', {'n': 1}, max_attempts=2)
+            claimed = jobs.claim('w1')
+            self.assertIsNone(jobs.claim('w2'))
+            self.assertEqual(jobs.run(claimed, 'w1'), Job.QUEUED)
+            job.refresh_from_db()
+            self.assertIn('RuntimeError: boom', job.last_error)
+            self.assertGreater(job.run_after, timezone.now())
+            self.assertIsNone(jobs.claim('w1'))
+
+            Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+            self.assertEqual(jobs.run(jobs.claim('w1'), 'w1'), Job.FAILED)
+        failing.assert_called_with(n=1)
+        self.assertEqual(Job.objects.get(pk=job.pk).attempts, 2)
+
+    def test_expired_lease_is_requeued(self):
+        job = jobs.enqueue('purge_deleted')
+        jobs.claim('dead-worker')
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - datetime.timedelta(hours=1))
+        self.assertEqual(jobs.requeue_expired(), 1)
+        with self.assertLogs('lmsapp.jobs', 'INFO'):
+            self.assertEqual(jobs.run(jobs.claim('w1'), 'w1'), Job.DONE)
+        with self.assertRaises(ValueError):
+            jobs.enqueue('no_such_job')
+
+
+@override_settings(LMS_DB_REPLICAS=['replica'], LMS_RESPONSE_CACHE_TTL=0)
+class ReplicaRoutingTests(LmsTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        routing._down_until.clear()
+
+    def queries_on(self, method, url, data=None, replica_down=False):
+        """Return ``(response, default queries, replica queries)`` for one request."""
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            if replica_down:
+                with mock.patch.object(connections['replica'], 'ensure_connection', side_effect=OperationalError):
+                    response = getattr(self.client, method)(url, data, format='json')
+            else:
+                response = getattr(self.client, method)(url, data, format='json')
+        return response, len(primary), len(replica)
+
+    def test_reads_use_replica_until_user_writes(self):
+        response, primary, replica = self.queries_on('get', '/api/lesson/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 3)
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+        response, _, replica = self.queries_on('patch', f'/api/lesson/{self.lessons[0].pk}/', {'title': 'New'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(replica, 0)
+
+        response, primary, replica = self.queries_on('get', f'/api/lesson/{self.lessons[0].pk}/')
+        self.assertEqual(response.json()['title'], 'New')
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_stats_are_built_and_read_on_the_primary(self):
+        for url in (f'/api/course/{self.course.pk}/stats/', f'/api/assignment/{self.assignments[0].pk}/stats/'):
+            CourseStats.objects.all().delete()
+            AssignmentStats.objects.all().delete()
+            response, primary, replica = self.queries_on('get', url)
+            self.assertEqual(response.status_code, 200)
+            self.assertGreater(primary, 0)
+            self.assertEqual(replica, 0)
+
+    def test_unreachable_replica_falls_back_to_primary(self):
+        with self.assertLogs('lmsapp.routing', 'WARNING'):
+            response, primary, replica = self.queries_on('get', '/api/course/', replica_down=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+        # Skipped without another connection attempt until the retry delay passes
+        self.assertIsNone(routing.healthy_replica())
+
+
+class AdminChangelistTests(LmsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'admin-pass')
+        self.client.force_login(admin_user)
+
+    def changelist_queries(self, model, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/admin/lmsapp/{model}/', params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        for student in self.students:
+            for assignment in self.assignments:
+                Submission.objects.create(assignment=assignment, student=student, content='...')
+        for i in range(10):
+            Course.objects.create(title=f'Course {i}', description='...', teacher=self.teacher)
+        pages = [('submission', None), ('course', None), ('student', None), ('teacher', None),
+                 ('student', {'q': 's1@example.com'}), ('course', {'q': 'algebra'})]
+        counts = {}
+        for model, params in pages:
+            counts[model, str(params)] = self.changelist_queries(model, params)
+            self.assertLessEqual(counts[model, str(params)], 6, (model, params))
+
+        Submission.objects.all().delete()
+        Course.objects.exclude(pk=self.course.pk).delete()
+        for model in ('submission', 'course'):
+            self.assertEqual(self.changelist_queries(model), counts[model, 'None'], model)
+
+    def test_delete_archives_course(self):
+        response = self.client.post(f'/admin/lmsapp/course/{self.course.pk}/delete/', {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Course.all_objects.get(pk=self.course.pk).is_deleted)
+        self.assertEqual(Lesson.objects.filter(course=self.course).count(), 3)
+
+    def test_large_tables_use_row_estimate(self):
+        with mock.patch('lmsapp.admin.estimated_row_count', return_value=5_000_000):
+            response = self.client.get('/admin/lmsapp/student/')
+        self.assertContains(response, '5000000 students')
+
+
+class CachedAuthenticationTests(LmsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        user_cache.local.clear()
+        self.client = APIClient()
+        token = LmsRefreshToken.for_user(self.user).access_token
+        self.auth = {'Authorization': f'Bearer {token}'}
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth['Authorization'])
+
+    def test_users_are_cached_until_saved(self):
+        for backend in ('local', 'django'):
+            with self.subTest(backend=backend), override_settings(LMS_AUTH_USER_CACHE=backend):
+                self.user.save()
+                with self.assertNumQueries(1):
+                    self.assertEqual(self.client.get('/api/protected/').status_code, 200)
+                with self.assertNumQueries(0):
+                    self.assertEqual(self.client.get('/api/protected/').status_code, 200)
+
+                self.user.email = f'{backend}@example.com'
+                self.user.save()
+                with self.assertNumQueries(1):
+                    response = self.client.get('/api/protected/')
+                self.assertEqual(response.json()['user']['email'], f'{backend}@example.com')
+
+    def test_inactive_users_are_rejected(self):
+        self.assertEqual(self.client.get('/api/protected/').status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get('/api/protected/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['code'], 'user_inactive')
+
+    @override_settings(LMS_AUTH_USER_CACHE='django')
+    async def test_async_views_use_the_async_cache_api(self):
+        with mock.patch('lmsapp.authentication.cache', wraps=cache) as wrapped:
+            wrapped.aget = mock.AsyncMock(wraps=cache.aget)
+            wrapped.aset = mock.AsyncMock(wraps=cache.aset)
+            for _ in range(2):
+                response = await AsyncClient().get('/api/async/course/', headers=self.auth)
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(wrapped.aget.await_count, 2)
+        self.assertEqual(wrapped.aset.await_count, 1)
+        wrapped.get.assert_not_called()
+        wrapped.set.assert_not_called()
+
+
+class AsyncReadViewTests(LmsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        token = LmsRefreshToken.for_user(self.user).access_token
+        self.auth = {'Authorization': f'Bearer {token}'}
+
+    async def pages(self, get, url):
+        """Follow ``next`` links from ``url``; return each page's results and cursor."""
+        pages = []
+        query = {'page_size': 2}
+        while True:
+            response = await get(url, query)
+            self.assertEqual(response.status_code, 200)
+            body = json.loads(response.content)
+            cursor = parse_qs(urlsplit(body['next']).query)['cursor'][0] if body['next'] else None
+            pages.append((body['results'], cursor))
+            if cursor is None:
+                return pages
+            query = {'page_size': 2, 'cursor': cursor}
+
+    async def test_lists_and_details_match_the_sync_views(self):
+        sync_get = sync_to_async(self.client.get)
+
+        async def async_get(url, query=None):
+            return await AsyncClient().get(url, query, headers=self.auth)
+
+        for sync_name, async_name in benchmark.ASYNC_ROUTE_PAIRS.items():
+            with self.subTest(route=sync_name):
+                if sync_name.endswith('-list'):
+                    model = resolve(reverse(async_name)).func.view_class.model
+                    sync_pages = await self.pages(sync_get, reverse(sync_name))
+                    self.assertEqual(await self.pages(async_get, reverse(async_name)), sync_pages)
+                    self.assertEqual(sum(len(results) for results, _ in sync_pages), await model.objects.acount())
+                    continue
+                model = resolve(reverse(async_name, kwargs={'pk': 1})).func.view_class.model
+                pk = await model.objects.order_by('pk').values_list('pk', flat=True).afirst()
+                sync_response = await sync_get(reverse(sync_name, kwargs={'pk': pk}))
+                async_response = await async_get(reverse(async_name, kwargs={'pk': pk}))
+                self.assertEqual(async_response.status_code, 200)
+                self.assertEqual(json.loads(async_response.content), sync_response.json())
+
+    async def test_missing_or_bad_credentials_get_401_with_www_authenticate(self):
+        sync_response = await sync_to_async(APIClient().get)('/api/course/')
+        for headers in ({}, {'Authorization': 'Bearer not-a-token'}):
+            with self.subTest(headers=headers):
+                response = await AsyncClient().get('/api/async/course/', headers=headers)
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="api"')
+        response = await AsyncClient().get('/api/async/course/')
+        self.assertEqual(json.loads(response.content), sync_response.json())
+        self.assertEqual(response['WWW-Authenticate'], sync_response['WWW-Authenticate'])
+
+    async def test_unknown_objects_get_404(self):
+        sync_response = await sync_to_async(self.client.get)('/api/course/999999/')
+        response = await AsyncClient().get('/api/async/course/999999/', headers=self.auth)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(json.loads(response.content), sync_response.json())
+
+
+@override_settings(LMS_EVENTS_BACKEND='lmsapp.events.LocalBackend', LMS_EVENTS_KEEPALIVE_SECONDS=5)
+class LiveEventsTests(LmsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        events._backend = None
+        token = LmsRefreshToken.for_user(self.user).access_token
+        self.auth = {'Authorization': f'Bearer {token}'}
+        self.url = f'/api/async/course/{self.course.pk}/events/'
+
+    async def open(self, url=None, **headers):
+        return await AsyncClient().get(url or self.url, headers={**self.auth, **headers})
+
+    def test_writes_publish_events_after_commit(self):
+        student = self.students[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            submission = Submission.objects.create(assignment=self.assignments[0], student=student, content='x')
+            Results.objects.create(submission=submission, score=70, feedback='ok')
+        other = Submission.objects.create(assignment=self.assignments[1], student=student, content='y')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f'/api/assignment/{self.assignments[1].pk}/grades/',
+                [{'submission': other.pk, 'score': 90}], format='json',
+            )
+        self.assertEqual(response.status_code, 200)
+        published = [(event.kind, event.course_id, event.data['submission' if event.kind.startswith('results') else 'id'])
+                     for event in events.backend().buffer]
+        self.assertEqual(published, [
+            ('submission.created', self.course.pk, submission.pk),
+            ('results.created', self.course.pk, submission.pk),
+            ('results.created', self.course.pk, other.pk),
+        ])
+
+    async def test_stream_replays_missed_events_then_pushes_new_ones(self):
+        backend = events.backend()
+        first, second = backend.publish([
+            ('submission.created', self.course.pk, {'id': 1}),
+            ('submission.updated', self.course.pk, {'id': 1}),
+        ])
+        backend.publish([('submission.created', self.course.pk + 1, {'id': 2})])
+
+        response = await self.open(**{'Last-Event-ID': str(first.id)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        frames = response.streaming_content
+        self.assertEqual(await anext(frames), b'retry: 3000\n\n')
+        self.assertEqual(await anext(frames), f'id: {second.id}\nevent: submission.updated\ndata: {{"id":1}}\n\n'.encode())
+
+        [third] = backend.publish([('results.created', self.course.pk, {'id': 5})])
+        self.assertEqual(await anext(frames), f'id: {third.id}\nevent: results.created\ndata: {{"id":5}}\n\n'.encode())
+        await sync_to_async(response.close)()
+        self.assertEqual(events.hub.count, 0)
+
+    async def test_stream_cap_and_slow_clients(self):
+        with self.settings(LMS_EVENTS_MAX_CONNECTIONS=0):
+            response = await self.open()
+        self.assertEqual(response.status_code, 503)
+
+        with self.settings(LMS_EVENTS_QUEUE_SIZE=2):
+            response = await self.open()
+            frames = response.streaming_content
+            await anext(frames)
+            events.backend().publish([('submission.created', self.course.pk, {'id': i}) for i in range(3)])
+            # Too far behind: the stream ends and the client resumes with Last-Event-ID
+            with self.assertRaises(StopAsyncIteration):
+                await anext(frames)
+        self.assertEqual(events.hub.count, 0)
+
+        response = await self.open('/api/async/course/999999/events/')
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(LMS_EVENTS_BACKEND='lmsapp.events.DatabaseBackend', LMS_EVENTS_POLL_SECONDS=0.01)
+    async def test_database_backend_fans_out_through_feed_table(self):
+        backend = events.backend()
+        [missed] = await sync_to_async(backend.publish)([('submission.created', self.course.pk, {'id': 1})])
+
+        response = await self.open(**{'Last-Event-ID': '0'})
+        frames = response.streaming_content
+        await anext(frames)
+        self.assertIn(f'id: {missed.id}\n'.encode(), await anext(frames))
+
+        [live] = await sync_to_async(backend.publish)([('results.updated', self.course.pk, {'id': 2})])
+        frame = await asyncio.wait_for(anext(frames), 5)
+        self.assertTrue(frame.startswith(f'id: {live.id}\nevent: results.updated\n'.encode()))
+        await sync_to_async(response.close)()
+        # The poller stops once the last stream closes
+        await asyncio.wait_for(backend.poller, 5)
+        self.assertEqual(await FeedEvent.objects.acount(), 2)
+
+
+class UpcomingAssignmentsTests(LmsTestCase):
+
+    def upcoming(self, student):
+        response = self.client.get(f'/api/student/{student.pk}/upcoming/')
+        self.assertEqual(response.status_code, 200)
+        return [row['assignment'] for row in response.json()['results']]
+
+    def index_rows(self):
+        return set(Deadline.objects.values_list('student_id', 'assignment_id', 'course_id', 'due_date', 'submitted'))
+
+    def test_index_follows_enrollments_assignments_and_submissions(self):
+        student = self.students[0]
+        past, soon, later = self.assignments
+        past.due_date = timezone.now() - datetime.timedelta(hours=1)
+        past.save()
+        self.assertEqual(self.upcoming(student), [soon.pk, later.pk])
+
+        submission = Submission.objects.create(assignment=soon, student=student, content='done')
+        self.assertEqual(self.upcoming(student), [later.pk])
+        submission.delete()
+        self.assertEqual(self.upcoming(student), [soon.pk, later.pk])
+
+        later.due_date = timezone.now() + datetime.timedelta(minutes=5)
+        later.save()
+        other = Course.objects.create(title='Topology', description='...', teacher=self.teacher)
+        extra = Assignment.objects.create(
+            title='Essay', description='...', lesson=self.lessons[0], course=other,
+            due_date=timezone.now() + datetime.timedelta(hours=2),
+        )
+        self.assertEqual(self.upcoming(student), [later.pk, soon.pk])
+        Enrollment.objects.create(student=student, course=other)
+        self.assertEqual(self.upcoming(student), [later.pk, extra.pk, soon.pk])
+
+        Enrollment.objects.filter(student=student, course=self.course).delete()
+        self.assertEqual(self.upcoming(student), [extra.pk])
+        purge.archive_course(other)
+        self.assertEqual(self.upcoming(student), [])
+        self.assertEqual(self.client.get('/api/student/999999/upcoming/').status_code, 404)
+
+    def test_serialization_is_timed(self):
+        with mock.patch('lmsapp.serializers.timed', wraps=instrumentation.timed) as timed:
+            self.assertEqual(len(self.upcoming(self.students[0])), 2)
+        timed.assert_any_call('serialize')
+
+    def test_rebuild_matches_incremental_rows(self):
+        Submission.objects.create(assignment=self.assignments[1], student=self.students[2], content='x')
+        self.assignments[2].course = Course.objects.create(title='Other', description='...', teacher=self.teacher)
+        self.assignments[2].save()
+        Enrollment.objects.create(student=self.students[0], course=self.assignments[2].course)
+        incremental = self.index_rows()
+        self.assertEqual(len(incremental), 4 * 2 + 1)
+        deadlines.rebuild()
+        self.assertEqual(self.index_rows(), incremental)
+
+    def test_upcoming_is_one_index_range_scan(self):
+        queryset = StudentUpcomingView(kwargs={'pk': self.students[0].pk}).get_queryset()
+        plan = queryset.order_by('due_date', 'id')[:50].explain()
+        if connection.vendor == 'sqlite':
+            self.assertRegex(plan, r'SEARCH \S*deadline\S* USING INDEX lmsapp_deadline_pending_idx')
+            self.assertNotIn('TEMP B-TREE', plan)
+
+        def queries(student):
+            with CaptureQueriesContext(connection) as captured:
+                self.upcoming(student)
+            return len(captured)
+
+        student = self.students[1]
+        baseline = queries(student)
+        for i in range(5):
+            course = Course.objects.create(title=f'Extra {i}', description='...', teacher=self.teacher)
+            Assignment.objects.create(
+                title='Extra', description='...', lesson=self.lessons[0], course=course,
+                due_date=timezone.now() + datetime.timedelta(days=3),
+            )
+            Enrollment.objects.create(student=student, course=course)
+        self.assertEqual(queries(student), baseline)
+
+
+class RosterImportTests(LmsTestCase):
+
+    def post(self, kind, body, content_type):
+        return self.client.generic('POST', f'/api/import/{kind}/', body, content_type=content_type)
+
+    def test_csv_import_reports_invalid_rows(self):
+        body = (
+            'name,email,enrollment_date,roll_number\n'
+            'Grace,grace@example.com,2024-09-01,R1\n'
+            'Bad,not-an-email,2024-09-01,R2\n'
+            'Alan,,2024-09-02,\n'
+        )
+        response = self.post('students', body, 'text/csv')
+        self.assertEqual(response.status_code, 200)
+        report = response.json()
+        self.assertEqual(report['created'], 2)
+        self.assertEqual([error['row'] for error in report['errors']], [2])
+        self.assertIn('email', report['errors'][0]['errors'])
+        self.assertEqual(Student.objects.get(roll_number='R1').name, 'Grace')
+        self.assertIsNone(Student.objects.get(name='Alan').email)
+
+    def test_ndjson_enrollments_skip_duplicates_and_bad_rows(self):
+        student = Student.objects.create(name='New', enrollment_date=timezone.now().date())
+        course = Course.objects.create(title='Topology', description='...', teacher=self.teacher)
+        lines = [
+            {'student': student.pk, 'course': course.pk},
+            {'student': student.pk, 'course': course.pk},
+            {'student': self.students[0].pk, 'course': self.course.pk},
+            {'student': 0, 'course': course.pk},
+        ]
+        body = '\n'.join(json.dumps(line) for line in lines) + '\n{not json\n[1]\n'
+        response = self.post('enrollments', body, 'application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        report = response.json()
+        self.assertEqual(report['created'], 1)
+        self.assertEqual(report['error_count'], 5)
+        errors = {error['row']: error['errors'] for error in report['errors']}
+        self.assertEqual(errors[2], {'non_field_errors': ['Enrollment already exists.']})
+        self.assertEqual(errors[3], {'non_field_errors': ['Enrollment already exists.']})
+        self.assertIn('student', errors[4])
+        self.assertEqual(set(errors), {2, 3, 4, 5, 6})
+        self.assertEqual(Enrollment.objects.filter(student=student).count(), 1)
+
+    def test_malformed_bodies_are_rejected(self):
+        self.assertEqual(self.post('students', '', 'text/csv').status_code, 400)
+        response = self.post('students', b'name,enrollment_date\nOk,2024-09-01\nBad\xff,2024-09-01\n', 'text/csv')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('UTF-8', response.json()['error'])
+        self.assertEqual(self.post('students', 'name\nx\n', 'application/json').status_code, 415)
+        self.assertEqual(self.post('courses', 'title\nx\n', 'text/csv').status_code, 404)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.generic('POST', '/api/register/bulk/', b'username\n\xff\n', content_type='text/csv')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['created'], 0)
+        response = self.client.generic('POST', '/api/register/bulk/', '', content_type='text/csv')
+        self.assertEqual(response.status_code, 400)
+
+
+class GradeExportTests(LmsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.submissions = [
+            Submission.objects.create(assignment=self.assignments[i % 3], student=student, content=f'answer {i}')
+            for i, student in enumerate(self.students)
+        ]
+        Results.objects.create(submission=self.submissions[0], score=75, feedback='good')
+
+    def export(self, fmt, **params):
+        response = self.client.get(f'/api/export/grades/{fmt}/', params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export(self):
+        rows = list(csv.reader(io.StringIO(self.export('csv', columns='submission_id,student_name,score,content'))))
+        self.assertEqual(rows[0], ['submission_id', 'student_name', 'score', 'content'])
+        self.assertEqual(rows[1], [str(self.submissions[0].pk), 'Student 0', '75.0', 'answer 0'])
+        self.assertEqual(rows[2], [str(self.submissions[1].pk), 'Student 1', '', 'answer 1'])
+        self.assertEqual(len(rows), 1 + len(self.submissions))
+
+    def test_ndjson_export(self):
+        response = self.client.get('/api/export/grades/ndjson/')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([line['submission_id'] for line in lines], [s.pk for s in self.submissions])
+        self.assertEqual(list(lines[0]), export.DEFAULT_COLUMNS)
+        self.assertEqual((lines[0]['score'], lines[0]['feedback']), (75.0, 'good'))
+        self.assertIsNone(lines[1]['score'])
+
+    def test_unknown_format_or_column(self):
+        self.assertEqual(self.client.get('/api/export/grades/xlsx/').status_code, 404)
+        self.assertEqual(self.client.get('/api/export/grades/csv/', {'columns': 'password'}).status_code, 400)
+
+    def test_archived_courses_are_excluded(self):
+        other = Course.objects.create(title='Topology', description='...', teacher=self.teacher)
+        assignment = Assignment.objects.create(
+            title='Essay', description='...', lesson=self.lessons[0], course=other, due_date=timezone.now(),
+        )
+        archived = Submission.objects.create(assignment=assignment, student=self.students[0], content='x')
+
+        def exported():
+            return [json.loads(line)['submission_id'] for line in self.export('ndjson').splitlines()]
+
+        self.assertIn(archived.pk, exported())
+        purge.archive_course(other)
+        self.assertNotIn(archived.pk, exported())
+        self.assertEqual(len(exported()), len(self.submissions))
+
+    def test_query_count_does_not_grow_with_rows(self):
+        def queries():
+            with CaptureQueriesContext(connection) as captured:
+                self.export('ndjson', columns='submission_id,student_name,score,content')
+            return len(captured)
+
+        before = queries()
+        students = Student.objects.bulk_create([
+            Student(name=f'Extra {i}', email=f'extra{i}@example.com', enrollment_date=timezone.now().date())
+            for i in range(40)
+        ])
+        Submission.objects.bulk_create([
+            Submission(assignment=self.assignments[i % 3], student=student, content=f'more {i}')
+            for i, student in enumerate(students)
+        ])
+        self.assertEqual(queries(), before)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'], LMS_PROVISION_PROCESSES=2)
+class UserProvisioningTests(LmsTestCase):
+
+    def accounts_csv(self, start, count):
+        lines = ['username,password,phone,first_name,last_name']
+        lines += [f'user{i},secret-{i},+1555{i:06d},First{i},' for i in range(start, start + count)]
+        return '\n'.join(lines) + '\n'
+
+    def test_bulk_endpoint_creates_accounts_and_reports_rejects(self):
+        Profile.objects.create(user=self.user, phone='+1555000003')
+        body = self.accounts_csv(0, 6) + 'tester,pw,+19990000000,Taken,\nuser1,pw,+19990000001,Again,\n'
+        response = self.client.post('/api/register/bulk/', body, content_type='text/csv')
+        self.assertEqual(response.status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.post('/api/register/bulk/', body, content_type='text/csv')
+        self.assertEqual(response.status_code, 200)
+        report = response.json()
+        self.assertEqual(report['created'], 5)
+        self.assertEqual(sorted(error['row'] for error in report['errors']), [4, 7, 8])
+        self.assertIn('users_per_second', report)
+
+        user = User.objects.get(username='user5')
+        self.assertTrue(user.check_password('secret-5'))
+        self.assertEqual(user.profile.phone, '+1555000005')
+        self.assertEqual(user.first_name, 'First5')
+        self.assertFalse(User.objects.filter(username='user3').exists())
+
+    @override_settings(LMS_PROVISION_HTTP_MAX_ROWS=3)
+    def test_bulk_endpoint_hashes_in_process_and_caps_rows(self):
+        self.user.is_staff = True
+        self.user.save()
+        with mock.patch('lmsapp.provisioning.multiprocessing.get_context') as get_context:
+            response = self.client.post('/api/register/bulk/', self.accounts_csv(0, 4), content_type='text/csv')
+            self.assertEqual(response.status_code, 413)
+            self.assertIn('provision_users', response.json()['error'])
+            self.assertFalse(User.objects.filter(username__startswith='user').exists())
+
+            response = self.client.post('/api/register/bulk/', self.accounts_csv(0, 3), content_type='text/csv')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['created'], 3)
+        get_context.assert_not_called()
+
+    def test_queries_per_chunk_do_not_grow_with_rows(self):
+        def queries(start, count):
+            stream = io.BytesIO(self.accounts_csv(start, count).encode())
+            with CaptureQueriesContext(connection) as captured:
+                report = provisioning.provision_users(stream, 'csv')
+            self.assertEqual(report.created, count)
+            return len(captured)
+
+        self.assertEqual(queries(0, 3), queries(100, 40))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LoginTests(LmsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user.set_password('secret-pass')
+        self.user.save()
+        Profile.objects.create(user=self.user, phone='+15550001111')
+        self.anon = APIClient()
+
+    def login(self, phone='+15550001111', password='secret-pass'):
+        return self.anon.post('/api/login/', {'phone': phone, 'password': password}, format='json')
+
+    async def alogin(self, phone='+15550001111', password='secret-pass'):
+        return await AsyncClient().post(
+            '/api/async/login/', {'phone': phone, 'password': password}, content_type='application/json',
+        )
+
+    def test_login_is_one_query_and_unknown_phones_are_cached(self):
+        with self.assertNumQueries(1):
+            response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['user_id'], self.user.pk)
+        self.assertIn('access', response.json()['tokens'])
+        self.assertEqual(self.login(password='wrong').status_code, 400)
+
+        with mock.patch('lmsapp.login.verify_password', wraps=login.verify_password) as verify:
+            with self.assertNumQueries(1):
+                self.assertEqual(self.login(phone='+15550009999').json(), {'error': 'Invalid phone or password'})
+            with self.assertNumQueries(0):
+                self.assertEqual(self.login(phone='+15550009999').status_code, 400)
+        # Unknown phones still cost a hash, like a wrong password
+        self.assertEqual(verify.call_count, 2)
+
+        other = User.objects.create_user(username='newcomer', password='other-pass')
+        Profile.objects.create(user=other, phone='+15550009999')
+        self.assertEqual(self.login(phone='+15550009999', password='other-pass').status_code, 200)
+
+    @override_settings(LMS_LOGIN_PHONE_BURST=2, LMS_LOGIN_PHONE_PER_MINUTE=1, LMS_LOGIN_IP_BURST=4)
+    def test_throttles_per_phone_and_per_client(self):
+        self.assertEqual(self.login(password='wrong').status_code, 400)
+        self.assertEqual(self.login().status_code, 200)
+        response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+
+        # Another phone has its own bucket, until the client's runs out
+        self.assertEqual(self.login(phone='+15550002222').status_code, 400)
+        response = self.login(phone='+15550003333')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(self.anon.post(
+            '/api/login/', {'phone': '+15550003333', 'password': 'x'}, format='json', REMOTE_ADDR='10.0.0.7',
+        ).status_code, 400)
+
+    async def test_async_login_hashes_in_the_pool(self):
+        good = await self.alogin()
+        self.assertEqual(good.status_code, 200)
+        self.assertEqual(good.json()['username'], 'tester')
+        self.assertEqual((await self.alogin(password='wrong')).status_code, 400)
+        unknown = await self.alogin(phone='+15550009999')
+        self.assertEqual(unknown.json(), {'error': 'Invalid phone or password'})
+
+        with mock.patch.object(login.HashPool, 'run', side_effect=login.HashPoolFull):
+            response = await self.alogin()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+
+    async def test_async_login_needs_no_csrf_token(self):
+        body = {'phone': '+15550001111', 'password': 'wrong'}
+        sync_response = await sync_to_async(APIClient(enforce_csrf_checks=True).post)('/api/login/', body, format='json')
+        self.assertEqual(sync_response.status_code, 400)
+        response = await AsyncClient(enforce_csrf_checks=True).post(
+            '/api/async/login/', body, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), sync_response.json())
+
+    @override_settings(LMS_LOGIN_PHONE_BURST=1)
+    async def test_async_login_is_throttled(self):
+        self.assertEqual((await self.alogin()).status_code, 200)
+        response = await self.alogin()
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+
+class SubmissionContentTests(LmsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.text = 'An essay on groups. ' * 500
+        self.submission = Submission.objects.create(
+            assignment=self.assignments[0], student=self.students[0], content=self.text,
+        )
+
+    def test_body_is_stored_compressed(self):
+        body = SubmissionContent.objects.get(submission=self.submission)
+        self.assertTrue(body.compressed)
+        self.assertEqual(body.size, len(self.text))
+        self.assertLess(len(body.data), body.size // 10)
+        self.assertEqual(Submission.objects.get(pk=self.submission.pk).content, self.text)
+
+    def test_list_leaves_body_out_and_detail_joins_it(self):
+        with self.assertNumQueries(1) as ctx:
+            response = self.client.get('/api/submission/')
+        self.assertNotIn('content', response.json()['results'][0])
+        self.assertNotIn('submissioncontent', ctx.captured_queries[0]['sql'])
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/submission/', {'fields': 'id,content'})
+        self.assertEqual(response.json()['results'][0]['content'], self.text)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/submission/{self.submission.pk}/')
+        self.assertEqual(response.json()['content'], self.text)
+
+    def test_content_endpoint_streams_text(self):
+        response = self.client.get(f'/api/submission/{self.submission.pk}/content/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content).decode(), self.text)
+        self.assertEqual(self.client.get('/api/submission/0/content/').status_code, 404)
+
+    def test_update_replaces_body(self):
+        response = self.client.patch(f'/api/submission/{self.submission.pk}/', {'content': 'short'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['content'], 'short')
+        body = SubmissionContent.objects.get(submission=self.submission)
+        self.assertFalse(body.compressed)
+        self.assertEqual(bytes(body.data), b'short')
+
+    def test_bulk_create_writes_bodies(self):
+        created = Submission.objects.bulk_create([
+            Submission(assignment=self.assignments[1], student=student, content=f'bulk {student.pk}')
+            for student in self.students[:3]
+        ] + [Submission(assignment=self.assignments[2], student=self.students[0])])
+        self.assertEqual(created[0].content, f'bulk {self.students[0].pk}')
+        for submission in Submission.objects.select_related('body').filter(assignment=self.assignments[1]):
+            self.assertEqual(submission.content, f'bulk {submission.student_id}')
+        self.assertFalse(SubmissionContent.objects.filter(submission=created[3]).exists())
+
+    def test_serializer_benchmark_skips_uncompilable_serializers(self):
+        report = benchmark.serializer_microbenchmark(rows=10, repeat=1)
+        self.assertIn('skipped', report['submission'])
+        self.assertEqual(report['enrollment']['rows'], 4)
+
+
+class BulkGradingTests(LmsTestCase):
+
+    def test_upserts_results_and_reports_each_entry(self):
+        assignment, other = self.assignments[0], self.assignments[1]
+        first, second = (
+            Submission.objects.create(assignment=assignment, student=student, content='answer')
+            for student in self.students[:2]
+        )
+        foreign = Submission.objects.create(assignment=other, student=self.students[0], content='answer')
+        Results.objects.create(submission=first, score=10, feedback='old')
+
+        with self.assertNumQueries(7):
+            response = self.client.post(f'/api/assignment/{assignment.pk}/grades/', [
+                {'submission': first.pk, 'score': 90, 'feedback': 'better'},
+                {'submission': second.pk, 'score': 75},
+                {'submission': foreign.pk, 'score': 50},
+                {'submission': second.pk, 'score': 80},
+                {'submission': 'x', 'score': 'y'},
+            ], format='json')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['created'], data['updated'], data['error_count']), (1, 1, 3))
+        self.assertEqual(
+            [entry['status'] for entry in data['results']], ['updated', 'created', 'error', 'error', 'error'],
+        )
+        self.assertEqual(Results.objects.get(submission=first).feedback, 'better')
+        self.assertEqual(Results.objects.get(submission=second).score, 75)
+        self.assertFalse(Results.objects.filter(submission=foreign).exists())
+
+    def test_unknown_assignment(self):
+        response = self.client.post('/api/assignment/0/grades/', [], format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+class GradebookTests(LmsTestCase):
+
+    def grade(self, assignment, student, score):
+        submission = Submission.objects.create(assignment=assignment, student=student, content='answer')
+        return Results.objects.create(submission=submission, score=score, feedback='')
+
+    def snapshot(self):
+        fields = ('submission_count', 'graded_count', 'min_score', 'max_score', 'histogram')
+        return (
+            {row.pk: [getattr(row, field) for field in fields] for row in AssignmentStats.objects.all()},
+            {row.pk: [getattr(row, field) for field in fields + ('enrolled_count', 'assignment_count')]
+             for row in CourseStats.objects.all()},
+        )
+
+    def test_stats_endpoint(self):
+        for student, score in zip(self.students, (40, 60, 80)):
+            self.grade(self.assignments[0], student, score)
+        response = self.client.get(f'/api/assignment/{self.assignments[0].pk}/stats/')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['graded_count'], data['mean'], data['min'], data['max']), (3, 60.0, 40, 80))
+        self.assertEqual(data['submission_rate'], 0.75)
+        self.assertAlmostEqual(data['median'], 60.0, delta=1)
+        self.assertEqual(sum(data['histogram']['counts']), 3)
+
+        data = self.client.get(f'/api/course/{self.course.pk}/stats/').json()
+        self.assertEqual((data['enrolled_count'], data['assignment_count'], data['submission_count']), (4, 3, 3))
+        self.assertEqual(data['submission_rate'], 0.25)
+        self.assertEqual([row['assignment'] for row in data['assignments']], [a.pk for a in self.assignments])
+
+    def test_incremental_updates_match_rebuild(self):
+        first = self.grade(self.assignments[0], self.students[0], 90)
+        gradebook.course_stats(self.course.pk)
+
+        self.grade(self.assignments[0], self.students[1], 55.5)
+        second = self.grade(self.assignments[1], self.students[1], 100)
+        first.score = 10
+        first.save()
+        second.delete()
+        Submission.objects.create(assignment=self.assignments[2], student=self.students[2], content='late')
+        Enrollment.objects.filter(student=self.students[3]).delete()
+        new_assignment = Assignment.objects.create(
+            title='Extra', description='...', lesson=self.lessons[0], course=self.course, due_date=timezone.now(),
+        )
+        self.grade(new_assignment, self.students[0], 70)
+        self.client.post(f'/api/assignment/{self.assignments[2].pk}/grades/', [
+            {'submission': Submission.objects.get(assignment=self.assignments[2]).pk, 'score': 30},
+        ], format='json')
+
+        incremental = self.snapshot()
+        gradebook.rebuild()
+        self.assertEqual(incremental, self.snapshot())
+        self.assertEqual(AssignmentStats.objects.get(pk=self.assignments[0].pk).min_score, 10)
+
+    def test_group_totals_implementations_agree(self):
+        if gradebook.np is None:
+            self.skipTest('numpy is not installed')
+        keys, scores = [1, 2, 1, 1, 3], [10.0, 100.0, -5.0, 99.9, 50.0]
+        self.assertEqual(
+            gradebook._group_totals_numpy(keys, scores, 10, 100.0),
+            gradebook._group_totals_python(keys, scores, 10, 100.0),
+        )
+
+    def test_rebuild_without_numpy(self):
+        for student, score in zip(self.students, (10, 55.5, 99.9, 100)):
+            self.grade(self.assignments[1], student, score)
+        gradebook.rebuild()
+        expected = self.snapshot()
+        AssignmentStats.objects.all().delete()
+        CourseStats.objects.all().delete()
+        with mock.patch('lmsapp.gradebook.np', None), \
+                mock.patch('lmsapp.gradebook._group_totals_numpy') as numpy_totals:
+            gradebook.rebuild()
+        numpy_totals.assert_not_called()
+        self.assertEqual(self.snapshot(), expected)
+        self.assertEqual(AssignmentStats.objects.get(pk=self.assignments[1].pk).max_score, 100)
+
+
+@override_settings(LMS_INSTRUMENTATION_SAMPLE_RATE=1, LMS_N_PLUS_ONE_THRESHOLD=5)
+class InstrumentationTests(LmsTestCase):
+
+    def get(self, url):
+        # The middleware reads its settings when the client first loads it
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.assertLogs('lmsapp.instrumentation', 'INFO') as logs:
+            response = client.get(url)
+        self.assertEqual(len(logs.records), 1)
+        return response, logs.records[0]
+
+    def test_sampled_requests_get_server_timing_and_a_log_line(self):
+        response, record = self.get('/api/course/')
+        line = json.loads(record.getMessage())
+        self.assertEqual(record.levelname, 'INFO')
+        self.assertEqual((line['method'], line['path'], line['status']), ('GET', '/api/course/', 200))
+        self.assertNotIn('n_plus_one', line)
+        self.assertRegex(
+            response['Server-Timing'],
+            rf'^db;dur=[\d.]+;desc="{line["queries"]} queries", serialize;dur=[\d.]+, '
+            r'render;dur=[\d.]+, total;dur=[\d.]+$',
+        )
+
+    def test_streamed_responses_are_measured_until_the_body_is_sent(self):
+        Submission.objects.create(assignment=self.assignments[0], student=self.students[0], content='x')
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.assertNoLogs('lmsapp.instrumentation'):
+            response = client.get('/api/export/grades/ndjson/')
+        self.assertNotIn('Server-Timing', response)
+        with self.assertLogs('lmsapp.instrumentation', 'INFO') as logs, \
+                CaptureQueriesContext(connection) as captured:
+            body = b''.join(response.streaming_content)
+        self.assertEqual(len(body.splitlines()), 1)
+        [record] = logs.records
+        line = json.loads(record.getMessage())
+        self.assertTrue(line['streamed'])
+        self.assertEqual(line['queries'], len(captured))
+        self.assertGreater(line['queries'], 0)
+
+        with override_settings(LMS_N_PLUS_ONE_THRESHOLD=1):
+            client = APIClient()
+            client.force_authenticate(self.user)
+            with self.assertLogs('lmsapp.instrumentation', 'WARNING') as logs:
+                b''.join(client.get('/api/export/grades/csv/').streaming_content)
+        self.assertTrue(json.loads(logs.records[0].getMessage())['n_plus_one'])
+
+    async def test_streamed_responses_are_measured_under_asgi(self):
+        submission = await Submission.objects.acreate(
+            assignment=self.assignments[0], student=self.students[0], content='an answer',
+        )
+        token = (await sync_to_async(LmsRefreshToken.for_user)(self.user)).access_token
+        with self.assertLogs('lmsapp.instrumentation', 'INFO') as logs:
+            response = await AsyncClient().get(
+                f'/api/submission/{submission.pk}/content/', headers={'Authorization': f'Bearer {token}'},
+            )
+            # The view streams a sync iterator, which Django warns about under ASGI
+            with self.assertWarnsRegex(Warning, 'consume synchronous iterators'):
+                body = b''.join([chunk async for chunk in response])
+        self.assertEqual(body, b'an answer')
+        self.assertNotIn('Server-Timing', response)
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertTrue(line['streamed'])
+        self.assertGreater(line['queries'], 0)
+
+    @override_settings(LMS_INSTRUMENTATION_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_untouched(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.assertNoLogs('lmsapp.instrumentation'):
+            response = client.get('/api/course/')
+        self.assertNotIn('Server-Timing', response)
+
+    def test_repeated_query_shapes_are_reported_from_the_threshold(self):
+        metrics = instrumentation.RequestMetrics()
+        with connection.execute_wrapper(metrics):
+            for student in self.students:
+                list(Enrollment.objects.filter(student=student))
+            list(Enrollment.objects.filter(student__in=self.students[:2]))
+            list(Enrollment.objects.filter(student__in=self.students))
+        # IN lists of any length share a shape
+        self.assertEqual([count for count, _ in metrics.repeated_queries(2)], [4, 2])
+        self.assertEqual([count for count, _ in metrics.repeated_queries(4)], [4])
+        self.assertEqual(metrics.repeated_queries(5), [])
+
+        with override_settings(LMS_N_PLUS_ONE_THRESHOLD=1):
+            _, record = self.get('/api/course/')
+        self.assertEqual(record.levelname, 'WARNING')
+        self.assertTrue(json.loads(record.getMessage())['n_plus_one'])
+
+
+class BenchmarkTests(LmsTestCase):
+
+    def test_bench_api_runs_every_route(self):
+        submission = Submission.objects.create(assignment=self.assignments[0], student=self.students[0], content='x')
+        Results.objects.create(submission=submission, score=50)
+        out = io.StringIO()
+        call_command('bench_api', user='tester', iterations=1, warmup=0, stdout=out)
+        output = out.getvalue()
+        self.assertIn('course-list', output)
+        self.assertNotIn('async-course-events', output)
+        self.assertNotIn('login', output)
+        self.assertNotIn('skipped', output)
+        for name in ('course-stats', 'assignment-stats', 'student-upcoming', 'submission-content'):
+            self.assertIn(name, output)
+
+    def test_bench_api_bypasses_the_response_cache(self):
+        seen = []
+
+        def run_routes(*args):
+            seen.append(settings.LMS_RESPONSE_CACHE_TTL)
+            return {'routes': {}}
+
+        with override_settings(LMS_RESPONSE_CACHE_TTL=60), mock.patch('lmsapp.benchmark.run_routes', run_routes):
+            call_command('bench_api', user='tester', iterations=1, warmup=0, stdout=io.StringIO())
+        self.assertEqual(seen, [0])
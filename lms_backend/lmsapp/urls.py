@@ -1,16 +1,25 @@
 from django.urls import path
 
+from lmsapp.async_views import (AsyncCourseListView,AsyncCourseRetrieveView,AsyncLessonListView,AsyncLessonRetrieveView,
+                                AsyncAssignmentListView,AsyncAssignmentRetrieveView,AsyncEnrollmentListView,
+                                AsyncEnrollmentRetrieveView,AsyncCourseEventsView,AsyncLoginView)
+
 from lmsapp.views import(LoginView,ProtectedView,TeacherListCreateView,StudentListCreateView,CourseListCreateView,
                          TeacherRetrieveUpdateDestroyAPIView,StudentRetrieveUpdateDestroyAPIView,EnrollmentListCreateView,
-                         CourseRetrieveUpdateDestroyAPIView,EnrollmentRetrieveUpdateDestroyAPIView,AssignmentRetrieveUpdateDestroyAPIView,
+                         CourseRetrieveUpdateDestroyAPIView,EnrollmentRetrieveUpdateDestroyAPIView,AssignmentRetrieveUpdateDestroyAPIView,AssignmentGradesView,AssignmentStatsView,
                          LessonListCreateView,LessonRetrieveUpdateDestroyAPIView,AssignmentListCreateView,
-                         SubmissionListCreateView,SubmissionRetrieveUpdateDestroyAPIView,ResultsListCreateView,
-                         ResultsRetrieveUpdateDestroyAPIView)
+                         SubmissionListCreateView,SubmissionRetrieveUpdateDestroyAPIView,SubmissionContentView,ResultsListCreateView,
+                         ResultsRetrieveUpdateDestroyAPIView,CourseFullRetrieveAPIView,CourseStatsView,CourseSearchView,StudentUpcomingView,
+                         RosterImportView,UserProvisionView,GradeExportView)
 
 urlpatterns = [
     path('api/login/',LoginView.as_view(),name='login'),
     path('api/protected/',ProtectedView.as_view(),name='protected'),
 
+    path('api/import/<str:kind>/', RosterImportView.as_view(), name='roster-import'),
+    path('api/register/bulk/', UserProvisionView.as_view(), name='register-bulk'),
+    path('api/export/grades/<str:fmt>/', GradeExportView.as_view(), name='grade-export'),
+
     #lms main project
 
     path('api/teacher/', TeacherListCreateView.as_view(), name='teacher-list'),
@@ -18,9 +27,13 @@ urlpatterns = [
 
     path('api/student/', StudentListCreateView.as_view(), name='student-list'),
     path('api/student/<int:pk>/', StudentRetrieveUpdateDestroyAPIView.as_view(), name='student-detail'),
+    path('api/student/<int:pk>/upcoming/', StudentUpcomingView.as_view(), name='student-upcoming'),
 
     path('api/course/', CourseListCreateView.as_view(), name='course-list'),
+    path('api/course/search/', CourseSearchView.as_view(), name='course-search'),
     path('api/course/<int:pk>/', CourseRetrieveUpdateDestroyAPIView.as_view(), name='course-detail'),
+    path('api/course/<int:pk>/full/', CourseFullRetrieveAPIView.as_view(), name='course-full'),
+    path('api/course/<int:pk>/stats/', CourseStatsView.as_view(), name='course-stats'),
 
     path('api/enrollment/', EnrollmentListCreateView.as_view(), name='enrollment-list'),
     path('api/enrollment/<int:pk>/', EnrollmentRetrieveUpdateDestroyAPIView.as_view(), name='enrollment-detail'),
@@ -30,10 +43,30 @@ urlpatterns = [
 
     path('api/assignment/', AssignmentListCreateView.as_view(), name='assignment-list'),
     path('api/assignment/<int:pk>/', AssignmentRetrieveUpdateDestroyAPIView.as_view(), name='assignment-detail'),
+    path('api/assignment/<int:pk>/grades/', AssignmentGradesView.as_view(), name='assignment-grades'),
+    path('api/assignment/<int:pk>/stats/', AssignmentStatsView.as_view(), name='assignment-stats'),
 
     path('api/submission/', SubmissionListCreateView.as_view(), name='submission-list'),
     path('api/submission/<int:pk>/', SubmissionRetrieveUpdateDestroyAPIView.as_view(), name='submission-detail'),
+    path('api/submission/<int:pk>/content/', SubmissionContentView.as_view(), name='submission-content'),
 
     path('api/results/',ResultsListCreateView.as_view(), name='result-list'),
     path('api/results/<int:pk>/', ResultsRetrieveUpdateDestroyAPIView.as_view(), name='result-detail'),
-]
\ No newline at end of file
+
+    #async read path (serve through lms.asgi)
+
+    path('api/async/login/', AsyncLoginView.as_view(), name='async-login'),
+
+    path('api/async/course/', AsyncCourseListView.as_view(), name='async-course-list'),
+    path('api/async/course/<int:pk>/', AsyncCourseRetrieveView.as_view(), name='async-course-detail'),
+    path('api/async/course/<int:pk>/events/', AsyncCourseEventsView.as_view(), name='async-course-events'),
+
+    path('api/async/lesson/', AsyncLessonListView.as_view(), name='async-lesson-list'),
+    path('api/async/lesson/<int:pk>/', AsyncLessonRetrieveView.as_view(), name='async-lesson-detail'),
+
+    path('api/async/assignment/', AsyncAssignmentListView.as_view(), name='async-assignment-list'),
+    path('api/async/assignment/<int:pk>/', AsyncAssignmentRetrieveView.as_view(), name='async-assignment-detail'),
+
+    path('api/async/enrollment/', AsyncEnrollmentListView.as_view(), name='async-enrollment-list'),
+    path('api/async/enrollment/<int:pk>/', AsyncEnrollmentRetrieveView.as_view(), name='async-enrollment-detail'),
+]
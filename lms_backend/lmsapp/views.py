@@ -1,16 +1,31 @@
+from django.conf import settings
 from django.shortcuts import render
 from django.contrib.auth.models import User
+from django.db.models import Count, Prefetch
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import generics, status
-from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 
 from .serializers import (RegisterSerializer,LoginSerializer, SubmissionSerializer, TeacherSerializer,
                           StudentSerializer,CourseSerializer,EnrollmentSerializer,
-                          LessonSerializer, AssignmentSerializer,ResultSerializer)
-
-from .models import (Profile, Submission,Teacher,Student,Course,Enrollment,Lesson,Assignment,Results)
+                          LessonSerializer, AssignmentSerializer,ResultSerializer,CourseDetailSerializer,
+                          UpcomingAssignmentSerializer)
+
+from .models import (Submission,SubmissionContent,Teacher,Student,Course,Enrollment,Lesson,Assignment,Results,Deadline)
+from . import content, export, gradebook, grading, login, purge
+from .authentication import user_role
+from .caching import CachedResponseMixin
+from .fastpath import FastListMixin
+from .fieldsets import FieldSelectionViewMixin
+from .pagination import RankedPagination
+from .provisioning import TooManyRows, provision_users
+from .roster import KINDS as ROSTER_KINDS, MalformedBody, format_for_content_type, import_roster
+from .routing import ReplicaReadMixin
+from .search import search_course_ids
+from .sync import DeltaSyncMixin
 
 # Create your views here.
 
@@ -21,19 +36,10 @@ class RegisterView(generics.CreateAPIView):
     serializer_class = RegisterSerializer
 
 
-def get_tokens_for_user(user):
-    """Helper to get JWT tokens for a user."""
-    refresh = RefreshToken.for_user(user)
-    return {
-        'refresh': str(refresh),
-        'access': str(refresh.access_token),
-    }
-
-
 #login
 
 class LoginView(APIView):
-    """Login view using phone and password."""
+    """Login view using phone and password (see ``lmsapp.login``)."""
 
     def post(self, request):
         serializer = LoginSerializer(data=request.data)
@@ -41,22 +47,11 @@ class LoginView(APIView):
         phone = serializer.validated_data['phone']
         password = serializer.validated_data['password']
 
-        try:
-            profile = Profile.objects.get(phone=phone)
-            user = profile.user
-        except Profile.DoesNotExist:
-            return Response({'error': 'Invalid phone or password'}, status=status.HTTP_400_BAD_REQUEST)
-
-        if not user.check_password(password):
-            return Response({'error': 'Invalid phone or password'}, status=status.HTTP_400_BAD_REQUEST)
-
-        tokens = get_tokens_for_user(user)
-        return Response({
-            'message': 'Login successful',
-            'user_id': user.id,
-            'username': user.username,
-            'tokens': tokens
-        })
+        login.check_throttle(request, phone)
+        user = login.authenticate(phone, password)
+        if user is None:
+            return Response(login.INVALID_CREDENTIALS, status=status.HTTP_400_BAD_REQUEST)
+        return Response(login.success_payload(user))
 
 
 
@@ -71,105 +66,285 @@ class ProtectedView(APIView):
             'username': user.username,
             'email': user.email,
             'first_name': user.first_name,
-            'last_name': user.last_name
+            'last_name': user.last_name,
+            'role': user_role(user),
+            'phone': request.auth.get('phone') if request.auth is not None else None,
         }
         return Response({
             'message': 'successfully fetched this user',
             'user': user_data
         })
 
-class TeacherListCreateView(generics.ListCreateAPIView):
+def import_response(request, run, what):
+    """Answer with the report of ``run(stream, fmt)`` on the request body, or why it can't be read."""
+    fmt = format_for_content_type(request.content_type)
+    if fmt is None:
+        return Response(
+            {'error': f'Send the {what} as text/csv or application/x-ndjson'},
+            status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        )
+    # DRF has no stream for an empty body
+    if request.stream is None:
+        return Response({'error': 'The request body is empty'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        report = run(request.stream, fmt)
+    except MalformedBody as exc:
+        return Response({'error': str(exc), **exc.report.as_dict()}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(report.as_dict(), status=status.HTTP_200_OK)
+
+class RosterImportView(APIView):
+    """Bulk import students, teachers or enrollments from a CSV or NDJSON request body."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, kind):
+        if kind not in ROSTER_KINDS:
+            return Response({'error': f'Unknown roster kind: {kind}'}, status=status.HTTP_404_NOT_FOUND)
+        return import_response(request, lambda stream, fmt: import_roster(kind, stream, fmt), 'roster')
+
+class UserProvisionView(APIView):
+    """Create many user accounts with profiles from a CSV or NDJSON request body (staff only)."""
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        max_rows = getattr(settings, 'LMS_PROVISION_HTTP_MAX_ROWS', 100)
+
+        def run(stream, fmt):
+            # One process: see lmsapp.provisioning on forking from web workers
+            return provision_users(stream, fmt, processes=1, max_rows=max_rows)
+
+        try:
+            return import_response(request, run, 'accounts')
+        except TooManyRows as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+class GradeExportView(APIView):
+    """Stream submissions joined with their results, students and assignments as CSV or NDJSON."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, fmt):
+        if fmt not in export.FORMATS:
+            return Response({'error': f'Unknown export format: {fmt}'}, status=status.HTTP_404_NOT_FOUND)
+        params = request.query_params
+        try:
+            columns = export.parse_columns(params.get('columns'))
+            course = int(params['course']) if params.get('course') else None
+            since = export.parse_bound(params.get('since'))
+            until = export.parse_bound(params.get('until'), end_of_day=True)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = export.grade_rows(columns, course=course, since=since, until=until)
+        stream = export.stream_csv if fmt == 'csv' else export.stream_ndjson
+        response = StreamingHttpResponse(stream(columns, rows), content_type=export.FORMATS[fmt])
+        response['Content-Disposition'] = f'attachment; filename="grades.{fmt}"'
+        return response
+
+class TeacherListCreateView(ReplicaReadMixin, FieldSelectionViewMixin, CachedResponseMixin, DeltaSyncMixin, FastListMixin, generics.ListCreateAPIView):
     """View to list and create teachers."""
     queryset = Teacher.objects.all()
     serializer_class = TeacherSerializer
     permission_classes = [IsAuthenticated]
 
-class TeacherRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
+class TeacherRetrieveUpdateDestroyAPIView(ReplicaReadMixin, FieldSelectionViewMixin, CachedResponseMixin, generics.RetrieveUpdateDestroyAPIView):
     """View to retrieve, update, or delete a teacher."""
     queryset = Teacher.objects.all()
     serializer_class = TeacherSerializer
     permission_classes = [IsAuthenticated]
 
-class StudentListCreateView(generics.ListCreateAPIView):
+    def perform_destroy(self, instance):
+        purge.archive_teacher(instance)
+
+class StudentListCreateView(ReplicaReadMixin, FieldSelectionViewMixin, CachedResponseMixin, DeltaSyncMixin, FastListMixin, generics.ListCreateAPIView):
     """View to list and create students."""
     queryset = Student.objects.all()
     serializer_class = StudentSerializer
     permission_classes = [IsAuthenticated]
 
-class StudentRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
+class StudentRetrieveUpdateDestroyAPIView(ReplicaReadMixin, FieldSelectionViewMixin, CachedResponseMixin, generics.RetrieveUpdateDestroyAPIView):
     """View to retrieve, update, or delete a student."""
     queryset = Student.objects.all()
     serializer_class = StudentSerializer
     permission_classes = [IsAuthenticated]
 
-class CourseListCreateView(generics.ListCreateAPIView):
+class StudentUpcomingView(ReplicaReadMixin, generics.ListAPIView):
+    """A student's unsubmitted assignments that are not due yet, soonest first, from the deadline index."""
+    serializer_class = UpcomingAssignmentSerializer
+    permission_classes = [IsAuthenticated]
+    ordering = ('due_date', 'id')
+
+    def get_queryset(self):
+        return (
+            Deadline.objects.filter(student_id=self.kwargs['pk'], submitted=False, due_date__gte=timezone.now())
+            .select_related('assignment').only('id', 'assignment__title', 'course_id', 'due_date')
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not Student.objects.filter(pk=kwargs['pk']).exists():
+            return Response({'error': 'Student not found'}, status=status.HTTP_404_NOT_FOUND)
+        return super().list(request, *args, **kwargs)
+
+class CourseListCreateView(ReplicaReadMixin, FieldSelectionViewMixin, CachedResponseMixin, DeltaSyncMixin, FastListMixin, generics.ListCreateAPIView):
     """View to list and create courses."""
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
     permission_classes = [IsAuthenticated]
 
-class CourseRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
+class CourseRetrieveUpdateDestroyAPIView(ReplicaReadMixin, FieldSelectionViewMixin, CachedResponseMixin, generics.RetrieveUpdateDestroyAPIView):
     """View to retrieve, update, or delete a course."""
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
     permission_classes = [IsAuthenticated]
 
-class EnrollmentListCreateView(generics.ListCreateAPIView):
+    def perform_destroy(self, instance):
+        purge.archive_course(instance)
+
+class CourseSearchView(CachedResponseMixin, APIView):
+    """Full-text course search over title, description and teacher, best match first."""
+    permission_classes = [IsAuthenticated]
+    cache_resources = ('course', 'teacher')
+
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        paginator = RankedPagination()
+        ids = paginator.paginate_ids(
+            lambda limit, offset: search_course_ids(query, limit, offset), request,
+        )
+        courses = Course.objects.in_bulk(ids)
+        serializer = CourseSerializer([courses[pk] for pk in ids if pk in courses], many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+class CourseFullRetrieveAPIView(ReplicaReadMixin, CachedResponseMixin, generics.RetrieveAPIView):
+    """View to retrieve a course with its teacher, lessons, assignments and enrollment count.
+
+    Always costs three queries: the course joined to its teacher with the
+    enrollment count annotated, then one prefetch each for lessons and
+    assignments.
+    """
+    queryset = Course.objects.select_related('teacher').annotate(
+        enrollment_count=Count('enrollment', distinct=True),
+    ).prefetch_related(
+        Prefetch('lesson_set', queryset=Lesson.objects.order_by('id')),
+        Prefetch('assignment_set', queryset=Assignment.objects.order_by('due_date', 'id')),
+    )
+    serializer_class = CourseDetailSerializer
+    permission_classes = [IsAuthenticated]
+    cache_resources = ('course', 'teacher', 'lesson', 'assignment', 'enrollment')
+
+class CourseStatsView(CachedResponseMixin, APIView):
+    """Gradebook statistics for a course and each of its assignments, from the precomputed rollups.
+
+    Read from the primary: the first request builds the rollups there, and a
+    replica may not have the inputs or the new rows yet.
+    """
+    permission_classes = [IsAuthenticated]
+    cache_resources = ('course', 'assignment', 'enrollment', 'submission', 'results')
+
+    def get(self, request, pk):
+        course = Course.objects.filter(pk=pk).first()
+        if course is None:
+            return Response({'error': 'Course not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(gradebook.course_summary(course))
+
+class EnrollmentListCreateView(ReplicaReadMixin, FieldSelectionViewMixin, CachedResponseMixin, DeltaSyncMixin, FastListMixin, generics.ListCreateAPIView):
     """View to list and create enrollments."""
-    queryset = Enrollment.objects.all()
+    queryset = Enrollment.objects.live()
     serializer_class = EnrollmentSerializer
     permission_classes = [IsAuthenticated]
 
-class EnrollmentRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
+class EnrollmentRetrieveUpdateDestroyAPIView(ReplicaReadMixin, FieldSelectionViewMixin, CachedResponseMixin, generics.RetrieveUpdateDestroyAPIView):
     """View to retrieve, update, or delete an enrollment."""
-    queryset = Enrollment.objects.all()
+    queryset = Enrollment.objects.live()
     serializer_class = EnrollmentSerializer
     permission_classes = [IsAuthenticated]
 
-class LessonListCreateView(generics.ListCreateAPIView):
+class LessonListCreateView(ReplicaReadMixin, FieldSelectionViewMixin, CachedResponseMixin, DeltaSyncMixin, FastListMixin, generics.ListCreateAPIView):
     """View to list and create lessons."""
-    queryset = Lesson.objects.all()
+    queryset = Lesson.objects.live()
     serializer_class = LessonSerializer
     permission_classes = [IsAuthenticated]
 
-class LessonRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
+class LessonRetrieveUpdateDestroyAPIView(ReplicaReadMixin, FieldSelectionViewMixin, CachedResponseMixin, generics.RetrieveUpdateDestroyAPIView):
     """View to retrieve, update, or delete a lesson."""
-    queryset = Lesson.objects.all()
+    queryset = Lesson.objects.live()
     serializer_class = LessonSerializer
     permission_classes = [IsAuthenticated]
 
-class AssignmentListCreateView(generics.ListCreateAPIView):
+class AssignmentListCreateView(ReplicaReadMixin, FieldSelectionViewMixin, CachedResponseMixin, DeltaSyncMixin, FastListMixin, generics.ListCreateAPIView):
     """View to list and create assignments."""
-    queryset = Assignment.objects.all()
+    queryset = Assignment.objects.live()
     serializer_class = AssignmentSerializer
     permission_classes = [IsAuthenticated]
+    ordering = ('due_date', 'id')
 
-class AssignmentRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
+class AssignmentGradesView(APIView):
+    """Grade many submissions of one assignment in a single request (create or update results)."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        if not Assignment.objects.live().filter(pk=pk).exists():
+            return Response({'error': 'Assignment not found'}, status=status.HTTP_404_NOT_FOUND)
+        entries = request.data
+        if not isinstance(entries, list):
+            return Response({'error': 'Send a JSON list of grades'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(entries) > grading.MAX_ENTRIES:
+            return Response(
+                {'error': f'At most {grading.MAX_ENTRIES} grades per request'}, status=status.HTTP_400_BAD_REQUEST,
+            )
+        report = grading.grade_assignment(pk, entries)
+        return Response(report.as_dict(), status=status.HTTP_200_OK)
+
+class AssignmentStatsView(CachedResponseMixin, APIView):
+    """Gradebook statistics for one assignment, from the precomputed rollups (on the primary, as ``CourseStatsView``)."""
+    permission_classes = [IsAuthenticated]
+    cache_resources = ('assignment', 'enrollment', 'submission', 'results')
+
+    def get(self, request, pk):
+        assignment = Assignment.objects.live().filter(pk=pk).first()
+        if assignment is None:
+            return Response({'error': 'Assignment not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(gradebook.assignment_summary(assignment))
+
+class AssignmentRetrieveUpdateDestroyAPIView(ReplicaReadMixin, FieldSelectionViewMixin, CachedResponseMixin, generics.RetrieveUpdateDestroyAPIView):
     """View to retrieve, update, or delete an assignment."""
-    queryset = Assignment.objects.all()
+    queryset = Assignment.objects.live()
     serializer_class = AssignmentSerializer
     permission_classes = [IsAuthenticated]
 
-class SubmissionListCreateView(generics.ListCreateAPIView):
+class SubmissionListCreateView(ReplicaReadMixin, FieldSelectionViewMixin, CachedResponseMixin, DeltaSyncMixin, FastListMixin, generics.ListCreateAPIView):
     """View to list and create submissions."""
-    queryset = Submission.objects.all()
+    queryset = Submission.objects.live()
     serializer_class = SubmissionSerializer
     permission_classes = [IsAuthenticated]
+    ordering = ('submitted_at', 'id')
+    # The body is fetched from SubmissionContentView, or with ?fields=...,content
+    default_fields = ['id', 'assignment', 'student', 'submitted_at']
 
-class SubmissionRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
+class SubmissionRetrieveUpdateDestroyAPIView(ReplicaReadMixin, FieldSelectionViewMixin, CachedResponseMixin, generics.RetrieveUpdateDestroyAPIView):
     """View to retrieve, update, or delete a submission."""
-    queryset = Submission.objects.all()
+    queryset = Submission.objects.live()
     serializer_class = SubmissionSerializer
     permission_classes = [IsAuthenticated]
 
-class ResultsListCreateView(generics.ListCreateAPIView):
+class SubmissionContentView(APIView):
+    """Stream a submission's body as plain text, decompressing it on the fly."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        body = SubmissionContent.objects.live().filter(submission_id=pk).values_list('data', 'compressed').first()
+        if body is None:
+            if not Submission.objects.live().filter(pk=pk).exists():
+                return Response({'error': 'Submission not found'}, status=status.HTTP_404_NOT_FOUND)
+            body = (b'', False)
+        return StreamingHttpResponse(content.iter_decoded(*body), content_type='text/plain; charset=utf-8')
+
+class ResultsListCreateView(ReplicaReadMixin, FieldSelectionViewMixin, CachedResponseMixin, DeltaSyncMixin, FastListMixin, generics.ListCreateAPIView):
     """View to list and create results."""
-    queryset = Results.objects.all()
+    queryset = Results.objects.live()
     serializer_class = ResultSerializer
     permission_classes = [IsAuthenticated]
 
-class ResultsRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
+class ResultsRetrieveUpdateDestroyAPIView(ReplicaReadMixin, FieldSelectionViewMixin, CachedResponseMixin, generics.RetrieveUpdateDestroyAPIView):
     """View to retrieve, update, or delete a result."""
-    queryset = Results.objects.all()
+    queryset = Results.objects.live()
     serializer_class = ResultSerializer
     permission_classes = [IsAuthenticated]
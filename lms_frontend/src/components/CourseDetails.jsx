@@ -1,7 +1,6 @@
 import { useEffect, useState } from "react";
 import { useParams, useNavigate } from "react-router-dom";
-import { getCourseById } from "../services/courseService";
-import { getTeacherDetails } from "../services/teacherService";
+import { getCourseFull } from "../services/courseService";
 import { createEnrollment } from "../services/enrollmentService";
 
 function CourseDetails() {
@@ -18,7 +17,7 @@ function CourseDetails() {
     async function fetchCourseDetails() {
       try {
         setError("");
-        const c = await getCourseById(id);
+        const c = await getCourseFull(id);
         if (!c) {
           setError("Course not found");
           setIsLoading(false);
@@ -26,10 +25,7 @@ function CourseDetails() {
         }
         setCourse(c);
 
-        if (c.teacher) {
-          const teacherData = await getTeacherDetails(c.teacher);
-          setTeacher(teacherData);
-        }
+        setTeacher(c.teacher);
         setIsLoading(false);
       } catch (err) {
         setError("Failed to load course details. Please try again.");
@@ -1,5 +1,5 @@
 import { React, useEffect, useState } from "react";
-import { getCourses } from "../services/courseService";
+import { getCourses, searchCourses } from "../services/courseService";
 import { Link } from "react-router-dom";
 
 function Courses() {
@@ -11,7 +11,8 @@ function Courses() {
   useEffect(() => {
     async function fetchCourses() {
       try {
-        const cs = await getCourses();
+        const query = searchTerm.trim();
+        const cs = query ? await searchCourses(query) : await getCourses();
         setCourses(cs || []);
         setError("");
       } catch (err) {
@@ -22,14 +23,9 @@ function Courses() {
         setLoading(false);
       }
     }
-    fetchCourses();
-  }, []);
-
-  const filteredCourses = courses.filter(
-    (course) =>
-      course.title.toLowerCase().includes(searchTerm.toLowerCase()) ||
-      course.description.toLowerCase().includes(searchTerm.toLowerCase()),
-  );
+    const timer = setTimeout(fetchCourses, searchTerm ? 250 : 0);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
 
   if (loading) {
     return (
@@ -85,7 +81,7 @@ function Courses() {
         )}
 
         {/* Courses Grid */}
-        {filteredCourses.length === 0 ? (
+        {courses.length === 0 ? (
           <div className="text-center py-16">
             <div className="text-6xl mb-4">📚</div>
             <p className="text-2xl text-gray-600 font-semibold mb-2">
@@ -101,7 +97,7 @@ function Courses() {
           </div>
         ) : (
           <div className="grid md:grid-cols-2 lg:grid-cols-3 gap-8">
-            {filteredCourses.map((course) => (
+            {courses.map((course) => (
               <div
                 key={course.id}
                 className="bg-white rounded-xl shadow-lg hover:shadow-2xl transition duration-300 transform hover:scale-105 overflow-hidden"
@@ -139,14 +135,14 @@ function Courses() {
         )}
 
         {/* Results Counter */}
-        {filteredCourses.length > 0 && (
+        {courses.length > 0 && (
           <div className="mt-12 text-center">
             <p className="text-gray-600 font-medium">
               Showing{" "}
               <span className="font-bold text-blue-600">
-                {filteredCourses.length}
+                {courses.length}
               </span>{" "}
-              course{filteredCourses.length !== 1 ? "s" : ""}
+              course{courses.length !== 1 ? "s" : ""}
             </p>
           </div>
         )}
@@ -27,7 +27,21 @@ export async function getCourses() {
         Authorization: `Bearer ${localStorage.getItem('token')}`
       }
     });
-    return response.data;
+    return response.data.results;
+  } catch (error) {
+    throw error;
+  }
+}
+
+export async function searchCourses(query) {
+  try {
+    const response = await axios.get(`${API_URL}/course/search/`, {
+      params: { q: query },
+      headers: {
+        Authorization: `Bearer ${localStorage.getItem('token')}`
+      }
+    });
+    return response.data.results;
   } catch (error) {
     throw error;
   }
@@ -45,3 +59,33 @@ export async function getCourseById(courseId) {
     throw error;
   }
 }
+
+export async function getCourseFull(courseId) {
+  try {
+    const response = await axios.get(`${API_URL}/course/${courseId}/full/`, {
+      headers: {
+        Authorization: `Bearer ${localStorage.getItem('token')}`
+      }
+    });
+    return response.data;
+  } catch (error) {
+    throw error;
+  }
+}
+
+// Pass the cursor from the previous sync, or "" for a full sync. Returns the
+// changed courses, the ids deleted since the cursor and the next cursor.
+export async function syncCourses(cursor = "") {
+  const headers = { Authorization: `Bearer ${localStorage.getItem('token')}` };
+  let response = await axios.get(`${API_URL}/course/`, {
+    params: { updated_since: cursor },
+    headers
+  });
+  const { deleted, sync_cursor: nextCursor } = response.data;
+  const courses = [...response.data.results];
+  while (response.data.next) {
+    response = await axios.get(response.data.next, { headers });
+    courses.push(...response.data.results);
+  }
+  return { courses, deleted, cursor: nextCursor };
+}